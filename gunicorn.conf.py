@@ -0,0 +1,60 @@
+# Gunicorn settings for production: preloaded app, gevent workers
+import multiprocessing
+import os
+import shutil
+
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gevent')
+
+if worker_class == 'gevent':
+    # Patch before the app (and requests/ssl/threading) is preloaded in the master
+    from gevent import monkey
+    monkey.patch_all()
+
+    # Let psycopg2 wait on sockets through gevent instead of blocking the worker
+    try:
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+    except ImportError:
+        pass
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '5000')}"
+
+# One process per core; each one multiplexes many in-flight webhook requests
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 200))
+
+preload_app = True
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers slowly to bound memory growth
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = 1000
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+# Default format minus the query string, which can carry the event stream token
+access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(m)s %(U)s %(H)s" %(s)s %(b)s "%(f)s" "%(a)s"'
+errorlog = '-'
+
+# Workers share metrics through per-process snapshot files; start from a clean
+# directory before the app is preloaded
+os.environ.setdefault('METRICS_MULTIPROC_DIR', '/tmp/utm-tracker-metrics')
+shutil.rmtree(os.environ['METRICS_MULTIPROC_DIR'], ignore_errors=True)
+
+def post_fork(server, worker):
+    # Connections opened by the preloaded app in the master must not be shared
+    from src.main import app
+    from src.models import db
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+    # Background jobs run in a worker; the lock file picks one per host
+    from src.services.scheduler import start_scheduler
+    start_scheduler(app)
+
+def worker_exit(server, worker):
+    # Write buffered clicks before the worker goes away
+    from src.services.click_buffer import click_buffer
+    click_buffer.flush()
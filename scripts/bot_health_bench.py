@@ -0,0 +1,37 @@
+"""Time a health check of many bots, cold and cached, against the Bot API stub.
+
+    python scripts/stub_telegram.py --port 8081 --delay-ms 300
+    TELEGRAM_API_BASE=http://127.0.0.1:8081 python scripts/bot_health_bench.py --bots 31 --workers 16
+
+Each bot gets a distinct fake token, so the cold pass makes three calls per
+bot and the second pass is served from the cache.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.bot_health import BotHealthChecker
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bots', type=int, default=31)
+    parser.add_argument('--workers', type=int, default=16)
+    args = parser.parse_args()
+
+    checker = BotHealthChecker(ttl=60, max_workers=args.workers)
+    targets = [(f'{n}:stub-token', f'-100{n}') for n in range(args.bots)]
+
+    for label in ('cold', 'cached'):
+        started_at = time.perf_counter()
+        results = checker.check_many(targets)
+        elapsed = time.perf_counter() - started_at
+        statuses = {}
+        for result in results.values():
+            statuses[result['status']] = statuses.get(result['status'], 0) + 1
+        print(f'{label + ":":<12} {elapsed * 1000:8.1f} ms  {statuses}')
+
+if __name__ == '__main__':
+    main()
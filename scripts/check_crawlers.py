@@ -0,0 +1,60 @@
+"""Check the crawler matcher against known crawler and in-app browser user agents.
+
+    python scripts/check_crawlers.py
+
+In-app browsers are real visitors and must not be classified as crawlers,
+even though their user agents name the app. Exits non-zero on any mismatch.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.crawlers import crawler_matcher
+
+CRAWLERS = [
+    ('facebook', 'facebookexternalhit/1.1 (+http://www.facebook.com/externalhit_uatext.php)'),
+    ('facebook', 'meta-externalagent/1.1 (+https://developers.facebook.com/docs/sharing/webmasters/crawler)'),
+    ('telegram', 'TelegramBot (like TwitterBot)'),
+    ('whatsapp', 'WhatsApp/2.23.20.0 A'),
+    ('google', 'Mozilla/5.0 (Linux; Android 6.0.1; Nexus 5X Build/MMB29P) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Mobile Safari/537.36 (compatible; AdsBot-Google-Mobile; +http://www.google.com/mobile/adsbot.html)'),
+    ('twitter', 'Twitterbot/1.0'),
+    ('bytedance', 'Mozilla/5.0 (Linux; Android 5.0) AppleWebKit/537.36 (KHTML, like Gecko) Mobile Safari/537.36 (compatible; Bytespider; spider-feedback@bytedance.com)'),
+    ('bytedance', 'Mozilla/5.0 (compatible; TikTokBot/1.0; +https://www.tiktok.com/bot)'),
+    ('pinterest', 'Mozilla/5.0 (compatible; Pinterestbot/1.0; +http://www.pinterest.com/bot.html)'),
+    ('pinterest', 'Pinterest/0.2 (+http://www.pinterest.com/bot.html)'),
+    ('snapchat', 'Mozilla/5.0 (compatible; Snap URL Preview Service; bot; snapchat; https://developers.snap.com/robots)'),
+]
+
+IN_APP_BROWSERS = [
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_1 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148 musical_ly_32.5.0 JsSdk/2.0 NetType/WIFI Channel/App Store ByteLocale/pt Region/BR FalconTag/ TikTok',
+    'Mozilla/5.0 (Linux; Android 13; SM-A536B Build/TP1A.220624.014; wv) AppleWebKit/537.36 (KHTML, like Gecko) Version/4.0 Chrome/119.0.6045.163 Mobile Safari/537.36 trill_320104 BytedanceWebview/d8a21c6 TikTok',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148 [Pinterest/iOS]',
+    'Mozilla/5.0 (Linux; Android 12; moto g(30) Build/S0RCS32.41; wv) AppleWebKit/537.36 (KHTML, like Gecko) Version/4.0 Chrome/118.0.5993.111 Mobile Safari/537.36 [Pinterest/Android]',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 16_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148 Snapchat/12.56.0.44 (like Safari/8614.2.9.0.11, panda)',
+    'Mozilla/5.0 (Linux; Android 11; Redmi Note 8 Build/RKQ1.201004.002; wv) AppleWebKit/537.36 (KHTML, like Gecko) Version/4.0 Chrome/117.0.5938.140 Mobile Safari/537.36 Viber/20.6.1.0',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_1 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148 [FBAN/FBIOS;FBAV/441.0.0.34.109;FBBV/541914618;FBDV/iPhone14,5;FBMD/iPhone;FBSN/iOS;FBSV/17.1;FBSS/3;FBID/phone;FBLC/pt_BR;FBOP/5]',
+    'Mozilla/5.0 (Linux; Android 13; SM-G991B Build/TP1A.220624.014; wv) AppleWebKit/537.36 (KHTML, like Gecko) Version/4.0 Chrome/119.0.6045.66 Mobile Safari/537.36 Instagram 308.0.0.36.109 Android',
+    'Mozilla/5.0 (Linux; Android 13; Pixel 7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Mobile Safari/537.36 Telegram-Android/10.2.9 (Google Pixel 7; Android 13; SDK 33; AVERAGE)',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_1 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.1 Mobile/15E148 Safari/604.1',
+]
+
+def main():
+    failures = 0
+    for expected, user_agent in CRAWLERS:
+        result = crawler_matcher.classify(user_agent)
+        if result != expected:
+            failures += 1
+            print(f'expected {expected}, got {result}: {user_agent}')
+    for user_agent in IN_APP_BROWSERS:
+        result = crawler_matcher.classify(user_agent)
+        if result is not None:
+            failures += 1
+            print(f'in-app browser classified as {result}: {user_agent}')
+
+    print(f'checked:     {len(CRAWLERS) + len(IN_APP_BROWSERS)} user agents')
+    print(f'mismatches:  {failures}')
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
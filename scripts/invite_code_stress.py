@@ -0,0 +1,74 @@
+"""Generate invite codes across forked processes and threads and check for collisions.
+
+    python scripts/invite_code_stress.py --processes 8 --threads 4 --codes 250000
+
+Each thread writes its codes to a temporary file; the parent loads them
+all and reports duplicates. Exits non-zero if any code repeats. Everything
+runs on one host, so this says nothing about node number collisions.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.invite_codes import invite_codes, decode_code
+
+def generate(directory, process_index, threads, codes):
+    def run(thread_index):
+        batch = [invite_codes.next_code() for _ in range(codes)]
+        path = os.path.join(directory, f'{process_index}-{thread_index}.txt')
+        with open(path, 'w') as f:
+            f.write('\n'.join(batch))
+
+    workers = [threading.Thread(target=run, args=(n,)) for n in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--processes', type=int, default=8)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--codes', type=int, default=125000, help='codes per thread')
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context('fork')
+    with tempfile.TemporaryDirectory() as directory:
+        started_at = time.perf_counter()
+        processes = [
+            context.Process(target=generate, args=(directory, n, args.threads, args.codes))
+            for n in range(args.processes)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - started_at
+
+        seen = set()
+        total = 0
+        duplicates = 0
+        pids = set()
+        for name in os.listdir(directory):
+            with open(os.path.join(directory, name)) as f:
+                for code in f.read().split('\n'):
+                    total += 1
+                    if code in seen:
+                        duplicates += 1
+                    else:
+                        seen.add(code)
+                        pids.add(decode_code(code)['pid'])
+
+    print(f'codes:       {total} from {len(pids)} processes')
+    print(f'elapsed:     {elapsed:.2f}s ({total / elapsed:,.0f} codes/s)')
+    print(f'duplicates:  {duplicates}')
+    sys.exit(1 if duplicates else 0)
+
+if __name__ == '__main__':
+    main()
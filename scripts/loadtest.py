@@ -0,0 +1,63 @@
+"""Concurrent load test for the UTM capture webhook.
+
+    python scripts/loadtest.py http://127.0.0.1:5000/api/webhooks/webhooks/utm-capture/<campaign_id> \
+        --concurrency 100 --requests 2000
+
+Redirects are not followed; a 302 counts as success.
+"""
+import argparse
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+_local = threading.local()
+
+def _session():
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = _local.session = requests.Session()
+    return session
+
+def hit(url, index):
+    started_at = time.perf_counter()
+    try:
+        response = _session().get(
+            url,
+            params={'utm_source': 'load', 'utm_content': f'c{index % 50}'},
+            allow_redirects=False,
+            timeout=30
+        )
+        ok = response.status_code == 302
+    except requests.RequestException:
+        ok = False
+    return ok, time.perf_counter() - started_at
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('url')
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=1000)
+    args = parser.parse_args()
+
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(lambda i: hit(args.url, i), range(args.requests)))
+    elapsed = time.perf_counter() - started_at
+
+    latencies = sorted(latency for _, latency in results)
+    failures = sum(1 for ok, _ in results if not ok)
+
+    def percentile(p):
+        return latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000
+
+    print(f'requests:    {args.requests} ({failures} failed)')
+    print(f'concurrency: {args.concurrency}')
+    print(f'elapsed:     {elapsed:.2f}s')
+    print(f'throughput:  {args.requests / elapsed:.1f} req/s')
+    print(f'latency ms:  p50={percentile(0.50):.0f} p95={percentile(0.95):.0f} '
+          f'p99={percentile(0.99):.0f} mean={statistics.mean(latencies) * 1000:.0f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Minimal Bot API stub for load tests.
+
+Answers every method with a canned `ok` result after a fixed delay, so
+the capture webhook can be load tested without touching Telegram:
+
+    python scripts/stub_telegram.py --port 8081 --delay-ms 250
+    TELEGRAM_API_BASE=http://127.0.0.1:8081 gunicorn -c gunicorn.conf.py src.wsgi:app
+"""
+import argparse
+import itertools
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+counter = itertools.count(1)
+
+class StubHandler(BaseHTTPRequestHandler):
+    delay = 0.25
+
+    def _respond(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        time.sleep(self.delay)
+
+        method = self.path.rsplit('/', 1)[-1].split('?', 1)[0]
+        if method == 'createChatInviteLink':
+            result = {'invite_link': f'https://t.me/+stub{next(counter)}'}
+        elif method == 'getMe':
+            result = {'id': 1, 'is_bot': True, 'username': 'stub_bot'}
+        elif method == 'getChat':
+            result = {'id': -100, 'title': 'Stub chat', 'type': 'channel'}
+        elif method == 'getWebhookInfo':
+            result = {'url': '', 'has_custom_certificate': False, 'pending_update_count': 0}
+        else:
+            result = True
+
+        body = json.dumps({'ok': True, 'result': result}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _respond
+    do_POST = _respond
+
+    def log_message(self, *args):
+        pass
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--delay-ms', type=float, default=250)
+    args = parser.parse_args()
+
+    StubHandler.delay = args.delay_ms / 1000
+    server = StubServer(('127.0.0.1', args.port), StubHandler)
+    server.serve_forever()
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,17 @@
 import os
 import sys
+import time
 from datetime import timedelta
 
+IMPORTS_STARTED_AT = time.perf_counter()
+
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory, jsonify
+from flask import Flask, jsonify
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -15,32 +19,215 @@ load_dotenv()
 
 # Import models and routes
 from src.models import db
-
+from src.services.metrics import init_metrics, metrics
+from src.services.query_stats import init_query_instrumentation
+from src.services.profiler import init_profiling
+from src.services.static_assets import StaticManifest
+from src.services.schema import ensure_schema
+from src.services.startup import StartupReport
+from src.services.principal import init_principal_cache
+from src.services.rate_limit import init_auth_rate_limits
+from src.services.crawlers import init_crawler_detection
+from src.services.click_cache import init_click_coalescing
+from src.services.circuit_breaker import init_circuit_breakers
+from src.services.bot_health import init_bot_health
+from src.services.scheduler import init_scheduler, start_scheduler
+from src.services.sqlite_writer import init_sqlite_profile
+from src.services.db_pool import engine_options, init_db_pool, pool_status
+from src.services.invite_codes import init_invite_codes
+from src.services.click_buffer import init_click_buffer
+from src.services.code_filter import init_invite_code_filter
 
 from src.routes.auth import auth_bp
 from src.routes.telegram_bots import telegram_bots_bp
 from src.routes.campaigns import campaigns_bp
 from src.routes.webhooks import webhooks_bp
 from src.routes.dashboard import dashboard_bp
+from src.routes.admin import admin_bp
+
+IMPORTS_FINISHED_AT = time.perf_counter()
 
 def create_app():
-    app = Flask(__name__, static_folder='static', static_url_path='')
+    startup = StartupReport()
+    startup.add('imports', (IMPORTS_FINISHED_AT - IMPORTS_STARTED_AT) * 1000)
+    
+    # Static files are served from a prebuilt manifest, not Flask's static route
+    app = Flask(__name__, static_folder=None)
+    static_root = os.path.join(app.root_path, 'static')
     
     # Configuration
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///utm_tracker.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Reverse proxies in front of the app (Traefik on Easypanel); their
+    # X-Forwarded-* headers are trusted, anything further left is not
+    app.config['TRUSTED_PROXY_COUNT'] = int(os.getenv('TRUSTED_PROXY_COUNT', 0))
+    
+    # Optional read replica for dashboard, campaign and export reads
+    app.config['REPLICA_MAX_LAG_SECONDS'] = float(os.getenv('REPLICA_MAX_LAG_SECONDS', 10))
+    app.config['REPLICA_LAG_CHECK_SECONDS'] = float(os.getenv('REPLICA_LAG_CHECK_SECONDS', 5))
+    # Fixed lag used instead of measuring it; only for local setups such as two
+    # SQLite files, where no replication stream exists to measure
+    assumed_lag = os.getenv('REPLICA_ASSUMED_LAG_SECONDS')
+    app.config['REPLICA_ASSUMED_LAG_SECONDS'] = float(assumed_lag) if assumed_lag else None
+    replica_url = os.getenv('DATABASE_REPLICA_URL')
+    if replica_url and replica_url.startswith('sqlite') and assumed_lag is None:
+        # Nothing replicates into a SQLite file, so its lag cannot be known
+        app.logger.warning('Ignoring DATABASE_REPLICA_URL: a SQLite replica needs REPLICA_ASSUMED_LAG_SECONDS')
+    elif replica_url:
+        app.config['SQLALCHEMY_BINDS'] = {'replica': replica_url}
+    
+    # Connection pool per process and bind (pool_pre_ping drops connections the server closed)
+    app.config['DB_POOL_SIZE'] = int(os.getenv('DB_POOL_SIZE', 10))
+    app.config['DB_MAX_OVERFLOW'] = int(os.getenv('DB_MAX_OVERFLOW', 20))
+    app.config['DB_POOL_TIMEOUT'] = float(os.getenv('DB_POOL_TIMEOUT', 5))
+    app.config['DB_POOL_RECYCLE'] = int(os.getenv('DB_POOL_RECYCLE', 1800))
+    app.config['DB_POOL_PRE_PING'] = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+    app.config['DASHBOARD_STATEMENT_TIMEOUT_MS'] = int(os.getenv('DASHBOARD_STATEMENT_TIMEOUT_MS', 5000))
+    # /api/ready answers 503 once any pool is this full
+    app.config['READY_POOL_SATURATION'] = float(os.getenv('READY_POOL_SATURATION', 0.9))
     app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'jwt-secret-change-in-production')
     app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(days=7)
+    app.config['PRINCIPAL_CACHE_TTL'] = float(os.getenv('PRINCIPAL_CACHE_TTL', 30))
+    
+    # Login/register throttling protects CPU from password hashing bursts
+    app.config['AUTH_IP_LIMIT'] = int(os.getenv('AUTH_IP_LIMIT', 20))
+    app.config['AUTH_IP_WINDOW_SECONDS'] = float(os.getenv('AUTH_IP_WINDOW_SECONDS', 60))
+    app.config['AUTH_EMAIL_LIMIT'] = int(os.getenv('AUTH_EMAIL_LIMIT', 5))
+    app.config['AUTH_EMAIL_WINDOW_SECONDS'] = float(os.getenv('AUTH_EMAIL_WINDOW_SECONDS', 300))
+    app.config['PASSWORD_HASH_MAX_CONCURRENT'] = int(os.getenv('PASSWORD_HASH_MAX_CONCURRENT', 0)) or None
+    app.config['PASSWORD_HASH_MAX_QUEUE'] = int(os.getenv('PASSWORD_HASH_MAX_QUEUE', 0)) or None
+    
+    # Schema bootstrap (disable when migrations run as a separate deploy step)
+    app.config['SCHEMA_CHECK_ON_STARTUP'] = os.getenv('SCHEMA_CHECK_ON_STARTUP', 'true').lower() == 'true'
+    
+    # Dashboard live stream
+    app.config['SSE_HEARTBEAT_SECONDS'] = int(os.getenv('SSE_HEARTBEAT_SECONDS', 15))
+    app.config['SSE_BUFFER_SIZE'] = int(os.getenv('SSE_BUFFER_SIZE', 100))
+    app.config['SSE_TOKEN_SECONDS'] = int(os.getenv('SSE_TOKEN_SECONDS', 60))
+    
+    # SQL instrumentation
+    app.config['SQL_N_PLUS_ONE_THRESHOLD'] = int(os.getenv('SQL_N_PLUS_ONE_THRESHOLD', 5))
+    app.config['SQL_DEBUG_HEADERS'] = os.getenv('SQL_DEBUG_HEADERS', 'false').lower() == 'true'
+    app.config['SLOW_QUERY_MS'] = float(os.getenv('SLOW_QUERY_MS', 500))
+    app.config['SLOW_QUERY_LOG_SIZE'] = int(os.getenv('SLOW_QUERY_LOG_SIZE', 200))
+    app.config['SLOW_QUERY_EXPLAIN'] = os.getenv('SLOW_QUERY_EXPLAIN', 'true').lower() == 'true'
+    
+    # Request profiling (signed X-Profile-Request header or sampled percentage)
+    app.config['PROFILE_DIR'] = os.getenv('PROFILE_DIR', 'logs/profiles')
+    app.config['PROFILE_SAMPLE_RATE'] = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+    app.config['PROFILE_FORMAT'] = os.getenv('PROFILE_FORMAT', 'speedscope')
+    app.config['PROFILE_INTERVAL_MS'] = float(os.getenv('PROFILE_INTERVAL_MS', 5))
+    app.config['PROFILE_SECRET'] = os.getenv('PROFILE_SECRET')
+    app.config['PROFILE_MAX_CONCURRENT'] = int(os.getenv('PROFILE_MAX_CONCURRENT', 2))
+    app.config['PROFILE_MAX_FILES'] = int(os.getenv('PROFILE_MAX_FILES', 200))
+    
+    # Extra crawler user-agent tokens and CIDRs for the capture webhook
+    app.config['CRAWLER_EXTRA_USER_AGENTS'] = [t.strip() for t in os.getenv('CRAWLER_EXTRA_USER_AGENTS', '').split(',') if t.strip()]
+    app.config['CRAWLER_EXTRA_NETWORKS'] = [n.strip() for n in os.getenv('CRAWLER_EXTRA_NETWORKS', '').split(',') if n.strip()]
+    
+    # Repeat clicks within this window reuse the visitor's invite link (0 disables)
+    app.config['CLICK_COALESCE_TTL'] = float(os.getenv('CLICK_COALESCE_TTL', 600))
+    app.config['CLICK_COALESCE_MAX_ENTRIES'] = int(os.getenv('CLICK_COALESCE_MAX_ENTRIES', 50000))
+    
+    # Invite link creation: Bot API timeout and per-bot circuit breaker
+    app.config['INVITE_LINK_TIMEOUT_SECONDS'] = float(os.getenv('INVITE_LINK_TIMEOUT_SECONDS', 3))
+    app.config['INVITE_BREAKER_FAILURES'] = int(os.getenv('INVITE_BREAKER_FAILURES', 5))
+    app.config['INVITE_BREAKER_SLOW_SECONDS'] = float(os.getenv('INVITE_BREAKER_SLOW_SECONDS', 2))
+    app.config['INVITE_BREAKER_RESET_SECONDS'] = float(os.getenv('INVITE_BREAKER_RESET_SECONDS', 30))
+    
+    # Bot health checks: per-token result cache and concurrent Bot API calls
+    app.config['BOT_HEALTH_CACHE_TTL'] = float(os.getenv('BOT_HEALTH_CACHE_TTL', 60))
+    app.config['BOT_HEALTH_MAX_WORKERS'] = int(os.getenv('BOT_HEALTH_MAX_WORKERS', 32))
+    
+    # Background jobs (opt-in); one process per host runs them, via the lock file
+    app.config['SCHEDULER_ENABLED'] = os.getenv('SCHEDULER_ENABLED', 'false').lower() == 'true'
+    app.config['SCHEDULER_LOCK_FILE'] = os.getenv('SCHEDULER_LOCK_FILE', '/tmp/utm-tracker-scheduler.lock')
+    
+    # Invite link reaper: revoke and compact links past the attribution window
+    app.config['REAPER_INTERVAL_SECONDS'] = float(os.getenv('REAPER_INTERVAL_SECONDS', 300))
+    app.config['REAPER_ATTRIBUTION_HOURS'] = float(os.getenv('REAPER_ATTRIBUTION_HOURS', 72))
+    app.config['REAPER_BATCH_SIZE'] = int(os.getenv('REAPER_BATCH_SIZE', 500))
+    app.config['REAPER_REVOKE_PER_SECOND'] = float(os.getenv('REAPER_REVOKE_PER_SECOND', 20))
+    
+    # Background job queue (run workers with `python -m src.worker`)
+    app.config['JOB_VISIBILITY_TIMEOUT'] = int(os.getenv('JOB_VISIBILITY_TIMEOUT', 300))
+    app.config['JOB_MAX_ATTEMPTS'] = int(os.getenv('JOB_MAX_ATTEMPTS', 5))
+    app.config['JOB_BACKOFF_BASE_SECONDS'] = float(os.getenv('JOB_BACKOFF_BASE_SECONDS', 10))
+    app.config['JOB_BACKOFF_MAX_SECONDS'] = float(os.getenv('JOB_BACKOFF_MAX_SECONDS', 3600))
+    app.config['JOB_STATS_SECONDS'] = float(os.getenv('JOB_STATS_SECONDS', 15))
+    app.config['EXPORT_RETENTION_HOURS'] = float(os.getenv('EXPORT_RETENTION_HOURS', 24))
+    app.config['EXPORT_PURGE_INTERVAL_SECONDS'] = float(os.getenv('EXPORT_PURGE_INTERVAL_SECONDS', 3600))
+    
+    # SQLite profile: connection PRAGMAs and a single batching writer thread
+    app.config['SQLITE_JOURNAL_MODE'] = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+    app.config['SQLITE_SYNCHRONOUS'] = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    app.config['SQLITE_MMAP_BYTES'] = int(os.getenv('SQLITE_MMAP_BYTES', 268435456))
+    app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    app.config['SQLITE_WRITE_QUEUE'] = os.getenv('SQLITE_WRITE_QUEUE', 'true').lower() == 'true'
+    app.config['SQLITE_WRITE_BATCH_SIZE'] = int(os.getenv('SQLITE_WRITE_BATCH_SIZE', 200))
+    app.config['SQLITE_WRITE_BATCH_WAIT_MS'] = float(os.getenv('SQLITE_WRITE_BATCH_WAIT_MS', 2))
+    app.config['SQLITE_WRITE_TIMEOUT_SECONDS'] = float(os.getenv('SQLITE_WRITE_TIMEOUT_SECONDS', 10))
+    
+    # Write-behind click inserts: rows are bulk-inserted every CLICK_BUFFER_FLUSH_MS
+    app.config['CLICK_WRITE_BEHIND'] = os.getenv('CLICK_WRITE_BEHIND', 'false').lower() == 'true'
+    app.config['CLICK_BUFFER_FLUSH_MS'] = float(os.getenv('CLICK_BUFFER_FLUSH_MS', 500))
+    app.config['CLICK_BUFFER_MAX_ROWS'] = int(os.getenv('CLICK_BUFFER_MAX_ROWS', 500))
+    app.config['CLICK_BUFFER_MAX_PENDING'] = int(os.getenv('CLICK_BUFFER_MAX_PENDING', 50000))
+    
+    # Per-process Bloom filter of invite codes, so joins through foreign links skip the DB
+    app.config['INVITE_CODE_FILTER'] = os.getenv('INVITE_CODE_FILTER', 'true').lower() == 'true'
+    app.config['INVITE_CODE_FILTER_CAPACITY'] = int(os.getenv('INVITE_CODE_FILTER_CAPACITY', 1000000))
+    app.config['INVITE_CODE_FILTER_ERROR_RATE'] = float(os.getenv('INVITE_CODE_FILTER_ERROR_RATE', 0.001))
+    app.config['INVITE_CODE_FILTER_SYNC_SECONDS'] = float(os.getenv('INVITE_CODE_FILTER_SYNC_SECONDS', 30))
+    app.config['INVITE_CODE_FILTER_MARGIN_SECONDS'] = float(os.getenv('INVITE_CODE_FILTER_MARGIN_SECONDS', 300))
+    
+    # Invite codes embed this host number; defaults to a hash of the host name,
+    # which can collide, so set it on every host of a multi-host deployment
+    app.config['INVITE_CODE_NODE_ID'] = os.getenv('INVITE_CODE_NODE_ID')
+    
+    # Admin endpoints are limited to these accounts
+    app.config['ADMIN_EMAILS'] = {
+        email.strip().lower() for email in os.getenv('ADMIN_EMAILS', '').split(',') if email.strip()
+    }
+    
+    # Prometheus metrics (set METRICS_MULTIPROC_DIR when running several worker processes)
+    app.config['METRICS_MULTIPROC_DIR'] = os.getenv('METRICS_MULTIPROC_DIR')
+    app.config['METRICS_FLUSH_SECONDS'] = float(os.getenv('METRICS_FLUSH_SECONDS', 5))
+    app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN')
     
     # Production settings
     if os.getenv('FLASK_ENV') == 'production':
         app.config['DEBUG'] = False
         app.config['TESTING'] = False
     
+    startup.mark('config')
+    
+    # Client IPs for rate limits, crawler checks and click fingerprints come from
+    # request.remote_addr, which is the proxy's address unless this is set
+    proxies = app.config['TRUSTED_PROXY_COUNT']
+    if proxies:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies, x_proto=proxies, x_host=proxies)
+    
     # Initialize extensions
+    init_sqlite_profile(app)
     db.init_app(app)
+    init_db_pool(app)
+    init_query_instrumentation(app)
+    init_metrics(app)
+    init_profiling(app)
     jwt = JWTManager(app)
+    init_principal_cache(app, jwt)
+    init_auth_rate_limits(app)
+    init_crawler_detection(app)
+    init_click_coalescing(app)
+    init_circuit_breakers(app)
+    init_bot_health(app)
+    init_scheduler(app)
+    init_invite_codes(app)
+    init_click_buffer(app)
+    init_invite_code_filter(app)
     
     # CORS configuration
     cors_origins = os.getenv('CORS_ORIGINS', '*')
@@ -49,12 +236,17 @@ def create_app():
     else:
         CORS(app, origins=cors_origins.split(','))
     
+    startup.mark('extensions')
+    
     # Register blueprints
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(telegram_bots_bp, url_prefix='/api/telegram-bots')
     app.register_blueprint(campaigns_bp, url_prefix='/api/campaigns')
     app.register_blueprint(webhooks_bp, url_prefix='/api/webhooks')
     app.register_blueprint(dashboard_bp, url_prefix='/api/dashboard')
+    app.register_blueprint(admin_bp, url_prefix='/api/admin')
+    
+    startup.mark('blueprints')
     
     # Health check endpoint
     @app.route('/api/health')
@@ -66,24 +258,49 @@ def create_app():
             'environment': os.getenv('FLASK_ENV', 'development')
         })
     
+    # Readiness for the load balancer: not ready while a connection pool is saturated
+    @app.route('/api/ready')
+    def readiness_check():
+        pools = pool_status(app)
+        threshold = app.config['READY_POOL_SATURATION']
+        saturated = [bind for bind, pool in pools.items() if pool['saturation'] >= threshold]
+        return jsonify({
+            'status': 'saturated' if saturated else 'ready',
+            'saturated': saturated,
+            'pools': pools
+        }), 503 if saturated else 200
+    
     # Serve React app
+    static_manifest = StaticManifest(static_root).build()
+    app.extensions['static_manifest'] = static_manifest
+    
     @app.route('/')
     def serve_react_app():
-        return send_from_directory(app.static_folder, 'index.html')
+        return static_manifest.serve_path('index.html')
     
     @app.route('/<path:path>')
     def serve_react_routes(path):
-        
-        # Check if file exists in static folder
-        if os.path.exists(os.path.join(app.static_folder, path)):
-            return send_from_directory(app.static_folder, path)
-        
-        # Otherwise serve React app (for client-side routing)
-        return send_from_directory(app.static_folder, 'index.html')
-    
-    # Create tables
-    with app.app_context():
-        db.create_all()
+        # Files from the build, otherwise the React app (for client-side routing)
+        return static_manifest.serve_path(path)
+    
+    startup.mark('static_manifest', files=len(static_manifest.assets))
+    
+    # Verify the schema once per process, off the request path
+    if app.config['SCHEMA_CHECK_ON_STARTUP']:
+        with app.app_context():
+            schema_report = ensure_schema()
+            
+            # A local SQLite replica file (REPLICA_ASSUMED_LAG_SECONDS) needs the
+            # same schema as the primary
+            replica = db.engines.get('replica')
+            if replica is not None and replica.dialect.name == 'sqlite':
+                db.metadata.create_all(replica)
+        startup.mark('schema', action=schema_report['action'], version=schema_report['version'])
+    
+    app.extensions['startup_report'] = startup
+    metrics.define_gauge('app_startup_seconds', 'max')
+    metrics.set_gauge('app_startup_seconds', startup.total_ms / 1000)
+    startup.log(app.logger)
     
     return app
 
@@ -95,5 +312,6 @@ if __name__ == '__main__':
     port = int(os.getenv('PORT', 5000))
     debug = os.getenv('DEBUG', 'false').lower() == 'true'
     
+    start_scheduler(app)
     app.run(host=host, port=port, debug=debug)
 
@@ -1,9 +1,13 @@
 from flask_sqlalchemy import SQLAlchemy
+from src.models.routing import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 from src.models.user import User
 from src.models.telegram_bot import TelegramBot
 from src.models.campaign import Campaign
 from src.models.lead import TelegramLead
 from src.models.invite_link import InviteLink
+from src.models.click_aggregate import ClickAggregate
+from src.models.job import Job, JobOutput
+from src.models.schema_version import SchemaVersion
@@ -1,20 +1,26 @@
 from datetime import datetime
-import uuid
 from src.models import db
+from src.models.ids import CompactUUID, new_id
+
+# per_click: a new invite link per click; per_utm: one static link per UTM combination
+ATTRIBUTION_MODES = ('per_click', 'per_utm')
 
 class Campaign(db.Model):
     __tablename__ = 'campaigns'
     __table_args__ = {'extend_existing': True}
     
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
-    telegram_bot_id = db.Column(db.String(36), db.ForeignKey('telegram_bots.id'), nullable=False)
+    id = db.Column(CompactUUID, primary_key=True, default=new_id)
+    user_id = db.Column(CompactUUID, db.ForeignKey('users.id'), nullable=False)
+    telegram_bot_id = db.Column(CompactUUID, db.ForeignKey('telegram_bots.id'), nullable=False)
     name = db.Column(db.String(255), nullable=False)
     description = db.Column(db.Text)
     is_active = db.Column(db.Boolean, default=True)
+    attribution_mode = db.Column(db.String(20), nullable=False, default='per_click')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    telegram_bot = db.relationship('TelegramBot', backref='campaigns')
+    
     @property
     def script_code(self):
         """Generate JavaScript tracking script for this campaign"""
@@ -43,6 +49,7 @@ document.addEventListener("DOMContentLoaded", function() {{
             'description': self.description,
             'telegram_bot_id': self.telegram_bot_id,
             'is_active': self.is_active,
+            'attribution_mode': self.attribution_mode,
             'script_code': self.script_code,
             'capture_webhook_url': self.capture_webhook_url,
             'member_webhook_url': self.member_webhook_url,
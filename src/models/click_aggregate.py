@@ -0,0 +1,43 @@
+from datetime import datetime
+from src.models import db
+from src.models.ids import CompactUUID, new_id
+
+class ClickAggregate(db.Model):
+    """Daily click counts per campaign and UTM combination, folded in from
+    invite links past their attribution window"""
+    __tablename__ = 'click_aggregates'
+    __table_args__ = (
+        db.UniqueConstraint(
+            'campaign_id', 'day', 'utm_source', 'utm_medium', 'utm_campaign', 'utm_content', 'utm_term',
+            name='uq_click_aggregates_key'
+        ),
+        {'extend_existing': True}
+    )
+    
+    id = db.Column(CompactUUID, primary_key=True, default=new_id)
+    campaign_id = db.Column(CompactUUID, db.ForeignKey('campaigns.id'), nullable=False, index=True)
+    day = db.Column(db.Date, nullable=False)
+    
+    # UTM Parameters ('' rather than NULL so the unique key matches)
+    utm_source = db.Column(db.String(255), nullable=False, default='')
+    utm_medium = db.Column(db.String(255), nullable=False, default='')
+    utm_campaign = db.Column(db.String(255), nullable=False, default='')
+    utm_content = db.Column(db.String(255), nullable=False, default='')
+    utm_term = db.Column(db.String(255), nullable=False, default='')
+    
+    clicks = db.Column(db.Integer, nullable=False, default=0)
+    conversions = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'campaign_id': self.campaign_id,
+            'day': self.day.isoformat() if self.day else None,
+            'utm_source': self.utm_source,
+            'utm_medium': self.utm_medium,
+            'utm_campaign': self.utm_campaign,
+            'utm_content': self.utm_content,
+            'utm_term': self.utm_term,
+            'clicks': self.clicks,
+            'conversions': self.conversions,
+        }
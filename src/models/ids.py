@@ -0,0 +1,73 @@
+import os
+import time
+import uuid
+from sqlalchemy import LargeBinary, String
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.types import TypeDecorator
+
+def uuid7():
+    """Time-ordered UUID (version 7): 48-bit Unix milliseconds, then random bits.
+
+    Keys created close together sort together, so inserts land at the right
+    edge of the primary key index instead of on random pages.
+    """
+    value = (int(time.time() * 1000) & 0xFFFFFFFFFFFF) << 80
+    value |= int.from_bytes(os.urandom(10), 'big')
+    # Version and variant bits
+    value = (value & ~(0xF << 76)) | (0x7 << 76)
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)
+    return uuid.UUID(int=value)
+
+def new_id():
+    return str(uuid7())
+
+def _parse(value):
+    if isinstance(value, uuid.UUID):
+        return value
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        return None
+
+class CompactUUID(TypeDecorator):
+    """UUID primary/foreign key stored in 16 bytes, exposed as its string form.
+
+    PostgreSQL gets the native uuid type and SQLite a 16-byte blob; other
+    databases keep the 36-character string. Application code keeps passing
+    and receiving canonical strings. A value that is not a UUID binds as
+    NULL, so lookups by a malformed id simply match nothing.
+    """
+
+    impl = String(36)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'postgresql':
+            return dialect.type_descriptor(postgresql.UUID(as_uuid=True))
+        if dialect.name == 'sqlite':
+            return dialect.type_descriptor(LargeBinary(16))
+        return dialect.type_descriptor(String(36))
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        parsed = _parse(value)
+        if parsed is None:
+            return None
+        if dialect.name == 'postgresql':
+            return parsed
+        if dialect.name == 'sqlite':
+            return parsed.bytes
+        return str(parsed)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, bytes):
+            return str(uuid.UUID(bytes=value))
+        # Native uuid, or a row written before the id migration
+        return str(value)
+
+    @property
+    def python_type(self):
+        return str
@@ -1,13 +1,16 @@
 from datetime import datetime
-import uuid
 from src.models import db
+from src.models.ids import CompactUUID, new_id
+
+# Lifetime of invite links created for private channels
+PRIVATE_LINK_TTL_SECONDS = 24 * 60 * 60
 
 class InviteLink(db.Model):
     __tablename__ = 'invite_links'
     __table_args__ = {'extend_existing': True}
     
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    campaign_id = db.Column(db.String(36), db.ForeignKey('campaigns.id'), nullable=False)
+    id = db.Column(CompactUUID, primary_key=True, default=new_id)
+    campaign_id = db.Column(CompactUUID, db.ForeignKey('campaigns.id'), nullable=False)
     code = db.Column(db.String(255), unique=True, nullable=False)
     
     # UTM Parameters
@@ -20,7 +23,14 @@ class InviteLink(db.Model):
     # Telegram invite link
     telegram_invite_link = db.Column(db.String(255))
     
+    # active: named link for this click; pending: sent to the chat's primary
+    # link while the Bot API was unavailable, so joins stay unattributed
+    status = db.Column(db.String(20), nullable=False, default='active')
+    
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # When the row reached the database; later than created_at for clicks
+    # held in the write-behind buffer
+    inserted_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     
     def to_dict(self):
         return {
@@ -32,6 +42,7 @@ class InviteLink(db.Model):
             'utm_content': self.utm_content,
             'utm_term': self.utm_term,
             'telegram_invite_link': self.telegram_invite_link,
+            'status': self.status,
             'created_at': self.created_at.isoformat() if self.created_at else None,
         }
 
@@ -0,0 +1,62 @@
+from datetime import datetime
+import json
+from src.models import db
+from src.models.ids import CompactUUID, new_id
+
+class Job(db.Model):
+    """Background job; workers claim due jobs by priority, then run_at"""
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        db.Index('ix_jobs_claim', 'status', 'run_at', 'priority'),
+        {'extend_existing': True}
+    )
+    
+    id = db.Column(CompactUUID, primary_key=True, default=new_id)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text)
+    priority = db.Column(db.Integer, nullable=False, default=0)  # higher runs first
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed
+    owner_id = db.Column(CompactUUID, db.ForeignKey('users.id'))
+    
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = db.Column(db.String(100))
+    locked_until = db.Column(db.DateTime)
+    
+    last_error = db.Column(db.Text)
+    result = db.Column(db.Text)
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    @property
+    def data(self):
+        return json.loads(self.payload) if self.payload else {}
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'priority': self.priority,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'run_at': self.run_at.isoformat() if self.run_at else None,
+            'last_error': self.last_error,
+            'result': json.loads(self.result) if self.result else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+class JobOutput(db.Model):
+    """Large result of a finished job (export files), kept out of the jobs
+    table and shared by every process that serves it"""
+    __tablename__ = 'job_outputs'
+    __table_args__ = {'extend_existing': True}
+    
+    job_id = db.Column(CompactUUID, db.ForeignKey('jobs.id'), primary_key=True)
+    content = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
@@ -1,14 +1,17 @@
 from datetime import datetime
-import uuid
 from src.models import db
+from src.models.ids import CompactUUID, new_id
 
-class Lead(db.Model):
+class TelegramLead(db.Model):
     __tablename__ = 'leads'
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        db.Index('uq_leads_campaign_telegram', 'campaign_id', 'telegram_id', unique=True),
+        {'extend_existing': True}
+    )
     
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
-    campaign_id = db.Column(db.String(36), db.ForeignKey('campaigns.id'), nullable=False)
+    id = db.Column(CompactUUID, primary_key=True, default=new_id)
+    user_id = db.Column(CompactUUID, db.ForeignKey('users.id'), nullable=False)
+    campaign_id = db.Column(CompactUUID, db.ForeignKey('campaigns.id'), nullable=False)
     telegram_id = db.Column(db.String(255), nullable=False)
     username = db.Column(db.String(255))
     first_name = db.Column(db.String(255))
@@ -22,13 +25,19 @@ class Lead(db.Model):
     utm_term = db.Column(db.String(255))
     
     # Additional data
+    # Click the lead joined through; no foreign key because the reaper deletes old links
+    invite_link_id = db.Column(CompactUUID, index=True)
     invite_link = db.Column(db.String(255))
     link_name = db.Column(db.String(255))
+    group_name = db.Column(db.String(255))
+    entry_date = db.Column(db.DateTime)
     status = db.Column(db.String(50), default='active')  # active, inactive, banned
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    campaign = db.relationship('Campaign')
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -43,8 +52,9 @@ class Lead(db.Model):
             'utm_term': self.utm_term,
             'invite_link': self.invite_link,
             'link_name': self.link_name,
+            'group_name': self.group_name,
+            'entry_date': self.entry_date.isoformat() if self.entry_date else None,
             'status': self.status,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
         }
-
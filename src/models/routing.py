@@ -0,0 +1,90 @@
+import threading
+import time
+from flask import current_app, g, has_app_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import text
+from src.services.metrics import metrics
+
+REPLICA_BIND_KEY = 'replica'
+
+# Replication lag on a hot standby; zero when the standby has replayed everything it received
+POSTGRES_LAG_SQL = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0 "
+    "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+_lag_lock = threading.Lock()
+_lag_state = {'checked_at': 0.0, 'lag': None}
+
+class RoutingSession(Session):
+    """Session that sends reads to the replica bind when the request opted in"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and _is_read(clause) and _wants_replica():
+            engine = self._db.engines.get(REPLICA_BIND_KEY)
+            if engine is not None:
+                return engine
+
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def _is_read(clause):
+    return clause is not None and getattr(clause, 'is_select', False)
+
+def _wants_replica():
+    return has_app_context() and g.get('use_read_replica', False)
+
+def measure_replica_lag(engine):
+    """Return replication lag in seconds for the replica engine, or None
+    when it cannot be measured"""
+    if engine.dialect.name != 'postgresql':
+        # A second SQLite file (or any non-PostgreSQL bind) is not fed by a
+        # replication stream, so its lag is unknown and reads stay on the primary
+        # unless REPLICA_ASSUMED_LAG_SECONDS says otherwise
+        return None
+
+    with engine.connect() as connection:
+        return float(connection.execute(POSTGRES_LAG_SQL).scalar() or 0)
+
+def replica_lag():
+    """Cached replica lag in seconds, or None when the replica is unreachable"""
+    engine = current_app.extensions['sqlalchemy'].engines.get(REPLICA_BIND_KEY)
+    if engine is None:
+        return None
+
+    assumed = current_app.config.get('REPLICA_ASSUMED_LAG_SECONDS')
+    if assumed is not None:
+        return assumed
+
+    interval = current_app.config.get('REPLICA_LAG_CHECK_SECONDS', 5)
+    now = time.monotonic()
+
+    with _lag_lock:
+        fresh = now - _lag_state['checked_at'] < interval
+        metrics.record_cache('replica_lag', fresh)
+        if fresh:
+            return _lag_state['lag']
+        # Claim the refresh so concurrent requests keep using the last value
+        _lag_state['checked_at'] = now
+
+    try:
+        lag = measure_replica_lag(engine)
+    except Exception as e:
+        current_app.logger.warning('Replica lag check failed: %s', e)
+        lag = None
+
+    with _lag_lock:
+        _lag_state['lag'] = lag
+    return lag
+
+def route_reads_to_replica():
+    """before_request hook that sends this request's SELECTs to the replica
+    unless it lags beyond REPLICA_MAX_LAG_SECONDS"""
+    lag = replica_lag()
+    max_lag = current_app.config.get('REPLICA_MAX_LAG_SECONDS', 10)
+    g.use_read_replica = lag is not None and lag <= max_lag
+
+def route_get_requests_to_replica():
+    """before_request hook for blueprints that mix reads and writes"""
+    if request.method == 'GET':
+        route_reads_to_replica()
@@ -0,0 +1,10 @@
+from datetime import datetime
+from src.models import db
+
+class SchemaVersion(db.Model):
+    __tablename__ = 'schema_version'
+    __table_args__ = {'extend_existing': True}
+    
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
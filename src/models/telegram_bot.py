@@ -1,13 +1,13 @@
 from datetime import datetime
-import uuid
 from src.models import db
+from src.models.ids import CompactUUID, new_id
 
 class TelegramBot(db.Model):
     __tablename__ = 'telegram_bots'
     __table_args__ = {'extend_existing': True}
     
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
+    id = db.Column(CompactUUID, primary_key=True, default=new_id)
+    user_id = db.Column(CompactUUID, db.ForeignKey('users.id'), nullable=False)
     bot_token = db.Column(db.String(255), nullable=False)
     bot_username = db.Column(db.String(255))
     chat_id = db.Column(db.String(255), nullable=False)
@@ -15,6 +15,12 @@ class TelegramBot(db.Model):
     chat_type = db.Column(db.String(50), default='channel')  # channel, group, supergroup
     is_private = db.Column(db.Boolean, default=False)
     is_active = db.Column(db.Boolean, default=True)
+    # Chat-wide link used when per-click links cannot be created
+    primary_invite_link = db.Column(db.String(255))
+    # Outcome of the last health check
+    last_status = db.Column(db.String(30))
+    last_checked_at = db.Column(db.DateTime)
+    pending_update_count = db.Column(db.Integer)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -27,6 +33,10 @@ class TelegramBot(db.Model):
             'chat_type': self.chat_type,
             'is_private': self.is_private,
             'is_active': self.is_active,
+            'primary_invite_link': self.primary_invite_link,
+            'last_status': self.last_status,
+            'last_checked_at': self.last_checked_at.isoformat() if self.last_checked_at else None,
+            'pending_update_count': self.pending_update_count,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
         }
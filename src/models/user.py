@@ -1,18 +1,19 @@
 from datetime import datetime
-import uuid
 from werkzeug.security import generate_password_hash, check_password_hash
 from src.models import db
+from src.models.ids import CompactUUID, new_id
 
 class User(db.Model):
     __tablename__ = 'users'
     __table_args__ = {'extend_existing': True}
     
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = db.Column(CompactUUID, primary_key=True, default=new_id)
     email = db.Column(db.String(255), unique=True, nullable=False)
     password_hash = db.Column(db.String(255), nullable=False)
     name = db.Column(db.String(255), nullable=False)
     plan = db.Column(db.String(50), default='free')
     is_active = db.Column(db.Boolean, default=True)
+    token_version = db.Column(db.Integer, nullable=False, default=0)  # bumped to revoke issued tokens
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
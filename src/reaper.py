@@ -0,0 +1,34 @@
+"""Revoke and compact invite links past their attribution window.
+
+Usage:
+    python -m src.reaper            # process batches until nothing is left
+    python -m src.reaper --once     # a single batch
+    python -m src.reaper --dry-run  # report what the first batch would do
+"""
+import argparse
+import json
+from src.main import app
+from src.services.reaper import reap_invite_links
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--once', action='store_true', help='process a single batch')
+    parser.add_argument('--dry-run', action='store_true', help='only report what would be done')
+    parser.add_argument('--window-hours', type=float, help='attribution window (default REAPER_ATTRIBUTION_HOURS)')
+    parser.add_argument('--batch-size', type=int, help='links per batch (default REAPER_BATCH_SIZE)')
+    args = parser.parse_args()
+
+    with app.app_context():
+        while True:
+            report = reap_invite_links(
+                window_hours=args.window_hours,
+                batch_size=args.batch_size,
+                dry_run=args.dry_run
+            )
+            print(json.dumps(report))
+            # Stop on an empty batch or when the Bot API asked us to back off
+            if args.once or args.dry_run or not report['compacted'] or report['deferred']:
+                break
+
+if __name__ == '__main__':
+    main()
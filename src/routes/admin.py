@@ -0,0 +1,112 @@
+from functools import wraps
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from src.models.user import User
+from src.services.slow_queries import slow_query_log
+from src.services.profiler import request_profiling
+from src.services.jobs import queue_stats
+from src.services.code_filter import invite_code_filter
+from src.models.job import Job
+
+admin_bp = Blueprint('admin', __name__)
+
+def admin_required(fn):
+    """Allow only users listed in ADMIN_EMAILS"""
+    @wraps(fn)
+    @jwt_required()
+    def wrapper(*args, **kwargs):
+        user = User.query.get(get_jwt_identity())
+        admins = current_app.config.get('ADMIN_EMAILS', set())
+        if not user or not user.is_active or user.email not in admins:
+            return jsonify({'error': 'Admin access required'}), 403
+        return fn(*args, **kwargs)
+    return wrapper
+
+@admin_bp.route('/admin/slow-queries', methods=['GET'])
+@admin_required
+def get_slow_queries():
+    try:
+        limit = min(int(request.args.get('limit', 50)), 500)
+        entries = slow_query_log.entries()
+        
+        return jsonify({
+            'slow_queries': entries[:limit],
+            'total': len(entries),
+            'threshold_ms': slow_query_log.threshold_ms
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to get slow queries', 'details': str(e)}), 500
+
+@admin_bp.route('/admin/slow-queries', methods=['DELETE'])
+@admin_required
+def clear_slow_queries():
+    slow_query_log.clear()
+    return jsonify({'message': 'Slow query log cleared'}), 200
+
+@admin_bp.route('/admin/profiling', methods=['GET'])
+@admin_required
+def get_profiling():
+    return jsonify({
+        'sample_rate': request_profiling.sample_rate,
+        'format': request_profiling.output_format,
+        'directory': request_profiling.directory,
+        'profiles': request_profiling.list_profiles()
+    }), 200
+
+@admin_bp.route('/admin/profiling', methods=['PUT'])
+@admin_required
+def update_profiling():
+    try:
+        data = request.get_json() or {}
+        
+        if 'sample_rate' in data:
+            sample_rate = float(data['sample_rate'])
+            if not 0 <= sample_rate <= 1:
+                return jsonify({'error': 'sample_rate must be between 0 and 1'}), 400
+            request_profiling.sample_rate = sample_rate
+        
+        return jsonify({
+            'message': 'Profiling settings updated',
+            'sample_rate': request_profiling.sample_rate
+        }), 200
+        
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': 'Invalid profiling settings', 'details': str(e)}), 400
+
+@admin_bp.route('/admin/startup', methods=['GET'])
+@admin_required
+def get_startup_report():
+    report = current_app.extensions.get('startup_report')
+    if report is None:
+        return jsonify({'error': 'No startup report recorded'}), 404
+    
+    return jsonify({'startup': report.to_dict()}), 200
+
+@admin_bp.route('/admin/jobs', methods=['GET'])
+@admin_required
+def get_job_queue():
+    try:
+        failed = Job.query.filter_by(status='failed').order_by(Job.finished_at.desc()).limit(20).all()
+        
+        return jsonify({
+            'queue': queue_stats(),
+            'recent_failures': [job.to_dict() for job in failed]
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to get job queue', 'details': str(e)}), 500
+
+@admin_bp.route('/admin/jobs/<job_id>', methods=['GET'])
+@admin_required
+def get_job(job_id):
+    job = Job.query.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return jsonify({'job': job.to_dict()}), 200
+
+@admin_bp.route('/admin/invite-code-filter', methods=['GET'])
+@admin_required
+def get_invite_code_filter():
+    return jsonify({'filter': invite_code_filter.stats()}), 200
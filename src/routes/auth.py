@@ -2,6 +2,9 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from src.models import db
 from src.models import User
+from src.services.schema import ensure_schema
+from src.services.principal import principal_cache, token_claims, revoke_user_tokens
+from src.services.rate_limit import check_auth_rate_limits, hashing_pool, HashingBusy, too_many_requests
 import re
 
 auth_bp = Blueprint('auth', __name__)
@@ -29,7 +32,7 @@ def test():
 def init_db():
     try:
         # Criar todas as tabelas
-        db.create_all()
+        schema = ensure_schema(force=True)
         
         # Verificar se as tabelas foram criadas
         inspector = db.inspect(db.engine)
@@ -38,6 +41,7 @@ def init_db():
         return jsonify({
             'message': 'Database initialized successfully',
             'tables': tables,
+            'schema': schema,
             'status': 'success'
         }), 200
         
@@ -51,13 +55,6 @@ def init_db():
 @auth_bp.route('/register', methods=['POST'])
 def register():
     try:
-        # Garantir que as tabelas existem
-        if not ensure_tables_exist():
-            return jsonify({
-                'error': 'Failed to initialize database tables',
-                'action': 'database_error'
-            }), 500
-        
         data = request.get_json()
         
         # Validate required fields
@@ -77,6 +74,11 @@ def register():
         if not is_valid:
             return jsonify({'error': error_msg}), 400
         
+        # Reject bursts before doing any database or hashing work
+        limited = check_auth_rate_limits(email, 'register')
+        if limited:
+            return limited
+        
         # Check if user already exists
         existing_user = User.query.filter_by(email=email).first()
         if existing_user:
@@ -84,13 +86,13 @@ def register():
         
         # Create new user
         user = User(email=email, name=name)
-        user.set_password(password)
+        hashing_pool.run(user.set_password, password)
         
         db.session.add(user)
         db.session.commit()
         
         # Create access token
-        access_token = create_access_token(identity=user.id)
+        access_token = create_access_token(identity=user.id, additional_claims=token_claims(user))
         
         return jsonify({
             'message': 'User registered successfully',
@@ -98,6 +100,8 @@ def register():
             'access_token': access_token
         }), 201
         
+    except HashingBusy:
+        return too_many_requests(1, 'Server busy, try again shortly')
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -109,13 +113,6 @@ def register():
 @auth_bp.route('/login', methods=['POST'])
 def login():
     try:
-        # Garantir que as tabelas existem
-        if not ensure_tables_exist():
-            return jsonify({
-                'error': 'Failed to initialize database tables',
-                'action': 'database_error'
-            }), 500
-        
         data = request.get_json()
         
         # Validate required fields
@@ -125,17 +122,22 @@ def login():
         email = data['email'].lower().strip()
         password = data['password']
         
+        # Reject bursts before doing any database or hashing work
+        limited = check_auth_rate_limits(email, 'login')
+        if limited:
+            return limited
+        
         # Find user
         user = User.query.filter_by(email=email).first()
         
-        if not user or not user.check_password(password):
+        if not user or not hashing_pool.run(user.check_password, password):
             return jsonify({'error': 'Invalid email or password'}), 401
         
         if not user.is_active:
             return jsonify({'error': 'Account is deactivated'}), 401
         
         # Create access token
-        access_token = create_access_token(identity=user.id)
+        access_token = create_access_token(identity=user.id, additional_claims=token_claims(user))
         
         return jsonify({
             'message': 'Login successful',
@@ -143,6 +145,8 @@ def login():
             'access_token': access_token
         }), 200
         
+    except HashingBusy:
+        return too_many_requests(1, 'Server busy, try again shortly')
     except Exception as e:
         return jsonify({
             'error': 'Login failed',
@@ -155,13 +159,13 @@ def login():
 def get_current_user():
     try:
         current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        principal = principal_cache.get(current_user_id)
         
-        if not user:
+        if not principal:
             return jsonify({'error': 'User not found'}), 404
         
         return jsonify({
-            'user': user.to_dict()
+            'user': principal.profile
         }), 200
         
     except Exception as e:
@@ -170,6 +174,14 @@ def get_current_user():
 @auth_bp.route('/logout', methods=['POST'])
 @jwt_required()
 def logout():
-    # Note: With JWT, logout is typically handled client-side by removing the token
-    # For server-side logout, you would need to implement a token blacklist
-    return jsonify({'message': 'Logout successful'}), 200
+    try:
+        # Bumping the token version revokes every token issued to this user
+        user = User.query.get(get_jwt_identity())
+        if user:
+            revoke_user_tokens(user)
+        
+        return jsonify({'message': 'Logout successful'}), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Logout failed', 'details': str(e)}), 500
@@ -1,16 +1,23 @@
 from flask import Blueprint, request, jsonify, url_for
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from src.models import db
-from src.models.campaign import Campaign
+from src.models.campaign import Campaign, ATTRIBUTION_MODES
 from src.models.telegram_bot import TelegramBot
 from src.models.lead import TelegramLead
 from src.models.invite_link import InviteLink
-from sqlalchemy import func, desc
+from src.models.click_aggregate import ClickAggregate
+from src.models.routing import route_get_requests_to_replica
+from src.services.click_cache import click_coalescer
+from src.services.utm_links import static_code_clause, utm_link_index
+from sqlalchemy import func, desc, not_
 from datetime import datetime, timedelta
 import os
 
 campaigns_bp = Blueprint('campaigns', __name__)
 
+# Campaign listings and stats can be served from the read replica
+campaigns_bp.before_request(route_get_requests_to_replica)
+
 def generate_script_code(campaign_id, base_url):
     """Generate JavaScript code for UTM tracking"""
     webhook_url = f"{base_url}/api/webhooks/utm-capture/{campaign_id}"
@@ -107,6 +114,10 @@ def create_campaign():
         name = data['name'].strip()
         telegram_bot_id = data['telegram_bot_id']
         description = data.get('description', '').strip()
+        attribution_mode = data.get('attribution_mode', 'per_click')
+        
+        if attribution_mode not in ATTRIBUTION_MODES:
+            return jsonify({'error': f"attribution_mode must be one of: {', '.join(ATTRIBUTION_MODES)}"}), 400
         
         # Validate telegram bot belongs to user
         bot = TelegramBot.query.filter_by(
@@ -125,7 +136,8 @@ def create_campaign():
             user_id=current_user_id,
             telegram_bot_id=telegram_bot_id,
             name=name,
-            description=description
+            description=description,
+            attribution_mode=attribution_mode
         )
         
         db.session.add(campaign)
@@ -227,6 +239,11 @@ def update_campaign(campaign_id):
         if 'is_active' in data:
             campaign.is_active = data['is_active']
         
+        if 'attribution_mode' in data:
+            if data['attribution_mode'] not in ATTRIBUTION_MODES:
+                return jsonify({'error': f"attribution_mode must be one of: {', '.join(ATTRIBUTION_MODES)}"}), 400
+            campaign.attribution_mode = data['attribution_mode']
+        
         # If telegram_bot_id is being changed, validate it
         if 'telegram_bot_id' in data:
             new_bot_id = data['telegram_bot_id']
@@ -244,6 +261,8 @@ def update_campaign(campaign_id):
             campaign.telegram_bot_id = new_bot_id
         
         db.session.commit()
+        click_coalescer.invalidate_campaign(campaign.id)
+        utm_link_index.invalidate_campaign(campaign.id)
         
         return jsonify({
             'message': 'Campaign updated successfully',
@@ -270,6 +289,8 @@ def delete_campaign(campaign_id):
         
         db.session.delete(campaign)
         db.session.commit()
+        click_coalescer.invalidate_campaign(campaign_id)
+        utm_link_index.invalidate_campaign(campaign_id)
         
         return jsonify({
             'message': 'Campaign deleted successfully'
@@ -279,6 +300,67 @@ def delete_campaign(campaign_id):
         db.session.rollback()
         return jsonify({'error': 'Failed to delete campaign', 'details': str(e)}), 500
 
+@campaigns_bp.route('/campaigns/<campaign_id>/clicks', methods=['GET'])
+@jwt_required()
+def get_campaign_clicks(campaign_id):
+    """Daily clicks per utm_source, from live invite links plus compacted aggregates"""
+    try:
+        current_user_id = get_jwt_identity()
+        
+        campaign = Campaign.query.filter_by(
+            id=campaign_id,
+            user_id=current_user_id
+        ).first()
+        
+        if not campaign:
+            return jsonify({'error': 'Campaign not found'}), 404
+        
+        days = min(int(request.args.get('days', 30)), 365)
+        since = datetime.utcnow() - timedelta(days=days)
+        
+        # Raw clicks not yet folded into aggregates (shared per-UTM links are not clicks)
+        live = db.session.query(
+            func.date(InviteLink.created_at).label('day'),
+            InviteLink.utm_source,
+            func.count(InviteLink.id)
+        ).filter(
+            InviteLink.campaign_id == campaign_id,
+            InviteLink.created_at >= since,
+            InviteLink.status != 'compacted',
+            not_(static_code_clause())
+        ).group_by(
+            func.date(InviteLink.created_at),
+            InviteLink.utm_source
+        ).all()
+        
+        compacted = db.session.query(
+            ClickAggregate.day,
+            ClickAggregate.utm_source,
+            func.sum(ClickAggregate.clicks)
+        ).filter(
+            ClickAggregate.campaign_id == campaign_id,
+            ClickAggregate.day >= since.date()
+        ).group_by(
+            ClickAggregate.day,
+            ClickAggregate.utm_source
+        ).all()
+        
+        totals = {}
+        for day, utm_source, clicks in list(live) + list(compacted):
+            key = (str(day), utm_source or '')
+            totals[key] = totals.get(key, 0) + int(clicks or 0)
+        
+        return jsonify({
+            'clicks': [
+                {'date': day, 'utm_source': utm_source, 'clicks': clicks}
+                for (day, utm_source), clicks in sorted(totals.items())
+            ],
+            'total': sum(totals.values())
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to get campaign clicks', 'details': str(e)}), 500
+
 @campaigns_bp.route('/campaigns/<campaign_id>/leads', methods=['GET'])
 @jwt_required()
 def get_campaign_leads(campaign_id):
@@ -1,14 +1,90 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import Blueprint, request, jsonify, Response, stream_with_context, current_app, g
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt, get_jwt_request_location, create_access_token
 from src.models import db
 from src.models.campaign import Campaign
 from src.models.telegram_bot import TelegramBot
 from src.models.lead import TelegramLead
-from sqlalchemy import func, desc, and_
+from src.models.routing import route_reads_to_replica
+from src.services.db_pool import set_statement_timeout
+from src.services.events import lead_events, event_stream
+from src.services.exports import build_export, EXPORT_TYPES
+from src.services.principal import STREAM_SCOPE, token_scope
+from src.services.jobs import enqueue
+from src.models.job import Job, JobOutput
+import json
+from sqlalchemy import func, desc, and_, case, select
 from datetime import datetime, timedelta
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
+# Dashboard and export queries are read-only
+dashboard_bp.before_request(route_reads_to_replica)
+# Slow aggregations are cancelled instead of holding a pooled connection
+dashboard_bp.before_request(set_statement_timeout)
+
+# Dimensions accepted by the pivot endpoint
+PIVOT_DIMENSIONS = {
+    'utm_source': lambda: TelegramLead.utm_source,
+    'utm_medium': lambda: TelegramLead.utm_medium,
+    'utm_campaign': lambda: TelegramLead.utm_campaign,
+    'utm_content': lambda: TelegramLead.utm_content,
+    'utm_term': lambda: TelegramLead.utm_term,
+    'campaign': lambda: Campaign.name,
+    'status': lambda: TelegramLead.status,
+    'day': lambda: func.date(TelegramLead.created_at),
+}
+
+# Dimensions already bounded by the date range are never bucketed
+UNBUCKETED_DIMENSIONS = {'day'}
+
+PIVOT_OTHER_BUCKET = 'Other'
+PIVOT_MAX_TOP_N = 50
+PIVOT_MAX_ROWS = 1000
+
+def build_pivot_query(dimensions, conditions, top_n):
+    """Build a grouped count over the given dimensions, folding values
+    outside each dimension's top N into an "other" bucket in SQL"""
+    bucket_columns = []
+    top_subqueries = []
+    
+    for name in dimensions:
+        value = PIVOT_DIMENSIONS[name]()
+        if name in UNBUCKETED_DIMENSIONS:
+            bucket_columns.append(value.label(name))
+            continue
+        
+        value = func.coalesce(value, 'Unknown')
+        
+        # Rank distinct values by lead count with a window function
+        ranked = select(
+            value.label('value'),
+            func.row_number().over(
+                order_by=(desc(func.count(TelegramLead.id)), value)
+            ).label('position')
+        ).select_from(TelegramLead).join(
+            Campaign, TelegramLead.campaign_id == Campaign.id
+        ).where(*conditions).group_by(value).subquery()
+        
+        top = select(ranked.c.value).where(
+            ranked.c.position <= top_n
+        ).subquery(f'top_{name}')
+        
+        top_subqueries.append((top, value))
+        bucket_columns.append(
+            case((top.c.value.is_(None), PIVOT_OTHER_BUCKET), else_=value).label(name)
+        )
+    
+    count = func.count(TelegramLead.id).label('count')
+    query = select(*bucket_columns, count).select_from(TelegramLead).join(
+        Campaign, TelegramLead.campaign_id == Campaign.id
+    )
+    for top, value in top_subqueries:
+        query = query.outerjoin(top, top.c.value == value)
+    
+    return query.where(*conditions).group_by(
+        *[column.element for column in bucket_columns]
+    ).order_by(desc('count')).limit(PIVOT_MAX_ROWS + 1)
+
 @dashboard_bp.route('/dashboard/overview', methods=['GET'])
 @jwt_required()
 def get_dashboard_overview():
@@ -126,6 +202,51 @@ def get_dashboard_overview():
     except Exception as e:
         return jsonify({'error': 'Failed to get dashboard overview', 'details': str(e)}), 500
 
+@dashboard_bp.route('/dashboard/stream-token', methods=['POST'])
+@jwt_required()
+def create_stream_token():
+    """Short-lived token for the event stream, which EventSource can only
+    send in the URL (and so in access logs)"""
+    try:
+        expires_in = current_app.config.get('SSE_TOKEN_SECONDS', 60)
+        token = create_access_token(
+            identity=get_jwt_identity(),
+            additional_claims={'ver': get_jwt().get('ver', 0), 'scope': STREAM_SCOPE},
+            expires_delta=timedelta(seconds=expires_in)
+        )
+        return jsonify({'token': token, 'expires_in': expires_in}), 200
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to create stream token', 'details': str(e)}), 500
+
+@dashboard_bp.route('/dashboard/stream', methods=['GET'])
+@token_scope(STREAM_SCOPE)
+@jwt_required(locations=['headers', 'query_string'])
+def stream_dashboard_events():
+    """Live feed of new leads and counter deltas (Server-Sent Events)"""
+    if get_jwt_request_location() == 'query_string' and get_jwt().get('scope') != STREAM_SCOPE:
+        return jsonify({'error': 'Pass a token from /dashboard/stream-token in the URL, not an access token'}), 401
+    
+    current_user_id = get_jwt_identity()
+    
+    # The stream keeps the app context open until the client leaves; return the
+    # connection the token check used so open tabs do not exhaust the pool
+    db.session.remove()
+    
+    subscription = lead_events.subscribe(
+        current_user_id,
+        max_buffer=current_app.config.get('SSE_BUFFER_SIZE')
+    )
+    heartbeat = current_app.config.get('SSE_HEARTBEAT_SECONDS', 15)
+    
+    response = Response(
+        stream_with_context(event_stream(lead_events, subscription, heartbeat)),
+        mimetype='text/event-stream'
+    )
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @dashboard_bp.route('/dashboard/analytics', methods=['GET'])
 @jwt_required()
 def get_dashboard_analytics():
@@ -254,12 +375,80 @@ def get_dashboard_analytics():
     except Exception as e:
         return jsonify({'error': 'Failed to get analytics', 'details': str(e)}), 500
 
+@dashboard_bp.route('/dashboard/pivot', methods=['GET'])
+@jwt_required()
+def get_dashboard_pivot():
+    """Lead counts pivoted over any combination of dimensions"""
+    try:
+        current_user_id = get_jwt_identity()
+        
+        # Get query parameters
+        dimensions = [d.strip() for d in request.args.get('dimensions', 'utm_source').split(',') if d.strip()]
+        top_n = min(max(int(request.args.get('top', 10)), 1), PIVOT_MAX_TOP_N)
+        days = int(request.args.get('days', 30))
+        campaign_id = request.args.get('campaign_id')
+        
+        invalid = [d for d in dimensions if d not in PIVOT_DIMENSIONS]
+        if invalid or not dimensions:
+            return jsonify({
+                'error': 'Invalid dimensions',
+                'invalid': invalid,
+                'allowed': sorted(PIVOT_DIMENSIONS)
+            }), 400
+        
+        # Drop duplicates while keeping the requested order
+        dimensions = list(dict.fromkeys(dimensions))
+        
+        # Calculate date range
+        end_date = datetime.utcnow()
+        start_date = end_date - timedelta(days=days)
+        
+        conditions = [
+            Campaign.user_id == current_user_id,
+            TelegramLead.created_at >= start_date,
+            TelegramLead.created_at <= end_date
+        ]
+        if campaign_id:
+            conditions.append(Campaign.id == campaign_id)
+        
+        rows = db.session.execute(build_pivot_query(dimensions, conditions, top_n)).all()
+        truncated = len(rows) > PIVOT_MAX_ROWS
+        rows = rows[:PIVOT_MAX_ROWS]
+        
+        return jsonify({
+            'rows': [
+                dict(
+                    {
+                        name: value.isoformat() if hasattr(value, 'isoformat') else value
+                        for name, value in zip(dimensions, row[:-1])
+                    },
+                    count=row[-1]
+                )
+                for row in rows
+            ],
+            'dimensions': dimensions,
+            'top': top_n,
+            'other_bucket': PIVOT_OTHER_BUCKET,
+            'truncated': truncated,
+            'filters': {
+                'days': days,
+                'campaign_id': campaign_id,
+                'start_date': start_date.isoformat(),
+                'end_date': end_date.isoformat()
+            }
+        }), 200
+        
+    except ValueError as e:
+        return jsonify({'error': 'Invalid parameters', 'details': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': 'Failed to get pivot', 'details': str(e)}), 500
+
 @dashboard_bp.route('/dashboard/export', methods=['POST'])
 @jwt_required()
 def export_dashboard_data():
     try:
         current_user_id = get_jwt_identity()
-        data = request.get_json()
+        data = request.get_json() or {}
         
         # Get export parameters
         export_type = data.get('type', 'leads')  # leads, campaigns, analytics
@@ -274,69 +463,69 @@ def export_dashboard_data():
         if end_date:
             date_filter['end'] = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
         
-        if export_type == 'leads':
-            # Export leads data
-            query = db.session.query(TelegramLead).join(
-                Campaign, TelegramLead.campaign_id == Campaign.id
-            ).filter(Campaign.user_id == current_user_id)
-            
-            if campaign_id:
-                query = query.filter(Campaign.id == campaign_id)
-            
-            if date_filter.get('start'):
-                query = query.filter(TelegramLead.created_at >= date_filter['start'])
-            
-            if date_filter.get('end'):
-                query = query.filter(TelegramLead.created_at <= date_filter['end'])
-            
-            leads = query.order_by(desc(TelegramLead.created_at)).all()
-            
-            export_data = []
-            for lead in leads:
-                export_data.append({
-                    'telegram_id': lead.telegram_id,
-                    'username': lead.username,
-                    'first_name': lead.first_name,
-                    'last_name': lead.last_name,
-                    'group_name': lead.group_name,
-                    'utm_source': lead.utm_source,
-                    'utm_medium': lead.utm_medium,
-                    'utm_campaign': lead.utm_campaign,
-                    'utm_content': lead.utm_content,
-                    'utm_term': lead.utm_term,
-                    'entry_date': lead.entry_date.isoformat() if lead.entry_date else None,
-                    'created_at': lead.created_at.isoformat() if lead.created_at else None,
-                    'campaign_name': lead.campaign.name if lead.campaign else None
-                })
-            
-            return jsonify({
-                'data': export_data,
-                'total_records': len(export_data),
-                'export_type': 'leads'
-            }), 200
-            
-        elif export_type == 'campaigns':
-            # Export campaigns data
-            campaigns = Campaign.query.filter_by(user_id=current_user_id).all()
+        if export_type not in EXPORT_TYPES:
+            return jsonify({'error': 'Invalid export type'}), 400
+        
+        # Large exports can be generated by a worker and fetched when done
+        if data.get('async'):
+            job = enqueue('export', {
+                'type': export_type,
+                'campaign_id': campaign_id,
+                'start_date': start_date,
+                'end_date': end_date
+            }, owner_id=current_user_id, commit=False)
             
-            export_data = []
-            for campaign in campaigns:
-                # Get lead count for each campaign
-                lead_count = TelegramLead.query.filter_by(campaign_id=campaign.id).count()
-                
-                campaign_data = campaign.to_dict()
-                campaign_data['lead_count'] = lead_count
-                export_data.append(campaign_data)
+            # Serialize before commit: reloading the expired job afterwards would
+            # go to the replica, which may not have the row yet
+            db.session.flush()
+            job_data = job.to_dict()
+            db.session.commit()
             
             return jsonify({
-                'data': export_data,
-                'total_records': len(export_data),
-                'export_type': 'campaigns'
-            }), 200
-            
-        else:
-            return jsonify({'error': 'Invalid export type'}), 400
+                'message': 'Export queued',
+                'job': job_data
+            }), 202
+        
+        export_data = build_export(
+            current_user_id,
+            export_type,
+            campaign_id=campaign_id,
+            start=date_filter.get('start'),
+            end=date_filter.get('end')
+        )
+        
+        return jsonify({
+            'data': export_data,
+            'total_records': len(export_data),
+            'export_type': export_type
+        }), 200
         
     except Exception as e:
         return jsonify({'error': 'Failed to export data', 'details': str(e)}), 500
 
+@dashboard_bp.route('/dashboard/export/<job_id>', methods=['GET'])
+@jwt_required()
+def get_export_job(job_id):
+    try:
+        current_user_id = get_jwt_identity()
+        
+        # Polled right after enqueue and while the worker updates the job, so
+        # replica lag would show missing or stale jobs; read from the primary
+        g.use_read_replica = False
+        
+        job = Job.query.filter_by(id=job_id, owner_id=current_user_id, kind='export').first()
+        if not job:
+            return jsonify({'error': 'Export not found'}), 404
+        
+        response = {'job': job.to_dict()}
+        
+        if job.status == 'done':
+            output = db.session.get(JobOutput, job.id)
+            if output is None:
+                return jsonify({'error': 'Export expired', 'job': response['job']}), 410
+            response.update(json.loads(output.content))
+        
+        return jsonify(response), 200
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to get export', 'details': str(e)}), 500
@@ -3,49 +3,57 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from src.models import db
 from src.models.user import User
 from src.models.telegram_bot import TelegramBot
-import requests
+from src.services.telegram_api import telegram_request, TelegramAPIError
+from src.services.bot_health import bot_health, apply_health
+from src.services.jobs import enqueue
+from datetime import datetime
+import time
 
 telegram_bots_bp = Blueprint('telegram_bots', __name__)
 
-def validate_telegram_bot(bot_token, chat_id):
+def export_primary_invite_link(bot_token, chat_id):
+    """Generate the chat's primary invite link (revokes the previous one)"""
+    try:
+        response = telegram_request(bot_token, 'exportChatInviteLink', {'chat_id': chat_id})
+        data = response.json() if response.status_code == 200 else {}
+        return data.get('result') if data.get('ok') else None
+    except (TelegramAPIError, ValueError):
+        return None
+
+def validate_telegram_bot(bot_token, chat_id, health=None, force=False):
     """Validate Telegram bot token and chat access"""
     try:
-        # Test bot token by getting bot info
-        bot_info_url = f"https://api.telegram.org/bot{bot_token}/getMe"
-        response = requests.get(bot_info_url, timeout=10)
+        # getMe, getChat and getWebhookInfo run concurrently; results are cached
+        # per token unless `force` asks for a fresh check
+        if health is None:
+            health = bot_health.check(bot_token, chat_id, force=force)
         
-        if response.status_code != 200:
-            return False, "Invalid bot token"
+        if health['status'] == 'unreachable':
+            return False, "Failed to connect to Telegram API"
         
-        bot_data = response.json()
-        if not bot_data.get('ok'):
+        if health['status'] == 'invalid_token':
             return False, "Invalid bot token"
         
-        bot_username = bot_data['result']['username']
-        
-        # Test chat access by getting chat info
-        chat_info_url = f"https://api.telegram.org/bot{bot_token}/getChat"
-        chat_response = requests.get(chat_info_url, params={'chat_id': chat_id}, timeout=10)
-        
-        if chat_response.status_code != 200:
-            return False, "Cannot access chat. Make sure the bot is added to the channel/group as admin"
-        
-        chat_data = chat_response.json()
-        if not chat_data.get('ok'):
+        if health['status'] == 'chat_unreachable':
             return False, "Cannot access chat. Make sure the bot is added to the channel/group as admin"
         
-        chat_info = chat_data['result']
-        chat_name = chat_info.get('title', 'Unknown')
-        chat_type = chat_info.get('type', 'unknown')
+        # Fallback link for outages: prefer the existing primary link or public
+        # username, since exporting a new one revokes the old primary link
+        primary_invite_link = health['chat_invite_link']
+        if not primary_invite_link and health['chat_username']:
+            primary_invite_link = f"https://t.me/{health['chat_username']}"
+        if not primary_invite_link:
+            primary_invite_link = export_primary_invite_link(bot_token, chat_id)
         
         return True, {
-            'bot_username': bot_username,
-            'chat_name': chat_name,
-            'chat_type': chat_type
+            'bot_username': health['bot_username'],
+            'chat_name': health['chat_name'],
+            'chat_type': health['chat_type'],
+            'primary_invite_link': primary_invite_link,
+            'pending_update_count': health['pending_update_count'],
+            'webhook_url': health['webhook_url']
         }
         
-    except requests.RequestException:
-        return False, "Failed to connect to Telegram API"
     except Exception as e:
         return False, f"Validation error: {str(e)}"
 
@@ -64,6 +72,69 @@ def get_telegram_bots():
     except Exception as e:
         return jsonify({'error': 'Failed to get bots', 'details': str(e)}), 500
 
+@telegram_bots_bp.route('/telegram-bots/health', methods=['POST'])
+@jwt_required()
+def check_telegram_bots():
+    """Check every bot of the current user concurrently"""
+    try:
+        current_user_id = get_jwt_identity()
+        force = request.args.get('refresh', 'false').lower() == 'true'
+        started_at = time.perf_counter()
+        
+        bots = TelegramBot.query.filter_by(user_id=current_user_id).all()
+        
+        # Hand the checks to the job workers instead of waiting on them
+        if request.args.get('async', 'false').lower() == 'true':
+            jobs = [
+                enqueue('validate_bot', {'bot_id': bot.id}, owner_id=current_user_id, commit=False)
+                for bot in bots
+            ]
+            db.session.commit()
+            
+            return jsonify({
+                'message': 'Health checks queued',
+                'jobs': [job.to_dict() for job in jobs]
+            }), 202
+        
+        targets = {bot.id: (bot.bot_token, bot.chat_id) for bot in bots}
+        
+        # Return the connection to the pool while waiting on the Bot API
+        db.session.rollback()
+        
+        results = bot_health.check_many(list(targets.values()), force=force)
+        
+        # Write results back from this thread in one transaction
+        bots = TelegramBot.query.filter(TelegramBot.id.in_(list(targets))).all()
+        report = []
+        summary = {}
+        for bot in bots:
+            health = results[targets[bot.id]]
+            apply_health(bot, health)
+            summary[health['status']] = summary.get(health['status'], 0) + 1
+            report.append({
+                'bot': bot.to_dict(),
+                'health': {
+                    'status': health['status'],
+                    'error': health['error'],
+                    'webhook_url': health['webhook_url'],
+                    'webhook_last_error': health['webhook_last_error'],
+                    'pending_update_count': health['pending_update_count'],
+                    'checked_at': health['checked_at'].isoformat()
+                }
+            })
+        
+        db.session.commit()
+        
+        return jsonify({
+            'bots': report,
+            'summary': summary,
+            'duration_ms': round((time.perf_counter() - started_at) * 1000, 1)
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to check bots', 'details': str(e)}), 500
+
 @telegram_bots_bp.route('/telegram-bots', methods=['POST'])
 @jwt_required()
 def create_telegram_bot():
@@ -79,8 +150,9 @@ def create_telegram_bot():
         chat_id = data['chat_id'].strip()
         is_private = data.get('is_private', False)
         
-        # Validate bot token and chat access
-        is_valid, result = validate_telegram_bot(bot_token, chat_id)
+        # Validate bot token and chat access, bypassing a cached failure from
+        # before the user made the bot an admin
+        is_valid, result = validate_telegram_bot(bot_token, chat_id, force=True)
         if not is_valid:
             return jsonify({'error': result}), 400
         
@@ -101,7 +173,11 @@ def create_telegram_bot():
             chat_id=chat_id,
             chat_name=result['chat_name'],
             chat_type=result['chat_type'],
-            is_private=is_private
+            is_private=is_private,
+            primary_invite_link=result['primary_invite_link'],
+            last_status='ok',
+            last_checked_at=datetime.utcnow(),
+            pending_update_count=result['pending_update_count']
         )
         
         db.session.add(bot)
@@ -158,12 +234,13 @@ def update_telegram_bot(bot_id):
             new_bot_token = data['bot_token'].strip()
             
             # Validate new bot token
-            is_valid, result = validate_telegram_bot(new_bot_token, bot.chat_id)
+            is_valid, result = validate_telegram_bot(new_bot_token, bot.chat_id, force=True)
             if not is_valid:
                 return jsonify({'error': result}), 400
             
             bot.bot_token = new_bot_token
             bot.bot_username = result['bot_username']
+            bot.primary_invite_link = result['primary_invite_link'] or bot.primary_invite_link
         
         # Update other fields
         if 'chat_name' in data:
@@ -233,8 +310,15 @@ def test_telegram_bot(bot_id):
         if not bot:
             return jsonify({'error': 'Bot not found'}), 404
         
-        # Test bot connection
-        is_valid, result = validate_telegram_bot(bot.bot_token, bot.chat_id)
+        # Test bot connection (cached for a short while unless ?refresh=true)
+        force = request.args.get('refresh', 'false').lower() == 'true'
+        health = bot_health.check(bot.bot_token, bot.chat_id, force=force)
+        apply_health(bot, health)
+        is_valid, result = validate_telegram_bot(bot.bot_token, bot.chat_id, health=health)
+        
+        if is_valid and result['primary_invite_link']:
+            bot.primary_invite_link = result['primary_invite_link']
+        db.session.commit()
         
         if is_valid:
             return jsonify({
@@ -1,39 +1,52 @@
-from flask import Blueprint, request, jsonify, redirect
+from flask import Blueprint, request, jsonify, redirect, Response, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
 from src.models import db
 from src.models.campaign import Campaign
-from src.models.invite_link import InviteLink
+from src.models.invite_link import InviteLink, PRIVATE_LINK_TTL_SECONDS
 from src.models.lead import TelegramLead
 from src.models.telegram_bot import TelegramBot
+from src.services.events import lead_events
+from src.services.telegram_api import telegram_request, TelegramAPIError
+from src.services.crawlers import crawler_matcher, record_crawler_hit, CRAWLER_PAGE
+from src.services.click_cache import click_coalescer, click_fingerprint
+from src.services.utm_links import UTM_FIELDS, utm_link_code, utm_link_index
+from src.services.circuit_breaker import invite_link_breakers
+from src.services.metrics import metrics
+from src.services.jobs import enqueue
+from src.services.sqlite_writer import run_write
+from src.services.invite_codes import invite_codes
+from src.services.click_buffer import click_buffer, clean_click_row
+from src.services.code_filter import invite_code_filter
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime
-import requests
 import time
-import random
-import string
 
 webhooks_bp = Blueprint('webhooks', __name__)
 
-def generate_unique_code():
-    """Generate a unique code for invite links"""
-    timestamp36 = str(int(time.time() * 1000))[-8:]  # Last 8 digits of timestamp
-    random_chars = ''.join(random.choices(string.ascii_lowercase + string.digits, k=4))
-    return f"{timestamp36}{random_chars}"
+CIRCUIT_OPEN = 'Bot API circuit open'
 
-def create_telegram_invite_link(bot_token, chat_id, link_name, is_private=False):
+def create_telegram_invite_link(bot_token, chat_id, link_name, is_private=False, expires=True, breaker=None, timeout=10):
     """Create a Telegram invite link with the specified name"""
+    if breaker is not None and not breaker.allow():
+        return False, CIRCUIT_OPEN
+    
+    started_at = time.perf_counter()
+    reachable = False
     try:
-        url = f"https://api.telegram.org/bot{bot_token}/createChatInviteLink"
-        
         params = {
             'chat_id': chat_id,
             'name': link_name
         }
         
         # Add expiration for private channels (24 hours)
-        if is_private:
-            expire_date = int(time.time()) + (24 * 60 * 60)  # 24 hours from now
+        if is_private and expires:
+            expire_date = int(time.time()) + PRIVATE_LINK_TTL_SECONDS
             params['expire_date'] = expire_date
         
-        response = requests.post(url, json=params, timeout=10)
+        response = telegram_request(bot_token, 'createChatInviteLink', params, timeout=timeout)
+        
+        # Client errors mean the API is up; only 5xx and 429 count against the breaker
+        reachable = response.status_code < 500 and response.status_code != 429
         
         if response.status_code == 200:
             data = response.json()
@@ -44,15 +57,84 @@ def create_telegram_invite_link(bot_token, chat_id, link_name, is_private=False)
         else:
             return False, f"HTTP {response.status_code}"
             
-    except requests.RequestException as e:
+    except TelegramAPIError as e:
         return False, f"Request failed: {str(e)}"
     except Exception as e:
         return False, f"Error: {str(e)}"
+    finally:
+        if breaker is not None:
+            breaker.record(reachable, time.perf_counter() - started_at)
+
+def _insert_invite_link(session, values):
+    session.add(InviteLink(**values))
+
+def save_click_link(values):
+    """Store a click's invite link row, through the write-behind buffer when it is on"""
+    if not click_buffer.add(values):
+        run_write(_insert_invite_link, clean_click_row(values))
+
+def redirect_to_primary_link(campaign_id, primary_link, utm_params, reason, record=True):
+    """Send the visitor to the chat's primary link, keeping the click as pending"""
+    metrics.inc('invite_link_fallbacks_total', reason=reason)
+    
+    if record:
+        save_click_link(dict(
+            campaign_id=campaign_id,
+            code=invite_codes.next_code(),
+            telegram_invite_link=primary_link,
+            status='pending',
+            **utm_params
+        ))
+    
+    return redirect(primary_link)
+
+def get_or_create_utm_link(campaign_id, bot_token, chat_id, utm_params, breaker=None, timeout=10):
+    """Static invite link shared by every click with the same UTM combination"""
+    code = utm_link_code(campaign_id, chat_id, utm_params)
+    link = utm_link_index.get(campaign_id, code)
+    if link:
+        return True, link
+    
+    # Return the connection to the pool while waiting on the Bot API
+    db.session.rollback()
+    
+    success, result = create_telegram_invite_link(
+        bot_token, chat_id, code, expires=False, breaker=breaker, timeout=timeout
+    )
+    if not success:
+        return False, result
+    
+    try:
+        run_write(_insert_invite_link, dict(
+            campaign_id=campaign_id,
+            code=code,
+            telegram_invite_link=result,
+            **utm_params
+        ))
+    except IntegrityError:
+        # Another worker created the same combination first; joins through
+        # either link carry the same name, so keep the stored one
+        db.session.rollback()
+        existing = InviteLink.query.filter_by(campaign_id=campaign_id, code=code).first()
+        if existing and existing.telegram_invite_link:
+            result = existing.telegram_invite_link
+    
+    utm_link_index.put(campaign_id, code, result)
+    return True, result
 
 @webhooks_bp.route('/webhooks/utm-capture/<campaign_id>', methods=['GET'])
 def utm_capture_webhook(campaign_id):
     """Webhook to capture UTMs and create Telegram invite link"""
     try:
+        # Ad review bots and link previews get a static page: no DB row, no Bot API call
+        crawler = crawler_matcher.classify(request.user_agent.string, request.remote_addr)
+        if crawler:
+            record_crawler_hit(crawler, 'utm_capture')
+            response = Response(CRAWLER_PAGE, mimetype='text/html')
+            response.headers['Cache-Control'] = 'public, max-age=3600'
+            response.headers['X-Robots-Tag'] = 'noindex'
+            return response
+        
         # Get campaign
         campaign = Campaign.query.get(campaign_id)
         if not campaign or not campaign.is_active:
@@ -67,48 +149,161 @@ def utm_capture_webhook(campaign_id):
             'utm_term': request.args.get('utm_term', '')
         }
         
-        # Generate unique code
-        code = generate_unique_code()
+        per_utm = campaign.attribution_mode == 'per_utm'
         
-        # Save UTM data to database
-        invite_link = InviteLink(
-            campaign_id=campaign_id,
-            code=code,
-            **utm_params
-        )
-        
-        db.session.add(invite_link)
-        db.session.flush()  # Get the ID
+        # Repeat clicks from the same visitor reuse the link minted for the first one
+        if not per_utm:
+            fingerprint = click_fingerprint(campaign_id, request.remote_addr, request.user_agent.string, utm_params)
+            cached_link = click_coalescer.get(fingerprint)
+            if cached_link:
+                return redirect(cached_link)
         
         # Get bot information
         bot = campaign.telegram_bot
         if not bot or not bot.is_active:
-            db.session.rollback()
             return jsonify({'error': 'Bot not found or inactive'}), 404
         
+        bot_token, chat_id, is_private = bot.bot_token, bot.chat_id, bot.is_private
+        primary_link = bot.primary_invite_link
+        
+        # Bounded wait on the Bot API; a slow or failing API trips the bot's breaker
+        breaker = invite_link_breakers.get(bot.id)
+        timeout = current_app.config.get('INVITE_LINK_TIMEOUT_SECONDS', 3)
+        
+        if per_utm:
+            success, result = get_or_create_utm_link(
+                campaign_id, bot_token, chat_id, utm_params, breaker=breaker, timeout=timeout
+            )
+            if not success:
+                if primary_link:
+                    reason = 'circuit_open' if result == CIRCUIT_OPEN else 'error'
+                    return redirect_to_primary_link(campaign_id, primary_link, utm_params, reason, record=False)
+                return jsonify({'error': f'Failed to create invite link: {result}'}), 500
+            return redirect(result)
+        
+        # Return the connection to the pool while waiting on the Bot API
+        db.session.rollback()
+        
+        # Generate unique code
+        code = invite_codes.next_code()
+        
         # Create Telegram invite link
         success, result = create_telegram_invite_link(
-            bot.bot_token,
-            bot.chat_id,
+            bot_token,
+            chat_id,
             code,
-            bot.is_private
+            is_private,
+            breaker=breaker,
+            timeout=timeout
         )
         
-        if success:
-            # Save the invite link URL
-            invite_link.invite_link_url = result
-            db.session.commit()
-            
-            # Redirect user to Telegram
-            return redirect(result)
-        else:
-            db.session.rollback()
+        if not success:
+            if primary_link:
+                reason = 'circuit_open' if result == CIRCUIT_OPEN else 'error'
+                return redirect_to_primary_link(campaign_id, primary_link, utm_params, reason)
             return jsonify({'error': f'Failed to create invite link: {result}'}), 500
+        
+        # Save UTM data and the invite link URL (buffered when write-behind is on)
+        save_click_link(dict(
+            campaign_id=campaign_id,
+            code=code,
+            telegram_invite_link=result,
+            **utm_params
+        ))
+        
+        click_coalescer.put(
+            fingerprint,
+            campaign_id,
+            result,
+            link_expires_in=PRIVATE_LINK_TTL_SECONDS if is_private else None
+        )
+        
+        # Redirect user to Telegram
+        return redirect(result)
             
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'Webhook error: {str(e)}'}), 500
 
+def _mark_reentry(lead, now):
+    lead.status = 'member'
+    lead.entry_date = now
+    lead.updated_at = now
+    return {'created': False, 'lead_id': lead.id}
+
+def _record_member_join(session, campaign_id, telegram_id, link_name, profile, buffered_link=None):
+    """Create the lead for a join, or mark an existing one as re-entered"""
+    now = datetime.utcnow()
+    
+    # Check if lead already exists for this campaign
+    existing_lead = session.query(TelegramLead).filter_by(
+        campaign_id=campaign_id,
+        telegram_id=telegram_id
+    ).first()
+    
+    if existing_lead:
+        # Update existing lead (re-entry)
+        return _mark_reentry(existing_lead, now)
+    
+    # Find UTM data using link_name (code)
+    utm_data = {}
+    invite_link_id = None
+    
+    if buffered_link:
+        # The click row is still in the write-behind buffer
+        invite_link_id = buffered_link['id']
+        utm_data = {field: buffered_link.get(field) for field in UTM_FIELDS}
+    elif link_name:
+        invite_link_record = session.query(InviteLink).filter_by(
+            campaign_id=campaign_id,
+            code=link_name
+        ).first()
+        
+        if invite_link_record:
+            invite_link_id = invite_link_record.id
+            utm_data = {
+                'utm_source': invite_link_record.utm_source,
+                'utm_medium': invite_link_record.utm_medium,
+                'utm_campaign': invite_link_record.utm_campaign,
+                'utm_content': invite_link_record.utm_content,
+                'utm_term': invite_link_record.utm_term
+            }
+    
+    # Create new lead
+    lead = TelegramLead(
+        campaign_id=campaign_id,
+        invite_link_id=invite_link_id,
+        telegram_id=telegram_id,
+        entry_date=now,
+        status='member',
+        **profile,
+        **utm_data
+    )
+    
+    try:
+        # A join of the same user committed by another process since the check
+        # above violates the unique (campaign_id, telegram_id) index
+        with session.begin_nested():
+            session.add(lead)
+    except IntegrityError:
+        existing_lead = session.query(TelegramLead).filter_by(
+            campaign_id=campaign_id,
+            telegram_id=telegram_id
+        ).one()
+        return _mark_reentry(existing_lead, now)
+    
+    return {
+        'created': True,
+        'lead': {
+            'id': lead.id,
+            'first_name': lead.first_name,
+            'username': lead.username,
+            'utm_source': lead.utm_source,
+            'utm_campaign': lead.utm_campaign,
+            'created_at': lead.created_at.isoformat() if lead.created_at else None
+        }
+    }
+
 @webhooks_bp.route('/webhooks/telegram-member/<campaign_id>', methods=['POST'])
 def telegram_member_webhook(campaign_id):
     """Webhook to process Telegram member events"""
@@ -152,73 +347,76 @@ def telegram_member_webhook(campaign_id):
         chat_info = data.get('chat', {})
         group_name = chat_info.get('title', '')
         
-        # Check if lead already exists for this campaign
-        existing_lead = TelegramLead.query.filter_by(
-            campaign_id=campaign_id,
-            telegram_id=telegram_id
-        ).first()
-        
-        if existing_lead:
-            # Update existing lead (re-entry)
-            existing_lead.status = 'member'
-            existing_lead.entry_date = datetime.utcnow()
-            existing_lead.updated_at = datetime.utcnow()
-            
-            db.session.commit()
-            
+        # Clicks not yet flushed by the write-behind buffer are only in memory
+        buffered_link = click_buffer.get(link_name) if link_name else None
+        if buffered_link and buffered_link['campaign_id'] != campaign_id:
+            buffered_link = None
+        
+        # Joins through links this campaign never minted skip the invite link lookup
+        if link_name and not buffered_link and not invite_code_filter.might_contain(campaign_id, link_name):
+            link_name = None
+        
+        # Upsert the lead in one write; the unique (campaign_id, telegram_id)
+        # index turns a join racing in another process into a re-entry
+        outcome = run_write(_record_member_join, campaign_id, telegram_id, link_name, {
+            'user_id': campaign.user_id,
+            'username': username,
+            'first_name': first_name,
+            'last_name': last_name,
+            'group_name': group_name
+        }, buffered_link)
+        
+        if not outcome['created']:
             return jsonify({
                 'message': 'Existing lead updated',
-                'lead_id': existing_lead.id
+                'lead_id': outcome['lead_id']
             }), 200
         
-        # Find UTM data using link_name (code)
-        utm_data = {}
-        invite_link_record = None
-        
-        if link_name:
-            invite_link_record = InviteLink.query.filter_by(
-                campaign_id=campaign_id,
-                code=link_name
-            ).first()
-            
-            if invite_link_record:
-                utm_data = {
-                    'utm_source': invite_link_record.utm_source,
-                    'utm_medium': invite_link_record.utm_medium,
-                    'utm_campaign': invite_link_record.utm_campaign,
-                    'utm_content': invite_link_record.utm_content,
-                    'utm_term': invite_link_record.utm_term
-                }
-        
-        # Create new lead
-        lead = TelegramLead(
-            campaign_id=campaign_id,
-            invite_link_id=invite_link_record.id if invite_link_record else None,
-            telegram_id=telegram_id,
-            username=username,
-            first_name=first_name,
-            last_name=last_name,
-            group_name=group_name,
-            entry_date=datetime.utcnow(),
-            status='member',
-            **utm_data
-        )
+        lead = outcome['lead']
         
-        db.session.add(lead)
-        db.session.commit()
+        # Push the new lead to any open dashboard streams
+        lead_events.publish(campaign.user_id, 'lead', {
+            'lead': dict(lead, campaign_id=campaign.id, campaign_name=campaign.name),
+            'deltas': {
+                'total_leads': 1,
+                'recent_leads': 1,
+                'weekly_leads': 1
+            }
+        })
         
         return jsonify({
             'message': 'Lead created successfully',
-            'lead_id': lead.id
+            'lead_id': lead['id']
         }), 201
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'Webhook error: {str(e)}'}), 500
 
+@jwt_required()
+def _queue_webhook_change(kind, campaign_id):
+    """Let a job worker make the Bot API call, with retries, on behalf of
+    the campaign's owner"""
+    try:
+        current_user_id = get_jwt_identity()
+        
+        campaign = Campaign.query.filter_by(id=campaign_id, user_id=current_user_id).first()
+        if not campaign:
+            return jsonify({'error': 'Campaign not found'}), 404
+        
+        job = enqueue(kind, {'campaign_id': campaign_id}, owner_id=current_user_id)
+        return jsonify({'message': 'Webhook change queued', 'job': job.to_dict()}), 202
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to queue webhook change', 'details': str(e)}), 500
+
 @webhooks_bp.route('/webhooks/telegram-member/<campaign_id>/setup', methods=['POST'])
 def setup_telegram_webhook(campaign_id):
     """Setup Telegram webhook for a campaign"""
+    if request.args.get('async', 'false').lower() == 'true':
+        return _queue_webhook_change('setup_webhook', campaign_id)
+    
     try:
         # Get campaign
         campaign = Campaign.query.get(campaign_id)
@@ -234,14 +432,12 @@ def setup_telegram_webhook(campaign_id):
         webhook_url = campaign.member_webhook_url
         
         # Configure Telegram webhook
-        telegram_url = f"https://api.telegram.org/bot{bot.bot_token}/setWebhook"
-        
         webhook_data = {
             'url': webhook_url,
             'allowed_updates': ['chat_member']
         }
         
-        response = requests.post(telegram_url, json=webhook_data, timeout=10)
+        response = telegram_request(bot.bot_token, 'setWebhook', webhook_data)
         
         if response.status_code == 200:
             data = response.json()
@@ -263,7 +459,7 @@ def setup_telegram_webhook(campaign_id):
                 'error': f"HTTP {response.status_code}"
             }), 400
             
-    except requests.RequestException as e:
+    except TelegramAPIError as e:
         return jsonify({'error': f'Request failed: {str(e)}'}), 500
     except Exception as e:
         return jsonify({'error': f'Setup error: {str(e)}'}), 500
@@ -271,6 +467,9 @@ def setup_telegram_webhook(campaign_id):
 @webhooks_bp.route('/webhooks/telegram-member/<campaign_id>/remove', methods=['POST'])
 def remove_telegram_webhook(campaign_id):
     """Remove Telegram webhook for a campaign"""
+    if request.args.get('async', 'false').lower() == 'true':
+        return _queue_webhook_change('remove_webhook', campaign_id)
+    
     try:
         # Get campaign
         campaign = Campaign.query.get(campaign_id)
@@ -283,9 +482,7 @@ def remove_telegram_webhook(campaign_id):
             return jsonify({'error': 'Bot not found'}), 404
         
         # Remove webhook
-        telegram_url = f"https://api.telegram.org/bot{bot.bot_token}/deleteWebhook"
-        
-        response = requests.post(telegram_url, timeout=10)
+        response = telegram_request(bot.bot_token, 'deleteWebhook')
         
         if response.status_code == 200:
             data = response.json()
@@ -306,7 +503,7 @@ def remove_telegram_webhook(campaign_id):
                 'error': f"HTTP {response.status_code}"
             }), 400
             
-    except requests.RequestException as e:
+    except TelegramAPIError as e:
         return jsonify({'error': f'Request failed: {str(e)}'}), 500
     except Exception as e:
         return jsonify({'error': f'Remove error: {str(e)}'}), 500
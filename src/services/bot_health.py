@@ -0,0 +1,128 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from src.services.metrics import metrics
+from src.services.telegram_api import telegram_request, TelegramAPIError
+
+# Methods called for every bot; getChat and getWebhookInfo results are merged in
+HEALTH_METHODS = ('getMe', 'getChat', 'getWebhookInfo')
+
+def _call(bot_token, method, params, timeout):
+    try:
+        response = telegram_request(bot_token, method, params, http_method='get', timeout=timeout)
+        return response.json()
+    except (TelegramAPIError, ValueError) as e:
+        return {'ok': False, 'unreachable': True, 'description': str(e)}
+
+def _result(payload):
+    result = payload.get('result')
+    return result if isinstance(result, dict) else {}
+
+def _summarize(me, chat, webhook):
+    if me.get('unreachable') or chat.get('unreachable'):
+        status = 'unreachable'
+    elif not me.get('ok'):
+        status = 'invalid_token'
+    elif not chat.get('ok'):
+        status = 'chat_unreachable'
+    else:
+        status = 'ok'
+
+    me_info = _result(me)
+    chat_info = _result(chat)
+    webhook_info = _result(webhook)
+    return {
+        'status': status,
+        'error': None if status == 'ok' else (chat if me.get('ok') else me).get('description'),
+        'bot_username': me_info.get('username'),
+        'chat_name': chat_info.get('title', 'Unknown'),
+        'chat_type': chat_info.get('type', 'unknown'),
+        'chat_username': chat_info.get('username'),
+        'chat_invite_link': chat_info.get('invite_link'),
+        'webhook_url': webhook_info.get('url'),
+        'pending_update_count': webhook_info.get('pending_update_count'),
+        'webhook_last_error': webhook_info.get('last_error_message'),
+        'checked_at': datetime.utcnow()
+    }
+
+class BotHealthChecker:
+    """Runs getMe/getChat/getWebhookInfo for many bots on a bounded pool and
+    caches each bot's result for `ttl` seconds, keyed by token and chat.
+
+    All calls of a batch are submitted at once, so a batch takes roughly as
+    long as its slowest call while never exceeding `max_workers` requests
+    in flight.
+    """
+
+    def __init__(self, ttl=60, max_workers=32, timeout=10):
+        self.ttl = ttl
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def _executor(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(self.max_workers, thread_name_prefix='bot-health')
+        return self._pool
+
+    def _cached(self, key):
+        entry = self._cache.get(key)
+        hit = entry is not None and entry[0] > time.monotonic()
+        metrics.record_cache('bot_health', hit)
+        return entry[1] if hit else None
+
+    def check_many(self, targets, force=False):
+        """Results for (bot_token, chat_id) pairs, keyed by the same pairs"""
+        results = {}
+        pending = []
+        for key in dict.fromkeys(targets):
+            cached = None if force else self._cached(key)
+            if cached is not None:
+                results[key] = cached
+            else:
+                pending.append(key)
+
+        pool = self._executor()
+        futures = {
+            key: [
+                pool.submit(_call, key[0], method, {'chat_id': key[1]} if method == 'getChat' else None, self.timeout)
+                for method in HEALTH_METHODS
+            ]
+            for key in pending
+        }
+
+        expires_at = time.monotonic() + self.ttl
+        for key, calls in futures.items():
+            result = _summarize(*(future.result() for future in calls))
+            results[key] = result
+            metrics.inc('bot_health_checks_total', status=result['status'])
+            # Network failures are retried on the next check instead of cached
+            if result['status'] != 'unreachable':
+                with self._lock:
+                    self._cache[key] = (expires_at, result)
+        return results
+
+    def check(self, bot_token, chat_id, force=False):
+        return self.check_many([(bot_token, chat_id)], force=force)[(bot_token, chat_id)]
+
+    def invalidate(self, bot_token, chat_id):
+        with self._lock:
+            self._cache.pop((bot_token, chat_id), None)
+
+bot_health = BotHealthChecker()
+
+def apply_health(bot, health):
+    """Store the outcome of a health check on the bot"""
+    bot.last_status = health['status']
+    bot.last_checked_at = health['checked_at']
+    if health['pending_update_count'] is not None:
+        bot.pending_update_count = health['pending_update_count']
+
+def init_bot_health(app):
+    bot_health.ttl = app.config.get('BOT_HEALTH_CACHE_TTL', 60)
+    bot_health.max_workers = app.config.get('BOT_HEALTH_MAX_WORKERS', 32)
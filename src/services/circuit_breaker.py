@@ -0,0 +1,98 @@
+import threading
+import time
+from src.services.metrics import metrics
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker around calls to one upstream.
+
+    Failures and calls slower than `slow_call_seconds` both count towards
+    `failure_threshold` consecutive failures, which opens the breaker. After
+    `reset_timeout` seconds a single probe call is let through; its outcome
+    closes the breaker or opens it again.
+    """
+
+    def __init__(self, group, failure_threshold=5, slow_call_seconds=2.0, reset_timeout=30.0):
+        self.group = group
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def _transition(self, state):
+        self.state = state
+        metrics.inc('circuit_breaker_transitions_total', group=self.group, state=state)
+
+    def allow(self):
+        """Whether a call may go to the upstream right now"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self._transition(HALF_OPEN)
+                self._probe_in_flight = False
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record(self, ok, elapsed):
+        """Outcome of an allowed call; slow successes count as failures"""
+        failed = not ok or elapsed >= self.slow_call_seconds
+        with self._lock:
+            self._probe_in_flight = False
+            if failed:
+                self.failures += 1
+                if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                    self.opened_at = time.monotonic()
+                    self._transition(OPEN)
+            else:
+                self.failures = 0
+                if self.state != CLOSED:
+                    self._transition(CLOSED)
+
+class CircuitBreakerRegistry:
+    """Breakers of one group, created on first use per key"""
+
+    def __init__(self, group, **settings):
+        self.group = group
+        self.settings = settings
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(key, CircuitBreaker(self.group, **self.settings))
+        return breaker
+
+    def configure(self, **settings):
+        self.settings.update(settings)
+        with self._lock:
+            for breaker in self._breakers.values():
+                for name, value in settings.items():
+                    setattr(breaker, name, value)
+
+    def open_count(self):
+        return sum(1 for breaker in list(self._breakers.values()) if breaker.state != CLOSED)
+
+# One breaker per bot around invite link creation
+invite_link_breakers = CircuitBreakerRegistry('invite_link')
+
+def init_circuit_breakers(app):
+    invite_link_breakers.configure(
+        failure_threshold=app.config.get('INVITE_BREAKER_FAILURES', 5),
+        slow_call_seconds=app.config.get('INVITE_BREAKER_SLOW_SECONDS', 2.0),
+        reset_timeout=app.config.get('INVITE_BREAKER_RESET_SECONDS', 30.0)
+    )
+    metrics.register_collector(lambda: [
+        ('circuit_breakers_not_closed', {'group': invite_link_breakers.group}, invite_link_breakers.open_count())
+    ])
@@ -0,0 +1,199 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import insert
+from sqlalchemy.exc import DBAPIError, IntegrityError, InterfaceError, OperationalError
+from src.models.ids import new_id
+from src.models.invite_link import InviteLink
+from src.services.code_filter import invite_code_filter
+from src.services.metrics import metrics
+from src.services.sqlite_writer import run_write
+
+logger = logging.getLogger(__name__)
+
+metrics.define_histogram('click_buffer_flush_rows', (1, 10, 50, 100, 250, 500, 1000, 2500, 5000))
+
+_COLUMNS = {column.key: column for column in InviteLink.__table__.columns}
+
+def clean_click_row(values):
+    """Copy of an invite_links row with strings cut to their column length,
+    so an oversized UTM value cannot fail the insert"""
+    row = {}
+    for key, value in values.items():
+        column = _COLUMNS.get(key)
+        if column is None:
+            raise ValueError(f'Unknown invite_links column: {key}')
+        length = getattr(column.type, 'length', None)
+        if length and isinstance(value, str) and len(value) > length:
+            metrics.inc('click_row_truncated_total', column=key)
+            value = value[:length]
+        row[key] = value
+    return row
+
+def _is_transient(error):
+    # Lost connections and lock timeouts fail every row alike; retry the flush
+    return isinstance(error, (OperationalError, InterfaceError)) or error.connection_invalidated
+
+def _insert_rows(session, rows):
+    session.execute(insert(InviteLink), rows)
+
+def _insert_rows_individually(session, rows):
+    """Insert rows one savepoint at a time. Codes that already exist are
+    skipped; other rows the database refuses are returned with the error"""
+    skipped = 0
+    rejected = []
+    for row in rows:
+        try:
+            with session.begin_nested():
+                session.execute(insert(InviteLink), [row])
+        except IntegrityError:
+            skipped += 1
+        except DBAPIError as e:
+            if _is_transient(e):
+                raise
+            rejected.append((row, str(e.orig)))
+    return skipped, rejected
+
+class ClickBuffer:
+    """Write-behind buffer for per-click InviteLink rows.
+
+    Clicks add their row here and redirect straight away; a flusher thread
+    bulk-inserts everything buffered every `flush_interval` seconds, or as
+    soon as `max_rows` are waiting. At most one interval of clicks (plus any
+    rows a failing database left queued) is lost if the process dies.
+    Rows are readable with get() until they are committed.
+    """
+
+    def __init__(self, flush_interval=0.5, max_rows=500, max_pending=50000):
+        self.flush_interval = flush_interval
+        self.max_rows = max_rows
+        self.max_pending = max_pending
+        self.enabled = False
+        self._app = None
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pending = {}
+        self._inflight = {}
+        self._thread = None
+
+    def configure(self, app, flush_interval, max_rows, max_pending):
+        self._app = app
+        self.flush_interval = flush_interval
+        self.max_rows = max_rows
+        self.max_pending = max_pending
+        if not self.enabled:
+            atexit.register(self.flush)
+        self.enabled = True
+
+    def add(self, values):
+        """Buffer one row; False when the buffer is off or full and the caller
+        should insert it directly"""
+        if not self.enabled:
+            return False
+
+        row = clean_click_row(values)
+        row.setdefault('id', new_id())
+        row.setdefault('created_at', datetime.utcnow())
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                metrics.inc('click_buffer_overflow_total')
+                return False
+            self._pending[row['code']] = row
+            size = len(self._pending)
+
+        if self._thread is None:
+            self._start()
+        if size >= self.max_rows:
+            self._wakeup.set()
+        return True
+
+    def get(self, code):
+        """Buffered row for a code that is not committed yet, or None"""
+        with self._lock:
+            return self._pending.get(code) or self._inflight.get(code)
+
+    def size(self):
+        with self._lock:
+            return len(self._pending) + len(self._inflight)
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='click-buffer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Click buffer flush failed')
+
+    def flush(self):
+        """Insert everything buffered so far; safe to call from any thread"""
+        if self._app is None:
+            return
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return
+                self._inflight, self._pending = self._pending, {}
+                rows = list(self._inflight.values())
+
+            started_at = time.perf_counter()
+            try:
+                with self._app.app_context():
+                    try:
+                        run_write(_insert_rows, rows)
+                    except DBAPIError as e:
+                        if _is_transient(e):
+                            raise
+                        # One bad row fails the whole statement; isolate it so
+                        # the rest commit and it is not retried forever
+                        skipped, rejected = run_write(_insert_rows_individually, rows)
+                        metrics.inc('click_buffer_duplicates_total', skipped)
+                        for row, error in rejected:
+                            logger.error('Dropping buffered click %s: %s (%r)', row['code'], error, row)
+                        metrics.inc('click_buffer_rejected_total', len(rejected))
+            except Exception:
+                # Keep the rows for the next flush, oldest first, within the bound
+                with self._lock:
+                    restored = dict(self._inflight)
+                    restored.update(self._pending)
+                    dropped = max(len(restored) - self.max_pending, 0)
+                    self._pending = dict(list(restored.items())[dropped:])
+                    self._inflight = {}
+                metrics.inc('click_buffer_failed_flushes_total')
+                if dropped:
+                    metrics.inc('click_buffer_dropped_total', dropped)
+                raise
+
+            with self._lock:
+                self._inflight = {}
+            for row in rows:
+                invite_code_filter.add(row['campaign_id'], row['code'])
+            metrics.observe('click_buffer_flush_rows', len(rows))
+            metrics.observe('click_buffer_flush_seconds', time.perf_counter() - started_at)
+
+click_buffer = ClickBuffer()
+
+def init_click_buffer(app):
+    """Enable write-behind click inserts when CLICK_WRITE_BEHIND is set"""
+    metrics.register_collector(lambda: [('click_buffer_pending', {}, click_buffer.size())])
+    if app.config.get('CLICK_WRITE_BEHIND'):
+        click_buffer.configure(
+            app,
+            flush_interval=app.config.get('CLICK_BUFFER_FLUSH_MS', 500) / 1000,
+            max_rows=app.config.get('CLICK_BUFFER_MAX_ROWS', 500),
+            max_pending=app.config.get('CLICK_BUFFER_MAX_PENDING', 50000)
+        )
@@ -0,0 +1,75 @@
+import hashlib
+import threading
+import time
+from src.services.metrics import metrics
+
+# Seconds kept between a coalesced entry's expiry and its invite link's expiry
+EXPIRY_MARGIN_SECONDS = 60
+
+def click_fingerprint(campaign_id, remote_addr, user_agent, utm_params):
+    """Compact key for one visitor clicking one ad variant"""
+    parts = [str(campaign_id), remote_addr or '', user_agent or '']
+    parts.extend(utm_params.get(name) or '' for name in sorted(utm_params))
+    return hashlib.blake2b('\x1f'.join(parts).encode('utf-8'), digest_size=16).digest()
+
+class ClickCoalescer:
+    """Short-lived per-process map from click fingerprints to invite links.
+
+    Repeat clicks within `ttl` seconds reuse the link created for the first
+    click. Entries never outlive the link they point to.
+    """
+
+    def __init__(self, ttl=600, max_entries=50000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, fingerprint):
+        if not self.ttl:
+            return None
+        entry = self._entries.get(fingerprint)
+        hit = entry is not None and entry[0] > time.monotonic()
+        metrics.record_cache('click_coalesce', hit)
+        return entry[2] if hit else None
+
+    def put(self, fingerprint, campaign_id, invite_link, link_expires_in=None):
+        ttl = self.ttl
+        if link_expires_in is not None:
+            ttl = min(ttl, link_expires_in - EXPIRY_MARGIN_SECONDS)
+        if ttl <= 0:
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._evict_expired(now)
+            if len(self._entries) >= self.max_entries:
+                # Still full: drop the entry closest to expiry
+                del self._entries[min(self._entries, key=lambda k: self._entries[k][0])]
+            self._entries[fingerprint] = (now + ttl, str(campaign_id), invite_link)
+
+    def _evict_expired(self, now):
+        for key in [k for k, entry in self._entries.items() if entry[0] <= now]:
+            del self._entries[key]
+
+    def invalidate_campaign(self, campaign_id):
+        """Forget links of a campaign whose bot or status changed"""
+        campaign_id = str(campaign_id)
+        with self._lock:
+            for key in [k for k, entry in self._entries.items() if entry[1] == campaign_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+click_coalescer = ClickCoalescer()
+
+def init_click_coalescing(app):
+    click_coalescer.ttl = app.config.get('CLICK_COALESCE_TTL', 600)
+    click_coalescer.max_entries = app.config.get('CLICK_COALESCE_MAX_ENTRIES', 50000)
+    metrics.register_collector(lambda: [('click_coalesce_entries', {}, len(click_coalescer))])
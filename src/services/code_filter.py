@@ -0,0 +1,225 @@
+import hashlib
+import logging
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from src.models import db
+from src.models.invite_link import InviteLink
+from src.services.invite_codes import decode_code
+from src.services.metrics import metrics
+from src.services.utm_links import is_static_code
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched and added between yields of the sync thread
+SYNC_BATCH_ROWS = 1000
+
+# Every worker holds its own copy of the same filter; memory adds up, the rest does not
+metrics.define_gauge('invite_code_filter_items', 'max')
+metrics.define_gauge('invite_code_filter_estimated_error_rate', 'max')
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings, using double hashing of one
+    blake2b digest"""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = max(int(capacity), 1)
+        self.error_rate = error_rate
+        self.num_bits = max(int(-self.capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.num_hashes = max(int(round(self.num_bits / self.capacity * math.log(2))), 1)
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, key):
+        positions = self._positions(key)
+        # Setting a bit is read-modify-write on a byte; concurrent adds must not lose bits
+        with self._lock:
+            for position in positions:
+                self.bits[position >> 3] |= 1 << (position & 7)
+            self.count += 1
+
+    def __contains__(self, key):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    @property
+    def memory_bytes(self):
+        return len(self.bits)
+
+    def estimated_error_rate(self):
+        """Expected false-positive rate at the current fill"""
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+def _key(campaign_id, code):
+    return f'{campaign_id}:{code}'
+
+class InviteCodeFilter:
+    """Per-process Bloom filter of (campaign, code) pairs in invite_links.
+
+    Built from the table in a background thread and topped up every
+    `sync_interval` seconds with rows inserted since the previous sync,
+    which covers inserts from every worker. Rows this process flushes from
+    the write-behind buffer are added directly, since their codes can be
+    much older than their insert. A miss is only trusted for codes that
+    must already be visible to the last sync: generated codes minted
+    before the sync started (less `margin` for clock skew and commit lag)
+    and names in no generated format. Static per-UTM codes, newer codes
+    and lookups before the first load always go to the DB.
+    """
+
+    def __init__(self, capacity=1000000, error_rate=0.001, sync_interval=30.0, margin=300.0):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self.margin = margin
+        self.enabled = False
+        self._app = None
+        self._reset()
+        os.register_at_fork(after_in_child=self._restart)
+
+    def _reset(self):
+        self._filter = None
+        self._horizon = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def _restart(self):
+        # The child keeps the parent's filter but needs its own sync thread
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def configure(self, app, capacity, error_rate, sync_interval, margin):
+        self._app = app
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self.margin = margin
+        self.enabled = True
+
+    def add(self, campaign_id, code):
+        """Record a row this process just inserted"""
+        bloom = self._filter
+        if bloom is not None:
+            bloom.add(_key(campaign_id, code))
+
+    def might_contain(self, campaign_id, code):
+        """False only when the code is certainly not stored for the campaign"""
+        if not self.enabled:
+            return True
+        if self._thread is None:
+            self._start()
+
+        bloom, horizon = self._filter, self._horizon
+        if bloom is None:
+            result = 'not_ready'
+        elif _key(campaign_id, code) in bloom:
+            result = 'maybe'
+        elif is_static_code(code):
+            result = 'unsure'
+        else:
+            decoded = decode_code(code)
+            if decoded and decoded['timestamp_ms'] >= horizon:
+                result = 'unsure'
+            else:
+                result = 'absent'
+
+        metrics.inc('invite_code_filter_checks_total', result=result)
+        return result != 'absent'
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='invite-code-filter', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        since = None
+        while True:
+            try:
+                since = self._sync(since)
+            except Exception:
+                logger.exception('Invite code filter sync failed')
+            time.sleep(self.sync_interval)
+
+    def _sync(self, since):
+        """Add rows created after `since` (everything when None), rebuilding
+        when the filter is over capacity; returns the next `since`"""
+        started_at = datetime.utcnow()
+        bloom = self._filter
+        if bloom is None or since is None or bloom.count > bloom.capacity:
+            capacity = self.capacity
+            if bloom is not None:
+                while capacity < bloom.count * 2:
+                    capacity *= 2
+            bloom = BloomFilter(capacity, self.error_rate)
+            since = None
+
+        with self._app.app_context():
+            query = select(InviteLink.campaign_id, InviteLink.code).execution_options(yield_per=SYNC_BATCH_ROWS)
+            if since is not None:
+                # By insert time, not click time: buffered clicks arrive late
+                query = query.where(InviteLink.inserted_at >= since - timedelta(seconds=self.margin))
+            try:
+                for rows in db.session.execute(query).partitions():
+                    for campaign_id, code in rows:
+                        bloom.add(_key(campaign_id, code))
+                    # A full load is seconds of pure Python; under gevent this
+                    # thread is a greenlet, so give requests a turn between batches
+                    time.sleep(0.001)
+            finally:
+                db.session.remove()
+
+        if bloom is not self._filter:
+            metrics.inc('invite_code_filter_rebuilds_total')
+        self._filter = bloom
+        epoch_ms = (started_at - datetime(1970, 1, 1)).total_seconds() * 1000
+        self._horizon = epoch_ms - self.margin * 1000
+        return started_at
+
+    def stats(self):
+        bloom = self._filter
+        if bloom is None:
+            return {'ready': False}
+        return {
+            'ready': True,
+            'items': bloom.count,
+            'capacity': bloom.capacity,
+            'memory_bytes': bloom.memory_bytes,
+            'hash_functions': bloom.num_hashes,
+            'target_error_rate': bloom.error_rate,
+            'estimated_error_rate': round(bloom.estimated_error_rate(), 6)
+        }
+
+invite_code_filter = InviteCodeFilter()
+
+def _filter_samples():
+    stats = invite_code_filter.stats()
+    if not stats['ready']:
+        return []
+    return [
+        ('invite_code_filter_items', {}, stats['items']),
+        ('invite_code_filter_memory_bytes', {}, stats['memory_bytes']),
+        ('invite_code_filter_estimated_error_rate', {}, stats['estimated_error_rate']),
+    ]
+
+def init_invite_code_filter(app):
+    """Skip invite link lookups for codes no campaign minted"""
+    metrics.register_collector(_filter_samples)
+    if app.config.get('INVITE_CODE_FILTER'):
+        invite_code_filter.configure(
+            app,
+            capacity=app.config.get('INVITE_CODE_FILTER_CAPACITY', 1000000),
+            error_rate=app.config.get('INVITE_CODE_FILTER_ERROR_RATE', 0.001),
+            sync_interval=app.config.get('INVITE_CODE_FILTER_SYNC_SECONDS', 30),
+            margin=app.config.get('INVITE_CODE_FILTER_MARGIN_SECONDS', 300)
+        )
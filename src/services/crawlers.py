@@ -0,0 +1,98 @@
+import ipaddress
+import re
+from src.services.metrics import metrics
+
+# User-agent tokens of ad-review bots and link-preview fetchers, by source.
+# Only tokens the fetchers send: the in-app browsers of TikTok, Pinterest,
+# Snapchat, Instagram and others carry their app's name too, and those
+# visitors are the clicks being tracked
+CRAWLER_USER_AGENTS = [
+    ('facebook', r'facebookexternalhit|facebookcatalog|Facebot|meta-externalagent|meta-externalfetcher'),
+    ('telegram', r'TelegramBot'),
+    ('whatsapp', r'WhatsApp/'),
+    ('google', r'AdsBot-Google|Mediapartners-Google|Googlebot|Google-Adwords|Google-InspectionTool|APIs-Google|FeedFetcher-Google|Google-Read-Aloud'),
+    ('twitter', r'Twitterbot'),
+    ('linkedin', r'LinkedInBot'),
+    ('slack', r'Slackbot|Slack-ImgProxy'),
+    ('discord', r'Discordbot'),
+    ('microsoft', r'bingbot|BingPreview|AdIdxBot|SkypeUriPreview'),
+    ('apple', r'Applebot'),
+    ('bytedance', r'Bytespider|TikTokBot'),
+    ('pinterest', r'Pinterestbot|Pinterest/0\.'),
+    ('snapchat', r'Snap URL Preview Service'),
+    ('other', r'vkShare|redditbot|Iframely|Embedly|Yahoo! Slurp|YandexBot|DuckDuckBot'),
+]
+
+# Networks announced by the crawlers' ASNs: Meta (AS32934), Telegram (AS62041, AS59930),
+# Google crawler ranges (AS15169)
+CRAWLER_NETWORKS = [
+    ('facebook', '31.13.24.0/21'), ('facebook', '31.13.64.0/18'), ('facebook', '66.220.144.0/20'),
+    ('facebook', '69.63.176.0/20'), ('facebook', '69.171.224.0/19'), ('facebook', '173.252.64.0/18'),
+    ('facebook', '2a03:2880::/32'),
+    ('telegram', '91.108.4.0/22'), ('telegram', '91.108.8.0/22'), ('telegram', '91.108.16.0/22'),
+    ('telegram', '91.108.56.0/22'), ('telegram', '149.154.160.0/20'), ('telegram', '2001:67c:4e8::/48'),
+    ('google', '66.249.64.0/19'), ('google', '2001:4860:4801::/48'),
+]
+
+class CrawlerMatcher:
+    """Classifies requests from crawlers by user agent or source network"""
+
+    def __init__(self, user_agents=CRAWLER_USER_AGENTS, networks=CRAWLER_NETWORKS):
+        self.configure(user_agents, networks)
+
+    def configure(self, user_agents, networks):
+        # One alternation with a named group per source; lastgroup names the match
+        self._user_agent_pattern = re.compile(
+            '|'.join(f'(?P<{name}>{pattern})' for name, pattern in user_agents),
+            re.IGNORECASE
+        )
+
+        # Networks bucketed by (version, prefix length) for set lookups
+        self._networks = {}
+        for name, cidr in networks:
+            network = ipaddress.ip_network(cidr, strict=False)
+            key = (network.version, network.prefixlen)
+            prefix = int(network.network_address) >> (network.max_prefixlen - network.prefixlen)
+            self._networks.setdefault(key, {})[prefix] = name
+
+    def classify(self, user_agent, remote_addr=None):
+        """Crawler source name, or None for a regular visitor"""
+        if user_agent:
+            match = self._user_agent_pattern.search(user_agent)
+            if match:
+                return match.lastgroup
+
+        if remote_addr:
+            try:
+                address = ipaddress.ip_address(remote_addr)
+            except ValueError:
+                return None
+            value = int(address)
+            for (version, prefixlen), prefixes in self._networks.items():
+                if version == address.version:
+                    name = prefixes.get(value >> (address.max_prefixlen - prefixlen))
+                    if name:
+                        return name
+
+        return None
+
+crawler_matcher = CrawlerMatcher()
+
+CRAWLER_PAGE = b'''<!DOCTYPE html>
+<html><head>
+<meta charset="utf-8">
+<meta name="robots" content="noindex, nofollow">
+<meta property="og:title" content="Telegram">
+<meta property="og:description" content="Join us on Telegram">
+<title>Telegram</title>
+</head><body></body></html>'''
+
+def record_crawler_hit(crawler, route):
+    metrics.inc('crawler_requests_total', crawler=crawler, route=route)
+
+def init_crawler_detection(app):
+    """Append extra user-agent patterns and CIDRs from the config"""
+    extra_agents = [(f'custom{i}', re.escape(token)) for i, token in enumerate(app.config.get('CRAWLER_EXTRA_USER_AGENTS', []))]
+    extra_networks = [('custom', cidr) for cidr in app.config.get('CRAWLER_EXTRA_NETWORKS', [])]
+    if extra_agents or extra_networks:
+        crawler_matcher.configure(CRAWLER_USER_AGENTS + extra_agents, CRAWLER_NETWORKS + extra_networks)
@@ -0,0 +1,101 @@
+import time
+from flask import current_app, g, has_app_context
+from sqlalchemy import event, exc
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
+from src.services.metrics import metrics
+
+metrics.define_histogram('db_pool_checkout_seconds', (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0))
+# The busiest worker's pool is the one about to refuse connections
+metrics.define_gauge('db_pool_saturation', 'max')
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection"""
+
+    label = 'default'
+
+    def connect(self):
+        started_at = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            metrics.inc('db_pool_timeouts_total', bind=self.label)
+            raise
+        finally:
+            metrics.observe('db_pool_checkout_seconds', time.perf_counter() - started_at, bind=self.label)
+
+    def recreate(self):
+        # engine.dispose() swaps in a new pool; keep the metrics label
+        pool = super().recreate()
+        pool.label = self.label
+        return pool
+
+def _is_memory_sqlite(uri):
+    return uri.startswith('sqlite') and (':memory:' in uri or uri.rstrip('/') in ('sqlite:', 'sqlite://'))
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS built from the DB_POOL_* settings"""
+    options = {'pool_pre_ping': config.get('DB_POOL_PRE_PING', True)}
+    if _is_memory_sqlite(config['SQLALCHEMY_DATABASE_URI']):
+        # In-memory SQLite lives in a single connection; keep the default pool
+        return options
+
+    options.update({
+        'poolclass': TimedQueuePool,
+        'pool_size': config.get('DB_POOL_SIZE', 10),
+        'max_overflow': config.get('DB_MAX_OVERFLOW', 20),
+        'pool_timeout': config.get('DB_POOL_TIMEOUT', 5),
+        'pool_recycle': config.get('DB_POOL_RECYCLE', 1800),
+    })
+    return options
+
+def pool_status(app):
+    """Checked-out connections and saturation of each bind's pool"""
+    status = {}
+    with app.app_context():
+        for bind, engine in app.extensions['sqlalchemy'].engines.items():
+            pool = engine.pool
+            if not isinstance(pool, QueuePool):
+                continue
+            size = pool.size()
+            max_overflow = pool._max_overflow
+            checked_out = pool.checkedout()
+            # max_overflow of -1 means the pool never blocks
+            capacity = size + max_overflow if max_overflow >= 0 else None
+            status[bind or 'default'] = {
+                'size': size,
+                'max_overflow': max_overflow,
+                'checked_out': checked_out,
+                'saturation': round(checked_out / capacity, 3) if capacity else 0.0
+            }
+    return status
+
+def set_statement_timeout():
+    """before_request hook that caps each statement of the request at
+    DASHBOARD_STATEMENT_TIMEOUT_MS"""
+    timeout_ms = current_app.config.get('DASHBOARD_STATEMENT_TIMEOUT_MS', 0)
+    if timeout_ms:
+        g.statement_timeout_ms = int(timeout_ms)
+
+def _apply_statement_timeout(session, transaction, connection):
+    if not has_app_context():
+        return
+    timeout_ms = g.get('statement_timeout_ms')
+    if timeout_ms and connection.dialect.name == 'postgresql':
+        # SET LOCAL ends with the transaction, so pooled connections come back clean
+        connection.exec_driver_sql(f'SET LOCAL statement_timeout = {timeout_ms}')
+
+def init_db_pool(app):
+    """Label pool metrics per bind and apply request statement timeouts"""
+    with app.app_context():
+        for bind, engine in app.extensions['sqlalchemy'].engines.items():
+            if isinstance(engine.pool, TimedQueuePool):
+                engine.pool.label = bind or 'default'
+
+    if not event.contains(Session, 'after_begin', _apply_statement_timeout):
+        event.listen(Session, 'after_begin', _apply_statement_timeout)
+
+    metrics.register_collector(lambda: [
+        ('db_pool_saturation', {'bind': bind}, pool['saturation'])
+        for bind, pool in pool_status(app).items()
+    ])
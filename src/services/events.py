@@ -0,0 +1,104 @@
+import json
+import queue
+import threading
+import itertools
+
+class Subscription:
+    """A single SSE client listening for one user's events"""
+
+    def __init__(self, user_id, max_buffer):
+        self.user_id = user_id
+        self.queue = queue.Queue(maxsize=max_buffer)
+        self.dropped = 0
+
+    def push(self, item):
+        """Queue an event, dropping the oldest one if the buffer is full"""
+        while True:
+            try:
+                self.queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout):
+        return self.queue.get(timeout=timeout)
+
+class LeadEventBroker:
+    """In-process pub/sub that fans lead events out to dashboard streams.
+
+    Only subscribers connected to the same worker process receive an event.
+    """
+
+    def __init__(self, max_buffer=100):
+        self.max_buffer = max_buffer
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._ids = itertools.count(1)
+
+    def subscribe(self, user_id, max_buffer=None):
+        subscription = Subscription(user_id, max_buffer or self.max_buffer)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def publish(self, user_id, event, data):
+        """Deliver an event to every stream open for this user"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        if not subscribers:
+            return 0
+
+        item = (next(self._ids), event, data)
+        for subscription in subscribers:
+            subscription.push(item)
+        return len(subscribers)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(s) for s in self._subscribers.values())
+
+def format_sse(event, data, event_id=None):
+    """Serialize one Server-Sent Events message"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return '\n'.join(lines) + '\n\n'
+
+def event_stream(broker, subscription, heartbeat_interval=15):
+    """Yield SSE messages for a subscription until the client disconnects"""
+    try:
+        yield 'retry: 5000\n\n'
+        yield format_sse('ready', {'subscribers': broker.subscriber_count()})
+
+        while True:
+            try:
+                event_id, event, data = subscription.get(timeout=heartbeat_interval)
+            except queue.Empty:
+                # Comment lines keep proxies from closing idle connections
+                yield ': heartbeat\n\n'
+                continue
+
+            # Events were dropped for a slow client, ask it to refetch the overview
+            if subscription.dropped:
+                subscription.dropped = 0
+                yield format_sse('resync', {'reason': 'buffer_overflow'})
+
+            yield format_sse(event, data, event_id)
+    finally:
+        broker.unsubscribe(subscription)
+
+lead_events = LeadEventBroker()
@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import delete, desc
+from src.models import db
+from src.models.campaign import Campaign
+from src.models.job import JobOutput
+from src.models.lead import TelegramLead
+
+EXPORT_TYPES = ('leads', 'campaigns')
+
+def build_export(user_id, export_type, campaign_id=None, start=None, end=None):
+    """Rows of a leads or campaigns export for one user"""
+    if export_type == 'leads':
+        query = db.session.query(TelegramLead).join(
+            Campaign, TelegramLead.campaign_id == Campaign.id
+        ).filter(Campaign.user_id == user_id)
+
+        if campaign_id:
+            query = query.filter(Campaign.id == campaign_id)
+        if start:
+            query = query.filter(TelegramLead.created_at >= start)
+        if end:
+            query = query.filter(TelegramLead.created_at <= end)
+
+        return [
+            {
+                'telegram_id': lead.telegram_id,
+                'username': lead.username,
+                'first_name': lead.first_name,
+                'last_name': lead.last_name,
+                'group_name': lead.group_name,
+                'utm_source': lead.utm_source,
+                'utm_medium': lead.utm_medium,
+                'utm_campaign': lead.utm_campaign,
+                'utm_content': lead.utm_content,
+                'utm_term': lead.utm_term,
+                'entry_date': lead.entry_date.isoformat() if lead.entry_date else None,
+                'created_at': lead.created_at.isoformat() if lead.created_at else None,
+                'campaign_name': lead.campaign.name if lead.campaign else None
+            }
+            for lead in query.order_by(desc(TelegramLead.created_at)).all()
+        ]
+
+    if export_type == 'campaigns':
+        export_data = []
+        for campaign in Campaign.query.filter_by(user_id=user_id).all():
+            # Get lead count for each campaign
+            campaign_data = campaign.to_dict()
+            campaign_data['lead_count'] = TelegramLead.query.filter_by(campaign_id=campaign.id).count()
+            export_data.append(campaign_data)
+        return export_data
+
+    raise ValueError('Invalid export type')
+
+def purge_expired_exports(now=None, retention_hours=None):
+    """Delete stored export outputs older than EXPORT_RETENTION_HOURS"""
+    now = now or datetime.utcnow()
+    retention_hours = retention_hours or current_app.config.get('EXPORT_RETENTION_HOURS', 24)
+    deleted = db.session.execute(
+        delete(JobOutput).where(JobOutput.created_at < now - timedelta(hours=retention_hours))
+    ).rowcount
+    db.session.commit()
+    return deleted
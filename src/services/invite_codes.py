@@ -0,0 +1,127 @@
+import hashlib
+import os
+import socket
+import threading
+import time
+
+BASE62 = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+_BASE62_INDEX = {char: index for index, char in enumerate(BASE62)}
+
+# Field widths in base62 digits: milliseconds (~6900 years), node, pid, sequence
+TIME_DIGITS = 8
+NODE_DIGITS = 4
+PID_DIGITS = 4
+SEQ_DIGITS = 2
+CODE_LENGTH = TIME_DIGITS + NODE_DIGITS + PID_DIGITS + SEQ_DIGITS
+
+MAX_NODE = 62 ** NODE_DIGITS
+MAX_PID = 62 ** PID_DIGITS
+MAX_SEQ = 62 ** SEQ_DIGITS
+
+def _encode(value, digits):
+    chars = []
+    for _ in range(digits):
+        value, remainder = divmod(value, 62)
+        chars.append(BASE62[remainder])
+    return ''.join(reversed(chars))
+
+def _decode(chars):
+    value = 0
+    for char in chars:
+        value = value * 62 + _BASE62_INDEX[char]
+    return value
+
+def default_node_id():
+    """Node number derived from the host name. Two hosts can hash to the
+    same number, so deployments with more than one host must set
+    INVITE_CODE_NODE_ID"""
+    digest = hashlib.blake2b(socket.gethostname().encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % MAX_NODE
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+class InviteCodeGenerator:
+    """Invite link codes that do not repeat across threads and processes of
+    a host, without a database round trip.
+
+    A code is base62 millisecond time, node number, process ID and a
+    per-process sequence within the millisecond. Two live processes on one
+    host never share (node, pid). A process that reuses an exited process's
+    pid starts in a later millisecond than any code the old one issued,
+    because a new generator waits for the clock to pass the millisecond it
+    started in, unless the wall clock was stepped back in between. Across
+    hosts codes only stay distinct when each host has its own node number;
+    the unique index on invite_links.code remains the final check.
+    """
+
+    def __init__(self, node_id=None):
+        self.node_id = default_node_id() if node_id is None else int(node_id) % MAX_NODE
+        self._lock = threading.Lock()
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._pid = os.getpid() % MAX_PID
+        self._prefix_tail = _encode(self.node_id, NODE_DIGITS) + _encode(self._pid, PID_DIGITS)
+        # Treat the starting millisecond as used up
+        self._last_ms = _now_ms()
+        self._seq = MAX_SEQ - 1
+
+    def configure(self, node_id=None):
+        if node_id is not None:
+            self.node_id = int(node_id) % MAX_NODE
+            self._prefix_tail = _encode(self.node_id, NODE_DIGITS) + _encode(self._pid, PID_DIGITS)
+
+    def next_code(self):
+        with self._lock:
+            now = _now_ms()
+            if now > self._last_ms:
+                self._last_ms = now
+                self._seq = 0
+            elif self._seq + 1 < MAX_SEQ:
+                # Same millisecond, or the wall clock stepped back: keep counting
+                self._seq += 1
+            elif now < self._last_ms:
+                # Sequence exhausted while the clock is behind; borrow the next millisecond
+                self._last_ms += 1
+                self._seq = 0
+            else:
+                while now <= self._last_ms:
+                    time.sleep(0.0001)
+                    now = _now_ms()
+                self._last_ms = now
+                self._seq = 0
+            return _encode(self._last_ms, TIME_DIGITS) + self._prefix_tail + _encode(self._seq, SEQ_DIGITS)
+
+def is_generated_code(code):
+    """Whether a code came from InviteCodeGenerator"""
+    return bool(code) and len(code) == CODE_LENGTH and all(char in _BASE62_INDEX for char in code)
+
+def decode_code(code):
+    """Split a generated code into its fields, or None for other codes"""
+    if not is_generated_code(code):
+        return None
+    node_at = TIME_DIGITS
+    pid_at = node_at + NODE_DIGITS
+    seq_at = pid_at + PID_DIGITS
+    return {
+        'timestamp_ms': _decode(code[:node_at]),
+        'node_id': _decode(code[node_at:pid_at]),
+        'pid': _decode(code[pid_at:seq_at]),
+        'seq': _decode(code[seq_at:])
+    }
+
+invite_codes = InviteCodeGenerator()
+
+def init_invite_codes(app):
+    """Apply the configured node number for this host"""
+    node_id = app.config.get('INVITE_CODE_NODE_ID')
+    if node_id is None:
+        app.logger.warning(
+            'INVITE_CODE_NODE_ID is not set; using node %s from the host name hash. '
+            'Set a distinct value on every host when more than one runs the app',
+            invite_codes.node_id
+        )
+    invite_codes.configure(node_id=node_id)
@@ -0,0 +1,77 @@
+import json
+from datetime import datetime
+from src.models import db
+from src.models.campaign import Campaign
+from src.models.job import JobOutput
+from src.models.telegram_bot import TelegramBot
+from src.services.bot_health import bot_health, apply_health
+from src.services.exports import build_export
+from src.services.jobs import job_handler, PermanentJobError
+from src.services.telegram_api import telegram_request
+
+def _bot_api(bot_token, method, params=None):
+    """Call a Bot API method; refusals are permanent, outages are retried"""
+    response = telegram_request(bot_token, method, params)
+    if response.status_code == 429 or response.status_code >= 500:
+        raise RuntimeError(f'HTTP {response.status_code}')
+    data = response.json()
+    if not data.get('ok'):
+        raise PermanentJobError(f"Telegram API error: {data.get('description', 'Unknown error')}")
+    return data.get('result')
+
+def _campaign_bot(campaign_id):
+    campaign = db.session.get(Campaign, campaign_id)
+    if not campaign or not campaign.telegram_bot:
+        raise PermanentJobError('Campaign or bot not found')
+    return campaign, campaign.telegram_bot
+
+@job_handler('setup_webhook')
+def setup_webhook(payload, job):
+    campaign, bot = _campaign_bot(payload['campaign_id'])
+    webhook_url = campaign.member_webhook_url
+    _bot_api(bot.bot_token, 'setWebhook', {'url': webhook_url, 'allowed_updates': ['chat_member']})
+    return {'webhook_url': webhook_url}
+
+@job_handler('remove_webhook')
+def remove_webhook(payload, job):
+    campaign, bot = _campaign_bot(payload['campaign_id'])
+    _bot_api(bot.bot_token, 'deleteWebhook')
+    return {'removed': True}
+
+@job_handler('validate_bot')
+def validate_bot(payload, job):
+    bot = db.session.get(TelegramBot, payload['bot_id'])
+    if not bot:
+        raise PermanentJobError('Bot not found')
+
+    health = bot_health.check(bot.bot_token, bot.chat_id, force=True)
+    if health['status'] == 'unreachable':
+        raise RuntimeError(health['error'] or 'Telegram API unreachable')
+
+    apply_health(bot, health)
+    db.session.commit()
+    return {'status': health['status'], 'pending_update_count': health['pending_update_count']}
+
+@job_handler('export')
+def export(payload, job):
+    start = payload.get('start_date')
+    end = payload.get('end_date')
+    try:
+        export_data = build_export(
+            job.owner_id,
+            payload.get('type', 'leads'),
+            campaign_id=payload.get('campaign_id'),
+            start=datetime.fromisoformat(start.replace('Z', '+00:00')) if start else None,
+            end=datetime.fromisoformat(end.replace('Z', '+00:00')) if end else None
+        )
+    except ValueError as e:
+        raise PermanentJobError(str(e))
+
+    # Stored in the database so any web process can serve it; committed with
+    # the job's completion and purged after EXPORT_RETENTION_HOURS
+    db.session.merge(JobOutput(job_id=job.id, content=json.dumps({
+        'data': export_data,
+        'total_records': len(export_data),
+        'export_type': payload.get('type', 'leads')
+    })))
+    return {'total_records': len(export_data)}
@@ -0,0 +1,240 @@
+import json
+import os
+import random
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import and_, func, or_, select, update
+from src.models import db
+from src.models.job import Job
+from src.services.metrics import metrics
+
+# Queue stats are read from the shared table, so the latest reading wins
+metrics.define_gauge('job_queue_depth', 'mostrecent')
+metrics.define_gauge('job_queue_oldest_due_seconds', 'mostrecent')
+
+# Job kind -> handler(payload, job); handlers live in src.services.job_handlers
+HANDLERS = {}
+
+class PermanentJobError(Exception):
+    """A failure that retrying cannot fix; the job fails immediately"""
+
+def job_handler(kind):
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+def load_handlers():
+    import src.services.job_handlers  # noqa: F401 (registers the handlers)
+
+def enqueue(kind, payload=None, priority=0, delay=0, max_attempts=None, owner_id=None, commit=True):
+    """Add a job to the queue; returns the Job"""
+    from flask import current_app
+    job = Job(
+        kind=kind,
+        payload=json.dumps(payload or {}),
+        priority=priority,
+        owner_id=owner_id,
+        max_attempts=max_attempts or current_app.config.get('JOB_MAX_ATTEMPTS', 5),
+        run_at=datetime.utcnow() + timedelta(seconds=delay)
+    )
+    db.session.add(job)
+    if commit:
+        db.session.commit()
+    metrics.inc('jobs_enqueued_total', kind=kind)
+    return job
+
+def _claimable(now):
+    # Due queued jobs, plus running jobs whose worker let the visibility timeout lapse
+    return or_(
+        and_(Job.status == 'queued', Job.run_at <= now),
+        and_(Job.status == 'running', Job.locked_until < now)
+    )
+
+def claim_job(worker_id, visibility_timeout, kinds=None):
+    """Lock the next due job for `worker_id`, or return None.
+
+    PostgreSQL uses SELECT ... FOR UPDATE SKIP LOCKED so concurrent workers
+    never wait on each other; elsewhere a conditional UPDATE acts as the
+    compare-and-set.
+    """
+    now = datetime.utcnow()
+    query = select(Job.id).where(_claimable(now)).order_by(Job.priority.desc(), Job.run_at)
+    if kinds:
+        query = query.where(Job.kind.in_(kinds))
+
+    claim = update(Job).values(
+        status='running',
+        attempts=Job.attempts + 1,
+        locked_by=worker_id,
+        locked_until=now + timedelta(seconds=visibility_timeout),
+        started_at=now
+    )
+
+    job_id = None
+    if db.engine.dialect.name == 'postgresql':
+        job_id = db.session.execute(query.limit(1).with_for_update(skip_locked=True)).scalar()
+        if job_id is not None:
+            db.session.execute(claim.where(Job.id == job_id))
+    else:
+        for candidate in db.session.execute(query.limit(5)).scalars().all():
+            if db.session.execute(claim.where(Job.id == candidate, _claimable(now))).rowcount == 1:
+                job_id = candidate
+                break
+    db.session.commit()
+
+    if job_id is None:
+        return None
+
+    job = db.session.get(Job, job_id)
+    metrics.observe('job_wait_seconds', max((now - job.run_at).total_seconds(), 0), kind=job.kind)
+    return job
+
+def _finish(job, worker_id, **values):
+    """Apply the outcome only if this worker still owns the job"""
+    updated = db.session.execute(
+        update(Job).where(Job.id == job.id, Job.status == 'running', Job.locked_by == worker_id).values(**values)
+    ).rowcount
+    db.session.commit()
+    return updated == 1
+
+def complete_job(job, worker_id, result=None):
+    return _finish(
+        job, worker_id,
+        status='done',
+        result=json.dumps(result) if result is not None else None,
+        locked_until=None,
+        finished_at=datetime.utcnow()
+    )
+
+def retry_delay(attempts, base, cap):
+    """Exponential back-off with +/-10% jitter"""
+    delay = min(base * (2 ** max(attempts - 1, 0)), cap)
+    return delay * random.uniform(0.9, 1.1)
+
+def fail_job(job, worker_id, error, permanent=False, backoff_base=10, backoff_cap=3600):
+    """Requeue with back-off, or mark failed once attempts are used up"""
+    if permanent or job.attempts >= job.max_attempts:
+        _finish(job, worker_id, status='failed', last_error=error, locked_until=None, finished_at=datetime.utcnow())
+        return 'failed'
+
+    run_at = datetime.utcnow() + timedelta(seconds=retry_delay(job.attempts, backoff_base, backoff_cap))
+    _finish(job, worker_id, status='queued', last_error=error, locked_by=None, locked_until=None, run_at=run_at)
+    return 'retry'
+
+def queue_stats():
+    """Job counts per kind and status, and the age of the oldest due job per kind"""
+    now = datetime.utcnow()
+    counts = {}
+    for kind, status, count in db.session.query(Job.kind, Job.status, func.count(Job.id)).filter(
+        Job.status.in_(('queued', 'running'))
+    ).group_by(Job.kind, Job.status):
+        counts.setdefault(kind, {})[status] = count
+
+    oldest = {}
+    for kind, run_at in db.session.query(Job.kind, func.min(Job.run_at)).filter(
+        Job.status == 'queued', Job.run_at <= now
+    ).group_by(Job.kind):
+        oldest[kind] = round((now - run_at).total_seconds(), 1) if run_at else 0
+    db.session.rollback()
+    return {'depth': counts, 'oldest_due_seconds': oldest}
+
+class JobWorker:
+    """Pulls jobs from the queue on `threads` threads until stopped"""
+
+    def __init__(self, app, threads=1, kinds=None, poll_interval=1.0, burst=False):
+        self.app = app
+        self.threads = threads
+        self.kinds = kinds
+        self.poll_interval = poll_interval
+        self.burst = burst
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        self._stop = threading.Event()
+        self._last_stats = 0.0
+        self._stats_lock = threading.Lock()
+        self._seen_kinds = set()
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self):
+        load_handlers()
+        workers = [
+            threading.Thread(target=self._loop, args=(n,), name=f'job-worker-{n}', daemon=True)
+            for n in range(self.threads)
+        ]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            while thread.is_alive():
+                thread.join(0.5)
+        with self.app.app_context():
+            self._record_stats(force=True)
+        metrics.flush()
+
+    def _loop(self, number):
+        worker_id = f'{self.worker_id}:{number}'
+        config = self.app.config
+        while not self._stop.is_set():
+            with self.app.app_context():
+                job = claim_job(worker_id, config.get('JOB_VISIBILITY_TIMEOUT', 300), self.kinds)
+                if job is not None:
+                    self.process(job, worker_id)
+                self._record_stats()
+                metrics.maybe_flush()
+                db.session.remove()
+
+            if job is None:
+                if self.burst:
+                    return
+                self._stop.wait(self.poll_interval)
+
+    def process(self, job, worker_id):
+        config = self.app.config
+        started_at = time.perf_counter()
+        outcome = 'done'
+
+        if job.attempts > job.max_attempts:
+            # Reclaimed after its last attempt timed out
+            outcome = fail_job(job, worker_id, 'Visibility timeout exceeded on last attempt', permanent=True)
+        else:
+            handler = HANDLERS.get(job.kind)
+            try:
+                if handler is None:
+                    raise PermanentJobError(f'No handler for job kind {job.kind}')
+                result = handler(job.data, job)
+                complete_job(job, worker_id, result)
+            except Exception as e:
+                db.session.rollback()
+                outcome = fail_job(
+                    job, worker_id, f'{type(e).__name__}: {e}',
+                    permanent=isinstance(e, PermanentJobError),
+                    backoff_base=config.get('JOB_BACKOFF_BASE_SECONDS', 10),
+                    backoff_cap=config.get('JOB_BACKOFF_MAX_SECONDS', 3600)
+                )
+                self.app.logger.warning('Job %s (%s) %s: %s', job.id, job.kind, outcome, e)
+
+        metrics.observe('job_duration_seconds', time.perf_counter() - started_at, kind=job.kind)
+        metrics.inc('jobs_processed_total', kind=job.kind, outcome=outcome)
+
+    def _record_stats(self, force=False):
+        """Publish queue depth gauges every JOB_STATS_SECONDS from one thread"""
+        interval = self.app.config.get('JOB_STATS_SECONDS', 15)
+        if not force and time.monotonic() - self._last_stats < interval:
+            return
+        if not self._stats_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_stats = time.monotonic()
+            stats = queue_stats()
+            # Kinds seen earlier and now drained report zero rather than a stale value
+            self._seen_kinds.update(stats['depth'])
+            for kind in self._seen_kinds:
+                statuses = stats['depth'].get(kind, {})
+                for status in ('queued', 'running'):
+                    metrics.set_gauge('job_queue_depth', statuses.get(status, 0), kind=kind, status=status)
+                metrics.set_gauge('job_queue_oldest_due_seconds', stats['oldest_due_seconds'].get(kind, 0), kind=kind)
+        finally:
+            self._stats_lock.release()
@@ -0,0 +1,334 @@
+import bisect
+import glob
+import json
+import os
+import sys
+import threading
+import time
+from flask import Response, g, jsonify, request
+
+try:
+    # Under gevent's monkey patching threading idents and locals are per greenlet
+    from gevent.monkey import get_original
+    _os_thread_ident = get_original('_thread', 'get_ident')
+except ImportError:
+    _os_thread_ident = threading.get_ident
+
+# Default latency buckets in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# How a gauge reported by several workers is combined, after prometheus_client's
+# multiprocess_mode: sum per-process amounts, take max/min, keep the most
+# recently written value of a database-wide reading, or show all with a pid label
+GAUGE_MODES = ('sum', 'max', 'min', 'mostrecent', 'all')
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+class _Shard:
+    """Series written by a single OS thread, so updates never take a lock"""
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+
+    def merge(self, other):
+        for key, value in list(other.counters.items()):
+            self.counters[key] = self.counters.get(key, 0) + value
+        for key, value in list(other.histograms.items()):
+            merged = self.histograms.get(key)
+            self.histograms[key] = list(value) if merged is None else [a + b for a, b in zip(merged, value)]
+
+class MetricsRegistry:
+    """In-process registry of counters, gauges and histograms.
+
+    Counters and histograms are sharded per OS thread and only merged when
+    a snapshot is taken; greenlets on one thread share its shard, since they
+    never switch in the middle of an update. With a multiprocess directory configured, every
+    worker writes its snapshot there and exposition sums all workers; gauges
+    are combined by the mode given to define_gauge, summed by default.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._shards = {}
+        # Series of threads that have exited
+        self._retired = _Shard()
+        self._shards_lock = threading.Lock()
+        self._gauges = {}
+        self._gauge_times = {}
+        self._gauge_modes = {}
+        self._histogram_buckets = {}
+        self._collectors = []
+        self.multiprocess_dir = None
+        self.flush_interval = 5.0
+        self._last_flush = 0.0
+        self._flush_lock = threading.Lock()
+
+    def _shard(self):
+        ident = _os_thread_ident()
+        shard = self._shards.get(ident)
+        if shard is None:
+            with self._shards_lock:
+                shard = self._shards.setdefault(ident, _Shard())
+        return shard
+
+    def define_histogram(self, name, buckets):
+        """Use custom bucket bounds for a histogram"""
+        self._histogram_buckets[name] = tuple(buckets)
+
+    def define_gauge(self, name, mode):
+        """Set how a gauge is combined across workers; one of GAUGE_MODES"""
+        if mode not in GAUGE_MODES:
+            raise ValueError(f'Unknown gauge mode: {mode}')
+        self._gauge_modes[name] = mode
+
+    def register_collector(self, collector):
+        """Add a callable run at snapshot time that returns gauge samples
+        as (name, labels, value) tuples"""
+        self._collectors.append(collector)
+
+    def inc(self, name, value=1, **labels):
+        counters = self._shard().counters
+        key = _key(name, labels)
+        counters[key] = counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        key = _key(name, labels)
+        self._gauges[key] = value
+        self._gauge_times[key] = time.time()
+
+    def observe(self, name, value, **labels):
+        histograms = self._shard().histograms
+        key = _key(name, labels)
+        buckets = self._histogram_buckets.get(name, self.buckets)
+        histogram = histograms.get(key)
+        if histogram is None:
+            # Per-bucket counts, with one extra slot for +Inf, then count and sum
+            histogram = histograms[key] = [0] * (len(buckets) + 1) + [0, 0.0]
+        histogram[bisect.bisect_left(buckets, value)] += 1
+        histogram[-2] += 1
+        histogram[-1] += value
+
+    def record_cache(self, cache, hit):
+        self.inc('cache_requests_total', cache=cache, result='hit' if hit else 'miss')
+
+    def snapshot(self):
+        """Merged copy of all series in this process, keyed by (name, labels)"""
+        with self._shards_lock:
+            # Fold shards of exited threads into one, so their count stays bounded
+            live = sys._current_frames()
+            for ident in [ident for ident in self._shards if ident not in live]:
+                self._retired.merge(self._shards.pop(ident))
+            shards = list(self._shards.values())
+
+            merged = _Shard()
+            merged.merge(self._retired)
+
+        for shard in shards:
+            merged.merge(shard)
+        counters = merged.counters
+        histograms = merged.histograms
+
+        gauges = dict(self._gauges)
+        for collector in self._collectors:
+            try:
+                for name, labels, value in collector():
+                    gauges[_key(name, labels)] = value
+            except Exception:
+                continue
+
+        return {'counters': counters, 'gauges': gauges, 'histograms': histograms}
+
+    # Multiprocess aggregation
+
+    def enable_multiprocess(self, directory, flush_interval=5.0):
+        os.makedirs(directory, exist_ok=True)
+        self.multiprocess_dir = directory
+        self.flush_interval = flush_interval
+
+    def maybe_flush(self):
+        """Write this worker's snapshot if the flush interval has passed"""
+        if self.multiprocess_dir and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if not self.multiprocess_dir:
+            return
+        # Only one thread writes this worker's file at a time
+        if not self._flush_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_flush = time.monotonic()
+            snapshot = self.snapshot()
+            payload = {
+                kind: [[name, list(labels), value] for (name, labels), value in series.items()]
+                for kind, series in snapshot.items()
+            }
+            # When each gauge was written, for mostrecent; collector samples are read now
+            now = time.time()
+            payload['gauge_times'] = [
+                self._gauge_times.get(key, now) for key in snapshot['gauges']
+            ]
+            os.makedirs(self.multiprocess_dir, exist_ok=True)
+            path = os.path.join(self.multiprocess_dir, f'metrics-{os.getpid()}.json')
+            tmp_path = f'{path}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(payload, f)
+            os.replace(tmp_path, path)
+        finally:
+            self._flush_lock.release()
+
+    def aggregate(self):
+        """Snapshot combined across every worker in the multiprocess directory"""
+        if not self.multiprocess_dir:
+            return self.snapshot()
+
+        self.flush()
+        merged = {'counters': {}, 'gauges': {}, 'histograms': {}}
+        # (value, written at, pid) of every live worker per gauge series
+        gauge_samples = {}
+        for path in glob.glob(os.path.join(self.multiprocess_dir, 'metrics-*.json')):
+            try:
+                with open(path) as f:
+                    payload = json.load(f)
+                pid = int(os.path.basename(path)[len('metrics-'):-len('.json')])
+            except (OSError, ValueError):
+                continue
+
+            # Counters and histograms of exited workers still count; their gauges do not
+            if _pid_alive(pid):
+                gauges = payload.get('gauges', [])
+                times = payload.get('gauge_times') or [0] * len(gauges)
+                for (name, labels, value), written_at in zip(gauges, times):
+                    key = (name, tuple(tuple(label) for label in labels))
+                    gauge_samples.setdefault(key, []).append((value, written_at, pid))
+
+            for kind in ('counters', 'histograms'):
+                series = merged[kind]
+                for name, labels, value in payload.get(kind, []):
+                    key = (name, tuple(tuple(label) for label in labels))
+                    if kind == 'histograms':
+                        current = series.get(key)
+                        series[key] = value if current is None else [a + b for a, b in zip(current, value)]
+                    else:
+                        series[key] = series.get(key, 0) + value
+
+        gauges = merged['gauges']
+        for (name, labels), samples in gauge_samples.items():
+            mode = self._gauge_modes.get(name, 'sum')
+            if mode == 'all':
+                for value, _, pid in samples:
+                    gauges[(name, labels + (('pid', str(pid)),))] = value
+            elif mode == 'max':
+                gauges[(name, labels)] = max(value for value, _, _ in samples)
+            elif mode == 'min':
+                gauges[(name, labels)] = min(value for value, _, _ in samples)
+            elif mode == 'mostrecent':
+                gauges[(name, labels)] = max(samples, key=lambda sample: sample[1])[0]
+            else:
+                gauges[(name, labels)] = sum(value for value, _, _ in samples)
+        return merged
+
+    # Exposition
+
+    def render_prometheus(self):
+        """Render all series in the Prometheus text exposition format"""
+        snapshot = self.aggregate()
+        lines = []
+
+        for kind, series in (('counter', snapshot['counters']), ('gauge', snapshot['gauges'])):
+            for name in sorted({name for name, _ in series}):
+                lines.append(f'# TYPE {name} {kind}')
+                for (series_name, labels), value in sorted(series.items()):
+                    if series_name == name:
+                        lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+
+        histograms = snapshot['histograms']
+        for name in sorted({name for name, _ in histograms}):
+            lines.append(f'# TYPE {name} histogram')
+            bounds = self._histogram_buckets.get(name, self.buckets)
+            for (series_name, labels), value in sorted(histograms.items()):
+                if series_name != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(bounds + (float('inf'),), value[:-2]):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else _format_value(bound)
+                    lines.append(f'{name}_bucket{_format_labels(labels + (("le", le),))} {cumulative}')
+                lines.append(f'{name}_count{_format_labels(labels)} {value[-2]}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(value[-1])}')
+
+        return '\n'.join(lines) + '\n'
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+def _format_value(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+metrics = MetricsRegistry()
+
+def _pool_samples(app):
+    """DB connection pool usage per engine"""
+    with app.app_context():
+        engines = app.extensions['sqlalchemy'].engines
+        samples = []
+        for bind, engine in engines.items():
+            pool = engine.pool
+            if not hasattr(pool, 'checkedout'):
+                continue
+            labels = {'bind': bind or 'default'}
+            samples.append(('db_pool_size', labels, pool.size()))
+            samples.append(('db_pool_checked_out', labels, pool.checkedout()))
+            samples.append(('db_pool_overflow', labels, max(pool.overflow(), 0)))
+        return samples
+
+def init_metrics(app):
+    """Record per-route request latency and expose /api/metrics"""
+    directory = app.config.get('METRICS_MULTIPROC_DIR')
+    if directory:
+        metrics.enable_multiprocess(directory, app.config.get('METRICS_FLUSH_SECONDS', 5.0))
+    metrics.register_collector(lambda: _pool_samples(app))
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started_at = time.perf_counter()
+
+    @app.after_request
+    def record_request_metrics(response):
+        started_at = g.pop('request_started_at', None)
+        if started_at is not None:
+            labels = {
+                'route': request.url_rule.rule if request.url_rule else 'unmatched',
+                'blueprint': request.blueprint or 'app',
+                'method': request.method,
+            }
+            metrics.observe('http_request_duration_seconds', time.perf_counter() - started_at, **labels)
+            metrics.inc('http_requests_total', status=str(response.status_code), **labels)
+            metrics.maybe_flush()
+        return response
+
+    @app.route('/api/metrics')
+    def prometheus_metrics():
+        token = app.config.get('METRICS_TOKEN')
+        if token and request.headers.get('Authorization') != f'Bearer {token}':
+            return jsonify({'error': 'Unauthorized'}), 401
+
+        return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,107 @@
+import threading
+import time
+from flask import current_app, jsonify, request
+from src.models import db
+from src.models.user import User
+from src.services.metrics import metrics
+
+class Principal:
+    """What JWT routes need to know about a user, without a DB read"""
+
+    __slots__ = ('user_id', 'is_active', 'plan', 'token_version', 'profile')
+
+    def __init__(self, user):
+        self.user_id = user.id
+        self.is_active = user.is_active
+        self.plan = user.plan
+        self.token_version = user.token_version or 0
+        self.profile = user.to_dict()
+
+class PrincipalCache:
+    """Short-lived per-process cache of principals keyed by user ID.
+
+    Entries expire after `ttl` seconds, so a revocation made by another
+    worker takes effect here within that window.
+    """
+
+    def __init__(self, ttl=30, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        now = time.monotonic()
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[0] > now:
+            metrics.record_cache('principal', True)
+            return entry[1]
+
+        metrics.record_cache('principal', False)
+        # Always the primary: a lagging replica would miss new users and
+        # serve stale token versions
+        user = db.session.get(User, user_id, populate_existing=True, bind_arguments={'bind': db.engine})
+        if user is None:
+            # Not cached, so a user created a moment ago is found on the next request
+            return None
+        principal = Principal(user)
+
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                # Drop the entry closest to expiry to stay bounded
+                del self._entries[min(self._entries, key=lambda k: self._entries[k][0])]
+            self._entries[user_id] = (now + self.ttl, principal)
+        return principal
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+principal_cache = PrincipalCache()
+
+def token_claims(user):
+    """Extra JWT claims tying a token to the user's current token version"""
+    return {'ver': user.token_version or 0}
+
+# Claim of tokens limited to one kind of endpoint; they open nothing else
+STREAM_SCOPE = 'stream'
+
+def token_scope(scope):
+    """Let tokens issued for `scope` open this view; put it above jwt_required"""
+    def decorate(view):
+        view.token_scope = scope
+        return view
+    return decorate
+
+def revoke_user_tokens(user):
+    """Invalidate every token issued to a user so far (logout, deactivation)"""
+    user.token_version = (user.token_version or 0) + 1
+    db.session.commit()
+    principal_cache.invalidate(user.id)
+
+def init_principal_cache(app, jwt):
+    """Reject tokens of inactive users or with a stale token version"""
+    principal_cache.ttl = app.config.get('PRINCIPAL_CACHE_TTL', 30)
+
+    @jwt.token_verification_loader
+    def is_scope_allowed(jwt_header, jwt_payload):
+        scope = jwt_payload.get('scope')
+        if scope is None:
+            return True
+        view = current_app.view_functions.get(request.endpoint)
+        return getattr(view, 'token_scope', None) == scope
+
+    @jwt.token_verification_failed_loader
+    def scope_not_allowed(jwt_header, jwt_payload):
+        return jsonify({'error': 'Token not valid for this endpoint'}), 401
+
+    @jwt.token_in_blocklist_loader
+    def is_token_revoked(jwt_header, jwt_payload):
+        principal = principal_cache.get(jwt_payload['sub'])
+        if principal is None or not principal.is_active:
+            return True
+        return jwt_payload.get('ver', 0) != principal.token_version
@@ -0,0 +1,255 @@
+import hashlib
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from flask import g, request
+
+try:
+    # The sampler must be a real OS thread even when gevent patched threading,
+    # otherwise it only runs when the profiled greenlet yields
+    from gevent.monkey import get_original, is_module_patched
+    _start_new_thread, _allocate_lock, _get_ident = get_original(
+        '_thread', ['start_new_thread', 'allocate_lock', 'get_ident']
+    )
+    _sleep = get_original('time', 'sleep')
+except ImportError:
+    import _thread
+    _start_new_thread, _allocate_lock, _get_ident = _thread.start_new_thread, _thread.allocate_lock, _thread.get_ident
+    _sleep = time.sleep
+    is_module_patched = None
+
+def _current_greenlet():
+    """The running greenlet when gevent patched threading, otherwise None"""
+    if is_module_patched is None or not is_module_patched('threading'):
+        return None
+    from greenlet import getcurrent
+    return getcurrent()
+
+class SamplingProfiler:
+    """Samples one thread's (or greenlet's) Python stack on a timer from a
+    native side thread"""
+
+    def __init__(self, interval=0.005):
+        self.thread_id = _get_ident()
+        self.greenlet = _current_greenlet()
+        self.interval = interval
+        self.samples = Counter()
+        self.started_at = None
+        self.duration = 0.0
+        self._stopping = False
+        self._running = _allocate_lock()
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._running.acquire()
+        _start_new_thread(self._run, ())
+
+    def stop(self):
+        self._stopping = True
+        # Released by the sampler after its last sample, at most one interval away
+        self._running.acquire()
+        self._running.release()
+        self.duration = time.perf_counter() - self.started_at
+
+    def _frame(self):
+        if self.greenlet is not None:
+            # Set while the greenlet is switched out, e.g. waiting on I/O
+            frame = self.greenlet.gr_frame
+            if frame is not None:
+                return frame
+        return sys._current_frames().get(self.thread_id)
+
+    def _run(self):
+        try:
+            while not self._stopping:
+                _sleep(self.interval)
+                if not self._stopping:
+                    self._sample()
+        finally:
+            self._running.release()
+
+    def _sample(self):
+        frame = self._frame()
+        if frame is None:
+            return
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+            frame = frame.f_back
+        stack.reverse()
+        self.samples[tuple(stack)] += 1
+
+    def collapsed(self):
+        """Brendan Gregg's collapsed stack format, one stack per line"""
+        lines = []
+        for stack, count in self.samples.most_common():
+            names = ';'.join(f'{name} ({os.path.basename(filename)}:{line})' for name, filename, line in stack)
+            lines.append(f'{names} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def speedscope(self, name):
+        """Sampled profile in the speedscope file format"""
+        frames = []
+        frame_index = {}
+        samples = []
+        weights = []
+        for stack, count in self.samples.items():
+            indexes = []
+            for frame in stack:
+                if frame not in frame_index:
+                    frame_index[frame] = len(frames)
+                    frames.append({'name': frame[0], 'file': frame[1], 'line': frame[2]})
+                indexes.append(frame_index[frame])
+            samples.append(indexes)
+            weights.append(count * self.interval)
+
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'shared': {'frames': frames},
+            'profiles': [{
+                'type': 'sampled',
+                'name': name,
+                'unit': 'seconds',
+                'startValue': 0,
+                'endValue': self.duration,
+                'samples': samples,
+                'weights': weights
+            }],
+            'name': name,
+            'exporter': 'utm-tracker-profiler'
+        }
+
+def sign_profile_request(secret, timestamp):
+    """Header value that asks the server to profile a request"""
+    digest = hmac.new(secret.encode(), str(timestamp).encode(), hashlib.sha256).hexdigest()
+    return f'{timestamp}.{digest}'
+
+def verify_profile_signature(secret, value, max_age=300):
+    try:
+        timestamp, digest = value.split('.', 1)
+        if abs(time.time() - int(timestamp)) > max_age:
+            return False
+    except ValueError:
+        return False
+    expected = sign_profile_request(secret, timestamp).split('.', 1)[1]
+    return hmac.compare_digest(expected, digest)
+
+class RequestProfiling:
+    """Decides which requests to profile and writes their profiles to disk.
+
+    The sample rate is per process; admins changing it at runtime only
+    affect the worker that served the change.
+    """
+
+    HEADER = 'X-Profile-Request'
+
+    def __init__(self):
+        self.sample_rate = 0.0
+        self.directory = None
+        self.output_format = 'speedscope'
+        self.interval = 0.005
+        self.secret = None
+        self.max_concurrent = 2
+        self.max_files = 200
+        self._active = threading.BoundedSemaphore(self.max_concurrent)
+
+    def configure(self, directory, sample_rate, output_format, interval, secret, max_concurrent, max_files=200):
+        self.directory = directory
+        self.max_files = max_files
+        self.sample_rate = sample_rate
+        self.output_format = output_format
+        self.interval = interval
+        self.secret = secret
+        self.max_concurrent = max_concurrent
+        self._active = threading.BoundedSemaphore(max_concurrent)
+
+    def should_profile(self):
+        if not self.directory:
+            return False, False
+        signed = request.headers.get(self.HEADER)
+        if signed and self.secret and verify_profile_signature(self.secret, signed):
+            return True, True
+        return self.sample_rate > 0 and random.random() < self.sample_rate, False
+
+    def start(self):
+        wanted, signed = self.should_profile()
+        if not wanted or not self._active.acquire(blocking=False):
+            return
+        profiler = SamplingProfiler(self.interval)
+        profiler.start()
+        g.profiler = profiler
+        g.profile_signed = signed
+
+    def finish(self, response):
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return response
+        try:
+            profiler.stop()
+            filename = self.save(profiler, request.url_rule.rule if request.url_rule else request.path)
+            if g.pop('profile_signed', False):
+                response.headers['X-Profile-File'] = filename
+        finally:
+            self._active.release()
+        return response
+
+    def save(self, profiler, route):
+        os.makedirs(self.directory, exist_ok=True)
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_') or 'root'
+        stamp = time.strftime('%Y%m%dT%H%M%S')
+        base = f'{stamp}-{slug}-{int(profiler.duration * 1000)}ms-{os.getpid()}'
+
+        if self.output_format == 'collapsed':
+            filename = f'{base}.collapsed.txt'
+            content = profiler.collapsed()
+        else:
+            filename = f'{base}.speedscope.json'
+            content = json.dumps(profiler.speedscope(f'{request.method} {route}'))
+
+        with open(os.path.join(self.directory, filename), 'w') as f:
+            f.write(content)
+        self.prune()
+        return filename
+
+    def prune(self):
+        """Delete the oldest profiles beyond max_files"""
+        if not self.max_files:
+            return
+        names = sorted(os.listdir(self.directory), reverse=True)
+        for name in names[self.max_files:]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                continue
+
+    def list_profiles(self, limit=50):
+        if not self.directory or not os.path.isdir(self.directory):
+            return []
+        names = sorted(os.listdir(self.directory), reverse=True)[:limit]
+        return [
+            {'file': name, 'size': os.path.getsize(os.path.join(self.directory, name))}
+            for name in names
+        ]
+
+request_profiling = RequestProfiling()
+
+def init_profiling(app):
+    """Profile signed or sampled requests into PROFILE_DIR"""
+    request_profiling.configure(
+        app.config.get('PROFILE_DIR'),
+        app.config.get('PROFILE_SAMPLE_RATE', 0.0),
+        app.config.get('PROFILE_FORMAT', 'speedscope'),
+        app.config.get('PROFILE_INTERVAL_MS', 5) / 1000,
+        app.config.get('PROFILE_SECRET'),
+        app.config.get('PROFILE_MAX_CONCURRENT', 2),
+        app.config.get('PROFILE_MAX_FILES', 200)
+    )
+    app.before_request(request_profiling.start)
+    app.after_request(request_profiling.finish)
@@ -0,0 +1,123 @@
+import re
+import time
+from collections import Counter
+from flask import g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from src.services.metrics import metrics
+from src.services.slow_queries import slow_query_log
+
+metrics.define_histogram('db_queries_per_request', (1, 2, 5, 10, 20, 50, 100, 200))
+
+# Literal and placeholder patterns collapsed when fingerprinting a statement
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%\(\w+\)s|%s|:\w+|\?')
+_IN_LIST = re.compile(r'\bIN\s*\((?:\s*\?\s*,?)+\)', re.IGNORECASE)
+_WHITESPACE = re.compile(r'\s+')
+
+def fingerprint(statement):
+    """Normalize a SQL statement so repeats with different parameters match"""
+    statement = _STRING_LITERAL.sub('?', statement)
+    statement = _NUMBER_LITERAL.sub('?', statement)
+    statement = _PLACEHOLDER.sub('?', statement)
+    statement = _IN_LIST.sub('IN (?)', statement)
+    return _WHITESPACE.sub(' ', statement).strip()
+
+class RequestQueryStats:
+    """Statements executed while handling one request"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.fingerprints = Counter()
+
+    def record(self, statement, elapsed):
+        self.count += 1
+        self.total_time += elapsed
+        self.fingerprints[fingerprint(statement)] += 1
+
+    def repeated(self, threshold):
+        """Fingerprints of SELECTs issued at least `threshold` times"""
+        return [
+            (statement, count)
+            for statement, count in self.fingerprints.most_common()
+            if count >= threshold and statement.upper().startswith('SELECT')
+        ]
+
+def current_query_stats():
+    if not has_app_context():
+        return None
+    return g.get('query_stats')
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start_times = conn.info.get('query_start_time')
+    if not start_times:
+        return
+    elapsed = time.perf_counter() - start_times.pop()
+
+    metrics.observe('db_query_duration_seconds', elapsed)
+    slow_query_log.maybe_record(cursor, statement, parameters, elapsed, conn.dialect.name)
+
+    stats = current_query_stats()
+    if stats is not None:
+        stats.record(statement, elapsed)
+
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute; drop its start time
+    connection = context.connection
+    if connection is not None and context.execution_context is not None and not context.is_pre_ping:
+        start_times = connection.info.get('query_start_time')
+        if start_times:
+            start_times.pop()
+
+def _start_request():
+    g.query_stats = RequestQueryStats()
+
+def _finish_request(app):
+    def finish(response):
+        stats = g.pop('query_stats', None)
+        if stats is None:
+            return response
+
+        endpoint = request.endpoint or 'unknown'
+        metrics.observe('db_queries_per_request', stats.count, endpoint=endpoint)
+        metrics.observe('db_time_per_request_seconds', stats.total_time, endpoint=endpoint)
+
+        suspects = stats.repeated(app.config.get('SQL_N_PLUS_ONE_THRESHOLD', 5))
+        if suspects:
+            metrics.inc('db_n_plus_one_total', endpoint=endpoint)
+            for statement, count in suspects:
+                app.logger.warning(
+                    'Possible N+1 on %s %s: %d executions of %s',
+                    request.method, request.path, count, statement[:300]
+                )
+
+        if app.config.get('SQL_DEBUG_HEADERS'):
+            response.headers['X-DB-Query-Count'] = str(stats.count)
+            response.headers['X-DB-Time-Ms'] = f'{stats.total_time * 1000:.1f}'
+            if suspects:
+                response.headers['X-DB-N-Plus-One'] = str(len(suspects))
+
+        return response
+    return finish
+
+def init_query_instrumentation(app):
+    """Record per-request statement counts, DB time and repeated statements"""
+    slow_query_log.configure(
+        app.config.get('SLOW_QUERY_MS', 500),
+        app.config.get('SLOW_QUERY_LOG_SIZE', 200),
+        explain=app.config.get('SLOW_QUERY_EXPLAIN', True),
+        logger=app.logger
+    )
+
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+
+    app.before_request(_start_request)
+    app.after_request(_finish_request(app))
@@ -0,0 +1,120 @@
+import math
+import os
+import threading
+import time
+from collections import deque
+from flask import jsonify, request
+from src.services.metrics import metrics
+
+class SlidingWindowLimiter:
+    """Allow at most `limit` hits per key within the trailing `window` seconds"""
+
+    def __init__(self, limit, window, max_keys=100000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._hits = {}
+        self._lock = threading.Lock()
+
+    def hit(self, key):
+        """Record a hit; returns (allowed, retry_after_seconds)"""
+        now = time.monotonic()
+        cutoff = now - self.window
+        with self._lock:
+            hits = self._hits.get(key)
+            if hits is None:
+                if len(self._hits) >= self.max_keys:
+                    self._prune(cutoff)
+                hits = self._hits[key] = deque()
+            while hits and hits[0] <= cutoff:
+                hits.popleft()
+            if len(hits) >= self.limit:
+                return False, max(math.ceil(hits[0] - cutoff), 1)
+            hits.append(now)
+            return True, 0
+
+    def _prune(self, cutoff):
+        for key in [k for k, hits in self._hits.items() if not hits or hits[-1] <= cutoff]:
+            del self._hits[key]
+
+class HashingBusy(Exception):
+    """Raised when the hashing pool and its queue are full"""
+
+class HashingPool:
+    """Runs password hashing on a bounded pool of OS threads.
+
+    At most `max_concurrent` hashes run at once and at most `max_queue`
+    more may wait; anything beyond that is refused immediately.
+    """
+
+    def __init__(self, max_concurrent=None, max_queue=None):
+        self.configure(max_concurrent, max_queue)
+
+    def configure(self, max_concurrent=None, max_queue=None):
+        self.max_concurrent = max_concurrent or os.cpu_count() or 1
+        self.max_queue = self.max_concurrent * 2 if max_queue is None else max_queue
+        self._slots = threading.BoundedSemaphore(self.max_concurrent + self.max_queue)
+        self._pool = None
+
+    def _executor(self):
+        if self._pool is None:
+            try:
+                from gevent import monkey
+                patched = monkey.is_module_patched('threading')
+            except ImportError:
+                patched = False
+
+            if patched:
+                # Patched threads are greenlets; hashing there would block the event loop
+                from gevent.threadpool import ThreadPool
+                pool = ThreadPool(self.max_concurrent)
+                self._pool = lambda fn, args: pool.apply(fn, args)
+            else:
+                from concurrent.futures import ThreadPoolExecutor
+                pool = ThreadPoolExecutor(self.max_concurrent, thread_name_prefix='password-hash')
+                self._pool = lambda fn, args: pool.submit(fn, *args).result()
+        return self._pool
+
+    def run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            metrics.inc('password_hash_rejected_total')
+            raise HashingBusy()
+        try:
+            started_at = time.perf_counter()
+            result = self._executor()(fn, args)
+            metrics.observe('password_hash_duration_seconds', time.perf_counter() - started_at)
+            return result
+        finally:
+            self._slots.release()
+
+ip_limiter = SlidingWindowLimiter(20, 60)
+email_limiter = SlidingWindowLimiter(5, 300)
+hashing_pool = HashingPool()
+
+def too_many_requests(retry_after, message='Too many attempts, try again later'):
+    response = jsonify({'error': message, 'retry_after': retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+def check_auth_rate_limits(email, endpoint):
+    """429 response when this IP or email is over its limit, else None"""
+    for scope, limiter, key in (
+        ('ip', ip_limiter, request.remote_addr or 'unknown'),
+        ('email', email_limiter, email),
+    ):
+        allowed, retry_after = limiter.hit(key)
+        if not allowed:
+            metrics.inc('auth_rate_limited_total', endpoint=endpoint, scope=scope)
+            return too_many_requests(retry_after)
+    return None
+
+def init_auth_rate_limits(app):
+    ip_limiter.limit = app.config.get('AUTH_IP_LIMIT', 20)
+    ip_limiter.window = app.config.get('AUTH_IP_WINDOW_SECONDS', 60)
+    email_limiter.limit = app.config.get('AUTH_EMAIL_LIMIT', 5)
+    email_limiter.window = app.config.get('AUTH_EMAIL_WINDOW_SECONDS', 300)
+    hashing_pool.configure(
+        app.config.get('PASSWORD_HASH_MAX_CONCURRENT'),
+        app.config.get('PASSWORD_HASH_MAX_QUEUE')
+    )
@@ -0,0 +1,184 @@
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import not_
+from src.models import db
+from src.models.campaign import Campaign
+from src.models.click_aggregate import ClickAggregate
+from src.models.invite_link import InviteLink, PRIVATE_LINK_TTL_SECONDS
+from src.models.lead import TelegramLead
+from src.models.telegram_bot import TelegramBot
+from src.services.metrics import metrics
+from src.services.telegram_api import telegram_request, TelegramAPIError
+from src.services.utm_links import UTM_FIELDS, static_code_clause
+
+class RevokeThrottle:
+    """Spaces Bot API calls at most `rate` per second"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = 0.0
+
+    def wait(self):
+        now = time.monotonic()
+        if self._next > now:
+            time.sleep(self._next - now)
+        self._next = max(now, self._next) + self.interval
+
+def revoke_invite_link(bot_token, chat_id, invite_link):
+    """Revoke one link; returns 'revoked', 'gone' (cannot be revoked any
+    more) or 'retry' (API unavailable or rate limited)"""
+    try:
+        response = telegram_request(bot_token, 'revokeChatInviteLink', {
+            'chat_id': chat_id,
+            'invite_link': invite_link
+        })
+    except TelegramAPIError:
+        return 'retry'
+
+    if response.status_code == 429 or response.status_code >= 500:
+        return 'retry'
+    try:
+        data = response.json()
+    except ValueError:
+        return 'retry'
+    # Expired links, removed bots and deleted chats all mean nothing is left to revoke
+    return 'revoked' if data.get('ok') else 'gone'
+
+def _aggregate_key(link):
+    return (link.campaign_id, link.created_at.date()) + tuple(getattr(link, f) or '' for f in UTM_FIELDS)
+
+def _fold_into_aggregates(keys, converted):
+    """Add one click per aggregate key, and one conversion where `converted`"""
+    increments = {}
+    for key, is_converted in zip(keys, converted):
+        clicks, conversions = increments.get(key, (0, 0))
+        increments[key] = (clicks + 1, conversions + is_converted)
+
+    existing = {}
+    campaign_ids = {key[0] for key in increments}
+    days = {key[1] for key in increments}
+    for aggregate in ClickAggregate.query.filter(
+        ClickAggregate.campaign_id.in_(campaign_ids),
+        ClickAggregate.day.in_(days)
+    ):
+        key = (aggregate.campaign_id, aggregate.day) + tuple(getattr(aggregate, f) for f in UTM_FIELDS)
+        existing[key] = aggregate
+
+    for key, (clicks, conversions) in increments.items():
+        aggregate = existing.get(key)
+        if aggregate is None:
+            aggregate = ClickAggregate(
+                campaign_id=key[0],
+                day=key[1],
+                clicks=0,
+                conversions=0,
+                **dict(zip(UTM_FIELDS, key[2:]))
+            )
+            db.session.add(aggregate)
+        aggregate.clicks += clicks
+        aggregate.conversions += conversions
+
+def reap_invite_links(now=None, window_hours=None, batch_size=None, revoke_per_second=None, dry_run=False):
+    """Revoke per-click invite links past the attribution window, fold them
+    into daily click aggregates and delete the rows no lead points to.
+
+    Processes one batch of the oldest links and returns a report. Rows that
+    led to a join are kept (as status 'compacted') for lead attribution.
+    """
+    config = current_app.config
+    now = now or datetime.utcnow()
+    window_hours = window_hours or config.get('REAPER_ATTRIBUTION_HOURS', 72)
+    batch_size = batch_size or config.get('REAPER_BATCH_SIZE', 500)
+    revoke_per_second = revoke_per_second or config.get('REAPER_REVOKE_PER_SECOND', 20)
+    started_at = time.perf_counter()
+    cutoff = now - timedelta(hours=window_hours)
+
+    rows = db.session.query(
+        InviteLink, TelegramBot.bot_token, TelegramBot.chat_id, TelegramBot.is_private
+    ).join(
+        Campaign, Campaign.id == InviteLink.campaign_id
+    ).outerjoin(
+        TelegramBot, TelegramBot.id == Campaign.telegram_bot_id
+    ).filter(
+        InviteLink.created_at < cutoff,
+        InviteLink.status != 'compacted',
+        # Shared per-UTM links stay live
+        not_(static_code_clause())
+    ).order_by(InviteLink.created_at).limit(batch_size).all()
+
+    report = {'scanned': len(rows), 'revoked': 0, 'gone': 0, 'deferred': 0, 'compacted': 0, 'deleted': 0, 'kept': 0}
+    if not rows:
+        report['duration_ms'] = round((time.perf_counter() - started_at) * 1000, 1)
+        return report
+
+    link_ids = [row[0].id for row in rows]
+    converted_ids = {
+        link_id for (link_id,) in db.session.query(TelegramLead.invite_link_id)
+        .filter(TelegramLead.invite_link_id.in_(link_ids))
+    }
+
+    # Private links expire on their own; pending rows point at the primary link
+    private_expiry = timedelta(seconds=PRIVATE_LINK_TTL_SECONDS)
+    to_revoke = [
+        (link.id, bot_token, chat_id, link.telegram_invite_link)
+        for link, bot_token, chat_id, is_private in rows
+        if link.status == 'active' and link.telegram_invite_link and bot_token
+        and not (is_private and link.created_at + private_expiry <= now)
+    ]
+
+    if dry_run:
+        report.update(revoked=len(to_revoke), compacted=len(rows))
+        report['dry_run'] = True
+        db.session.rollback()
+        return report
+
+    # Return the connection to the pool while calling the Bot API
+    keys = {link.id: _aggregate_key(link) for link, _, _, _ in rows}
+    db.session.rollback()
+
+    deferred = set()
+    throttle = RevokeThrottle(revoke_per_second)
+    for position, (link_id, bot_token, chat_id, invite_link) in enumerate(to_revoke):
+        throttle.wait()
+        outcome = revoke_invite_link(bot_token, chat_id, invite_link)
+        if outcome == 'retry':
+            # Leave this and the remaining links for the next run
+            deferred.update(item[0] for item in to_revoke[position:])
+            break
+        report['revoked' if outcome == 'revoked' else 'gone'] += 1
+        metrics.inc('reaper_links_revoked_total', outcome=outcome)
+
+    done_ids = [link_id for link_id in link_ids if link_id not in deferred]
+    report['deferred'] = len(deferred)
+    if not done_ids:
+        report['duration_ms'] = round((time.perf_counter() - started_at) * 1000, 1)
+        return report
+
+    # Claim the rows first so a concurrent reaper cannot count them twice
+    claimed = InviteLink.query.filter(
+        InviteLink.id.in_(done_ids),
+        InviteLink.status != 'compacted'
+    ).update({'status': 'compacted'}, synchronize_session=False)
+    if claimed != len(done_ids):
+        db.session.rollback()
+        report['duration_ms'] = round((time.perf_counter() - started_at) * 1000, 1)
+        return report
+
+    _fold_into_aggregates(
+        [keys[link_id] for link_id in done_ids],
+        [link_id in converted_ids for link_id in done_ids]
+    )
+
+    delete_ids = [link_id for link_id in done_ids if link_id not in converted_ids]
+    if delete_ids:
+        InviteLink.query.filter(InviteLink.id.in_(delete_ids)).delete(synchronize_session=False)
+    db.session.commit()
+
+    report['compacted'] = len(done_ids)
+    report['deleted'] = len(delete_ids)
+    report['kept'] = len(done_ids) - len(delete_ids)
+    metrics.inc('reaper_links_compacted_total', len(done_ids))
+    metrics.inc('reaper_links_deleted_total', len(delete_ids))
+    report['duration_ms'] = round((time.perf_counter() - started_at) * 1000, 1)
+    return report
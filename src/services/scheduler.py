@@ -0,0 +1,108 @@
+import os
+import threading
+import time
+from src.services.metrics import metrics
+
+class ScheduledJob:
+    __slots__ = ('name', 'interval', 'fn', 'next_run')
+
+    def __init__(self, name, interval, fn):
+        self.name = name
+        self.interval = interval
+        self.fn = fn
+        self.next_run = time.monotonic() + interval
+
+class Scheduler:
+    """Background thread running registered jobs at fixed intervals.
+
+    Only the process holding an exclusive lock on `lock_file` runs jobs, so
+    several gunicorn workers on one host do not duplicate the work. Jobs run
+    inside an app context and one at a time.
+    """
+
+    def __init__(self, tick=1.0):
+        self.tick = tick
+        self.lock_file = None
+        self.jobs = []
+        self._app = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock_fd = None
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        # Threads and lock ownership do not survive a fork
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock_fd = None
+
+    def every(self, seconds, name, fn):
+        self.jobs.append(ScheduledJob(name, seconds, fn))
+
+    def start(self, app):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._app = app
+        self._thread = threading.Thread(target=self._run, name='scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _is_leader(self):
+        if self._lock_fd is not None or not self.lock_file:
+            return True
+        import fcntl
+        fd = os.open(self.lock_file, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        # Held until the process exits
+        self._lock_fd = fd
+        return True
+
+    def run_pending(self):
+        now = time.monotonic()
+        for job in self.jobs:
+            if job.next_run > now:
+                continue
+            job.next_run = now + job.interval
+            self.run_job(job)
+
+    def run_job(self, job):
+        started_at = time.perf_counter()
+        outcome = 'ok'
+        try:
+            with self._app.app_context():
+                job.fn()
+        except Exception:
+            outcome = 'error'
+            self._app.logger.exception('Scheduled job %s failed', job.name)
+        finally:
+            metrics.observe('scheduled_job_duration_seconds', time.perf_counter() - started_at, job=job.name)
+            metrics.inc('scheduled_job_runs_total', job=job.name, outcome=outcome)
+
+    def _run(self):
+        while not self._stop.wait(self.tick):
+            if self._is_leader():
+                self.run_pending()
+
+scheduler = Scheduler()
+
+def init_scheduler(app):
+    """Register periodic jobs; the thread itself starts per worker process"""
+    scheduler.lock_file = app.config.get('SCHEDULER_LOCK_FILE')
+
+    if app.config.get('REAPER_INTERVAL_SECONDS'):
+        from src.services.reaper import reap_invite_links
+        scheduler.every(app.config['REAPER_INTERVAL_SECONDS'], 'invite_link_reaper', reap_invite_links)
+
+    if app.config.get('EXPORT_PURGE_INTERVAL_SECONDS'):
+        from src.services.exports import purge_expired_exports
+        scheduler.every(app.config['EXPORT_PURGE_INTERVAL_SECONDS'], 'export_purge', purge_expired_exports)
+
+def start_scheduler(app):
+    if app.config.get('SCHEDULER_ENABLED'):
+        scheduler.start(app)
@@ -0,0 +1,234 @@
+import logging
+import threading
+import time
+import uuid
+from sqlalchemy import inspect, text
+from sqlalchemy.dialects import postgresql
+from src.models import db
+from src.models.schema_version import SchemaVersion
+
+logger = logging.getLogger(__name__)
+
+# Databases created before the version table existed are treated as this version
+BASELINE_VERSION = 1
+
+# Key of the PostgreSQL advisory lock held while the schema is migrated
+SCHEMA_LOCK_KEY = 727301
+
+_lock = threading.Lock()
+_verified = {}
+
+def add_column(connection, table, column, ddl):
+    """ALTER TABLE ... ADD COLUMN, skipped when the column already exists"""
+    columns = {c['name'] for c in inspect(connection).get_columns(table)}
+    if column not in columns:
+        connection.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+
+def _add_user_token_version(connection):
+    add_column(connection, 'users', 'token_version', 'INTEGER NOT NULL DEFAULT 0')
+
+def _add_campaign_attribution_mode(connection):
+    add_column(connection, 'campaigns', 'attribution_mode', "VARCHAR(20) NOT NULL DEFAULT 'per_click'")
+
+def _add_fallback_link_columns(connection):
+    add_column(connection, 'telegram_bots', 'primary_invite_link', 'VARCHAR(255)')
+    add_column(connection, 'invite_links', 'status', "VARCHAR(20) NOT NULL DEFAULT 'active'")
+
+def _add_bot_health_columns(connection):
+    add_column(connection, 'telegram_bots', 'last_status', 'VARCHAR(30)')
+    add_column(connection, 'telegram_bots', 'last_checked_at', 'TIMESTAMP')
+    add_column(connection, 'telegram_bots', 'pending_update_count', 'INTEGER')
+
+def _add_click_aggregates(connection):
+    from src.models.click_aggregate import ClickAggregate
+    ClickAggregate.__table__.create(connection, checkfirst=True)
+
+def _add_jobs(connection):
+    from src.models.job import Job
+    Job.__table__.create(connection, checkfirst=True)
+
+def _uuid_blob(value):
+    try:
+        return uuid.UUID(value).bytes
+    except (TypeError, ValueError):
+        return value
+
+def _compact_ids(connection):
+    """Rewrite string UUID keys in the storage CompactUUID uses: native uuid
+    on PostgreSQL, 16-byte blobs on SQLite"""
+    from src.models.ids import CompactUUID
+    inspector = inspect(connection)
+    columns = {}
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {c['name']: c for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if isinstance(column.type, CompactUUID) and column.name in existing:
+                columns.setdefault(table.name, {})[column.name] = existing[column.name]
+
+    if connection.dialect.name == 'sqlite':
+        # Declared column types stay; SQLite keeps blob values as they are
+        connection.connection.driver_connection.create_function('uuid_blob', 1, _uuid_blob, deterministic=True)
+        for table, table_columns in columns.items():
+            for column in table_columns:
+                connection.execute(text(
+                    f"UPDATE {table} SET {column} = uuid_blob({column}) WHERE typeof({column}) = 'text'"
+                ))
+
+    elif connection.dialect.name == 'postgresql':
+        # Key and referencing columns must change type together, so drop the
+        # foreign keys between them first and restore them afterwards
+        foreign_keys = []
+        for table, table_columns in columns.items():
+            for fk in inspector.get_foreign_keys(table):
+                if fk['name'] and set(fk['constrained_columns']) <= set(table_columns):
+                    foreign_keys.append((table, fk))
+                    connection.execute(text(f'ALTER TABLE {table} DROP CONSTRAINT {fk["name"]}'))
+
+        for table, table_columns in columns.items():
+            for column, info in table_columns.items():
+                if not isinstance(info['type'], postgresql.UUID):
+                    connection.execute(text(
+                        f'ALTER TABLE {table} ALTER COLUMN {column} TYPE uuid USING {column}::uuid'
+                    ))
+
+        for table, fk in foreign_keys:
+            connection.execute(text(
+                f'ALTER TABLE {table} ADD CONSTRAINT {fk["name"]} '
+                f'FOREIGN KEY ({", ".join(fk["constrained_columns"])}) '
+                f'REFERENCES {fk["referred_table"]} ({", ".join(fk["referred_columns"])})'
+            ))
+
+def _add_lead_entry_columns(connection):
+    add_column(connection, 'leads', 'group_name', 'VARCHAR(255)')
+    add_column(connection, 'leads', 'entry_date', 'TIMESTAMP')
+
+def _add_lead_invite_link(connection):
+    """Link leads to the click they joined through, backfilled by code"""
+    from src.models.ids import CompactUUID
+    add_column(connection, 'leads', 'invite_link_id', CompactUUID().compile(dialect=connection.dialect))
+    connection.execute(text('CREATE INDEX IF NOT EXISTS ix_leads_invite_link_id ON leads (invite_link_id)'))
+    connection.execute(text(
+        'UPDATE leads SET invite_link_id = ('
+        'SELECT invite_links.id FROM invite_links '
+        'WHERE invite_links.campaign_id = leads.campaign_id AND invite_links.code = leads.link_name'
+        ') WHERE invite_link_id IS NULL AND link_name IS NOT NULL'
+    ))
+
+def _add_job_outputs(connection):
+    from src.models.job import JobOutput
+    JobOutput.__table__.create(connection, checkfirst=True)
+
+def _unique_leads(connection):
+    """One lead per Telegram user and campaign: keep the earliest and move the
+    other duplicates to leads_duplicates. Returns the moved rows per campaign"""
+    from src.models.ids import CompactUUID
+    later_duplicate = (
+        'EXISTS (SELECT 1 FROM leads AS first WHERE first.campaign_id = leads.campaign_id '
+        'AND first.telegram_id = leads.telegram_id '
+        'AND (first.created_at < leads.created_at OR (first.created_at = leads.created_at AND first.id < leads.id)))'
+    )
+    moved = dict(connection.execute(
+        text(f'SELECT campaign_id, COUNT(*) FROM leads WHERE {later_duplicate} GROUP BY campaign_id')
+        .columns(campaign_id=CompactUUID())
+    ).all())
+    if moved:
+        connection.execute(text('CREATE TABLE IF NOT EXISTS leads_duplicates AS SELECT * FROM leads WHERE 1 = 0'))
+        connection.execute(text(f'INSERT INTO leads_duplicates SELECT * FROM leads WHERE {later_duplicate}'))
+        connection.execute(text(f'DELETE FROM leads WHERE {later_duplicate}'))
+        for campaign_id, count in moved.items():
+            logger.warning('Moved %d duplicate leads of campaign %s to leads_duplicates', count, campaign_id)
+    connection.execute(text(
+        'CREATE UNIQUE INDEX IF NOT EXISTS uq_leads_campaign_telegram ON leads (campaign_id, telegram_id)'
+    ))
+    return {'duplicate_leads_moved': {str(campaign_id): count for campaign_id, count in moved.items()}}
+
+def _add_invite_link_inserted_at(connection):
+    add_column(connection, 'invite_links', 'inserted_at', 'TIMESTAMP')
+    connection.execute(text('UPDATE invite_links SET inserted_at = created_at WHERE inserted_at IS NULL'))
+    connection.execute(text('CREATE INDEX IF NOT EXISTS ix_invite_links_inserted_at ON invite_links (inserted_at)'))
+
+# Ordered upgrades applied to existing databases; new tables come from create_all.
+# Whatever a migration returns is kept in the schema report under its version
+MIGRATIONS = [
+    (2, _add_user_token_version),
+    (3, _add_campaign_attribution_mode),
+    (4, _add_fallback_link_columns),
+    (5, _add_bot_health_columns),
+    (6, _add_click_aggregates),
+    (7, _add_jobs),
+    (8, _compact_ids),
+    (9, _add_lead_entry_columns),
+    (10, _add_lead_invite_link),
+    (11, _add_job_outputs),
+    (12, _unique_leads),
+    (13, _add_invite_link_inserted_at),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0] if MIGRATIONS else BASELINE_VERSION
+
+def _read_version(connection):
+    inspector = inspect(connection)
+    if not inspector.has_table(SchemaVersion.__tablename__):
+        # Tables without a version row predate versioning
+        return BASELINE_VERSION if inspector.has_table('users') else None
+    return connection.execute(
+        db.select(db.func.max(SchemaVersion.version))
+    ).scalar() or BASELINE_VERSION
+
+def _lock_schema(connection):
+    """Hold a database-wide lock until this transaction ends, so one process
+    (gunicorn master, job worker) migrates while the others wait for it"""
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': SCHEMA_LOCK_KEY})
+    elif connection.dialect.name == 'sqlite':
+        connection.exec_driver_sql('BEGIN IMMEDIATE')
+
+def ensure_schema(force=False):
+    """Verify the schema once per process, migrating or creating it when
+    out of date.
+
+    Must run inside an app context. Returns a small report of what was done.
+    """
+    engine = db.engine
+    key = str(engine.url)
+
+    with _lock:
+        if not force and key in _verified:
+            return dict(_verified[key], cached=True)
+
+        started_at = time.perf_counter()
+        with engine.connect() as connection:
+            current = _read_version(connection)
+        action = 'verified'
+        applied = []
+        notes = {}
+
+        if force or current is None or current < SCHEMA_VERSION:
+            with engine.begin() as connection:
+                _lock_schema(connection)
+                # Another process may have migrated while this one waited
+                current = _read_version(connection)
+                if force or current is None or current < SCHEMA_VERSION:
+                    if current is not None:
+                        for version, migrate in MIGRATIONS:
+                            if version > current:
+                                note = migrate(connection)
+                                applied.append(version)
+                                if note:
+                                    notes[version] = note
+                    db.metadata.create_all(connection)
+                    connection.execute(SchemaVersion.__table__.insert().values(version=SCHEMA_VERSION))
+                    action = 'created' if current is None else 'upgraded'
+
+        _verified[key] = {
+            'action': action,
+            'previous_version': current,
+            'version': SCHEMA_VERSION,
+            'migrations': applied,
+            'migration_notes': notes,
+            'duration_ms': round((time.perf_counter() - started_at) * 1000, 1),
+            'cached': False
+        }
+        return dict(_verified[key])
@@ -0,0 +1,126 @@
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from flask import has_request_context, request
+from flask_jwt_extended import get_jwt_identity
+
+class SlowQueryLog:
+    """Bounded ring buffer of statements slower than a threshold, each
+    with redacted parameters, the issuing route and user, and its plan"""
+
+    def __init__(self, threshold_ms=500, capacity=200, explain=True):
+        self.threshold_ms = threshold_ms
+        self.explain = explain
+        self._entries = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self.logger = None
+
+    def configure(self, threshold_ms, capacity, explain=True, logger=None):
+        self.threshold_ms = threshold_ms
+        self.explain = explain
+        self.logger = logger
+        with self._lock:
+            self._entries = deque(self._entries, maxlen=capacity)
+
+    def maybe_record(self, cursor, statement, parameters, elapsed, dialect):
+        if not self.threshold_ms or elapsed * 1000 < self.threshold_ms:
+            return
+
+        entry = {
+            'duration_ms': round(elapsed * 1000, 1),
+            'statement': statement,
+            'parameters': redact_parameters(parameters),
+            'plan': None,
+            'route': None,
+            'method': None,
+            'user_id': None,
+            'recorded_at': datetime.utcnow().isoformat()
+        }
+
+        if has_request_context():
+            entry['route'] = request.url_rule.rule if request.url_rule else request.path
+            entry['method'] = request.method
+            try:
+                entry['user_id'] = get_jwt_identity()
+            except RuntimeError:
+                # Route is not JWT protected
+                pass
+
+        if self.explain and _is_explainable(statement):
+            entry['plan'] = capture_plan(cursor, statement, parameters, dialect)
+
+        with self._lock:
+            self._entries.append(entry)
+
+        if self.logger is not None:
+            self.logger.warning(
+                'Slow query %.1fms on %s %s (user %s): %s',
+                entry['duration_ms'], entry['method'], entry['route'],
+                entry['user_id'], statement[:300]
+            )
+
+    def entries(self):
+        with self._lock:
+            return list(reversed(self._entries))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+def redact_parameters(parameters):
+    """Keep only the type (and length for strings) of each bound value"""
+    def redact(value):
+        if value is None:
+            return None
+        if isinstance(value, (str, bytes)):
+            return f'<{type(value).__name__}:{len(value)}>'
+        return f'<{type(value).__name__}>'
+
+    if isinstance(parameters, dict):
+        return {key: redact(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [redact(value) for value in parameters]
+    return redact(parameters)
+
+def _is_explainable(statement):
+    head = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ''
+    return head in ('SELECT', 'WITH')
+
+def capture_plan(cursor, statement, parameters, dialect):
+    """Run EXPLAIN for a statement on a side cursor of the same connection"""
+    started_at = time.perf_counter()
+    explain_cursor = None
+    savepoint = dialect == 'postgresql'
+    try:
+        explain_cursor = cursor.connection.cursor()
+        if dialect == 'postgresql':
+            # A failed EXPLAIN must not abort the request's transaction
+            explain_cursor.execute('SAVEPOINT slow_query_explain')
+            explain_cursor.execute(f'EXPLAIN (ANALYZE off) {statement}', parameters)
+        elif dialect == 'sqlite':
+            explain_cursor.execute(f'EXPLAIN QUERY PLAN {statement}', parameters)
+        else:
+            explain_cursor.execute(f'EXPLAIN {statement}', parameters)
+        rows = explain_cursor.fetchall()
+        if savepoint:
+            explain_cursor.execute('RELEASE SAVEPOINT slow_query_explain')
+        # Postgres returns one text column; SQLite puts the detail in the last one
+        plan = [str(row[-1]) for row in rows]
+    except Exception as e:
+        if savepoint and explain_cursor is not None:
+            try:
+                explain_cursor.execute('ROLLBACK TO SAVEPOINT slow_query_explain')
+            except Exception:
+                pass
+        plan = [f'EXPLAIN failed: {e}']
+    finally:
+        if explain_cursor is not None:
+            try:
+                explain_cursor.close()
+            except Exception:
+                pass
+
+    return {'lines': plan, 'capture_ms': round((time.perf_counter() - started_at) * 1000, 1)}
+
+slow_query_log = SlowQueryLog()
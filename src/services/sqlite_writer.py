@@ -0,0 +1,222 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from src.models import db
+from src.services.metrics import metrics
+
+metrics.define_histogram('sqlite_write_batch_size', (1, 2, 5, 10, 20, 50, 100, 200, 500))
+
+_pragmas = {}
+
+def _apply_pragmas(dbapi_connection, connection_record):
+    if not _pragmas or not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in _pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+    finally:
+        cursor.close()
+
+def configure_sqlite_pragmas(journal_mode='WAL', synchronous='NORMAL', mmap_bytes=268435456, busy_timeout_ms=5000):
+    """PRAGMAs applied to every new SQLite connection.
+
+    WAL lets readers proceed while a write is committing, NORMAL syncs only
+    at checkpoints (safe in WAL mode), and busy_timeout makes a writer wait
+    for the lock instead of failing with "database is locked".
+    """
+    _pragmas.clear()
+    _pragmas.update({
+        'journal_mode': journal_mode,
+        'synchronous': synchronous,
+        'mmap_size': int(mmap_bytes),
+        'busy_timeout': int(busy_timeout_ms),
+        'temp_store': 'MEMORY',
+    })
+    if not event.contains(Engine, 'connect', _apply_pragmas):
+        event.listen(Engine, 'connect', _apply_pragmas)
+
+class _Write:
+    __slots__ = ('fn', 'args', 'kwargs', 'future', 'queued_at')
+
+    def __init__(self, fn, args, kwargs):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+        self.queued_at = time.perf_counter()
+
+class SQLiteWriter:
+    """Single writer thread that commits queued writes in batches.
+
+    Each write is a callable `fn(session, *args)` run inside its own
+    savepoint, so one failing write does not undo the rest of its batch.
+    Up to `batch_size` writes arriving within `batch_wait` seconds of each
+    other share one BEGIN IMMEDIATE ... COMMIT. Callers block on a future
+    for the callable's return value.
+
+    Under gevent the writer "thread" is a greenlet and sqlite3 calls do not
+    yield, so each batch is committed on a one-thread native pool while the
+    greenlet waits cooperatively.
+    """
+
+    def __init__(self, batch_size=200, batch_wait=0.002, timeout=10.0):
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.timeout = timeout
+        self.enabled = False
+        self._app = None
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pool = None
+        self._start_lock = threading.Lock()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pool = None
+        self._start_lock = threading.Lock()
+
+    def _executor(self):
+        if self._pool is None:
+            try:
+                from gevent import monkey
+                patched = monkey.is_module_patched('threading')
+            except ImportError:
+                patched = False
+
+            if patched:
+                from gevent.threadpool import ThreadPool
+                pool = ThreadPool(1)
+                self._pool = lambda fn, args: pool.apply(fn, args)
+            else:
+                self._pool = lambda fn, args: fn(*args)
+        return self._pool
+
+    def configure(self, app, batch_size, batch_wait, timeout):
+        self._app = app
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.timeout = timeout
+        self.enabled = True
+
+    def submit(self, fn, *args, **kwargs):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='sqlite-writer', daemon=True)
+                    self._thread.start()
+        write = _Write(fn, args, kwargs)
+        self._queue.put(write)
+        return write.future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.batch_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._execute(batch)
+
+    def _execute(self, batch):
+        batch = [write for write in batch if write.future.set_running_or_notify_cancel()]
+        started_at = time.perf_counter()
+        # Futures are only resolved back here: gevent primitives are not safe
+        # to signal from the native pool thread
+        results, errors = self._executor()(self._commit, (batch,))
+
+        finished_at = time.perf_counter()
+        metrics.observe('sqlite_write_batch_size', len(batch))
+        metrics.observe('sqlite_write_commit_seconds', finished_at - started_at)
+        for write in batch:
+            metrics.observe('sqlite_write_wait_seconds', finished_at - write.queued_at)
+            if write in errors:
+                write.future.set_exception(errors[write])
+            else:
+                write.future.set_result(results.get(write))
+
+    def _commit(self, batch):
+        errors = {}
+        results = {}
+        with self._app.app_context():
+            session = db.session
+            try:
+                # Take the write lock up front; a deferred transaction that reads
+                # first can fail to upgrade when another process wrote meanwhile
+                session.execute(text('BEGIN IMMEDIATE'))
+                for write in batch:
+                    try:
+                        with session.begin_nested():
+                            results[write] = write.fn(session, *write.args, **write.kwargs)
+                    except Exception as e:
+                        errors[write] = e
+                session.commit()
+            except Exception as e:
+                # Nothing in the batch was committed
+                session.rollback()
+                for write in batch:
+                    errors.setdefault(write, e)
+            finally:
+                db.session.remove()
+        return results, errors
+
+sqlite_writer = SQLiteWriter()
+
+def run_write(fn, *args, **kwargs):
+    """Run `fn(session, *args, **kwargs)` in a committed transaction and
+    return its result.
+
+    On SQLite with the write queue enabled the call is handed to the writer
+    thread and batched with concurrent writes; otherwise it runs on the
+    request session. `fn` should return plain values, not ORM instances.
+    A queued write that times out is cancelled before it can commit; one the
+    writer already started is waited for, so a timeout never hides a commit.
+    """
+    if sqlite_writer.enabled:
+        future = sqlite_writer.submit(fn, *args, **kwargs)
+        try:
+            return future.result(timeout=sqlite_writer.timeout)
+        except FutureTimeoutError:
+            if future.cancel():
+                metrics.inc('sqlite_write_timeouts_total')
+                raise
+            return future.result()
+
+    try:
+        result = fn(db.session, *args, **kwargs)
+        db.session.commit()
+        return result
+    except Exception:
+        db.session.rollback()
+        raise
+
+def init_sqlite_profile(app):
+    """Tune SQLite connections and start batching writes when the primary
+    database is SQLite"""
+    if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        return
+
+    configure_sqlite_pragmas(
+        journal_mode=app.config.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        synchronous=app.config.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        mmap_bytes=app.config.get('SQLITE_MMAP_BYTES', 268435456),
+        busy_timeout_ms=app.config.get('SQLITE_BUSY_TIMEOUT_MS', 5000)
+    )
+
+    if app.config.get('SQLITE_WRITE_QUEUE', True):
+        sqlite_writer.configure(
+            app,
+            batch_size=app.config.get('SQLITE_WRITE_BATCH_SIZE', 200),
+            batch_wait=app.config.get('SQLITE_WRITE_BATCH_WAIT_MS', 2) / 1000,
+            timeout=app.config.get('SQLITE_WRITE_TIMEOUT_SECONDS', 10)
+        )
@@ -0,0 +1,40 @@
+import logging
+import os
+import time
+
+class StartupReport:
+    """Wall-clock time spent in each phase of worker boot"""
+
+    def __init__(self):
+        self._last = time.perf_counter()
+        self.phases = []
+        self.details = {}
+
+    def add(self, phase, duration_ms, **details):
+        self.phases.append((phase, round(duration_ms, 1)))
+        if details:
+            self.details[phase] = details
+
+    def mark(self, phase, **details):
+        """Close the current phase and start timing the next one"""
+        now = time.perf_counter()
+        self.add(phase, (now - self._last) * 1000, **details)
+        self._last = now
+
+    @property
+    def total_ms(self):
+        return round(sum(duration for _, duration in self.phases), 1)
+
+    def to_dict(self):
+        return {
+            'pid': os.getpid(),
+            'total_ms': self.total_ms,
+            'phases': [
+                dict({'phase': phase, 'duration_ms': duration}, **self.details.get(phase, {}))
+                for phase, duration in self.phases
+            ]
+        }
+
+    def log(self, logger):
+        summary = ', '.join(f'{phase}={duration}ms' for phase, duration in self.phases)
+        logger.log(logging.INFO, 'Worker %d started in %.1fms (%s)', os.getpid(), self.total_ms, summary)
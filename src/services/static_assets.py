@@ -0,0 +1,157 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from flask import Response, abort, request, send_file
+
+# Vite emits hashed files only under assets/, as [name]-[8-char hash].[ext]
+# (e.g. assets/index-B3x9kQ1z.js); files copied from public/ keep their names
+FINGERPRINT_PATTERN = re.compile(r'^assets/(?:.+/)?[^/]+-[A-Za-z0-9_-]{8}\.[A-Za-z0-9]+$')
+
+COMPRESSIBLE_TYPES = (
+    'text/', 'application/javascript', 'application/json',
+    'application/xml', 'image/svg+xml', 'application/wasm',
+)
+
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE = 'no-cache'
+
+class StaticAsset:
+    def __init__(self, path, full_path, digest, mimetype, fingerprinted):
+        self.path = path
+        self.full_path = full_path
+        self.digest = digest
+        self.mimetype = mimetype
+        self.fingerprinted = fingerprinted
+        self.size = os.path.getsize(full_path)
+        self.compressible = False
+        self.compressed = False
+        # encoding -> bytes held in memory or a path to a precompressed file
+        self.variants = {}
+
+    def etag(self, encoding):
+        return self.digest if encoding == 'identity' else f'{self.digest}-{encoding}'
+
+class StaticManifest:
+    """Index of the built frontend, computed once at startup.
+
+    Every file gets a content hash for its ETag and, when it compresses
+    well, brotli/gzip variants chosen per request by Accept-Encoding.
+    Variants not precompressed on disk are built on first request so
+    startup only pays for hashing.
+    """
+
+    def __init__(self, root, min_compress_size=1024):
+        self.root = root
+        self.min_compress_size = min_compress_size
+        self.assets = {}
+        self._compress_lock = threading.Lock()
+
+    def build(self):
+        assets = {}
+        if os.path.isdir(self.root):
+            for directory, _, filenames in os.walk(self.root):
+                for filename in filenames:
+                    # Precompressed siblings are attached to their source file
+                    if filename.endswith(('.br', '.gz')):
+                        continue
+                    full_path = os.path.join(directory, filename)
+                    path = os.path.relpath(full_path, self.root).replace(os.sep, '/')
+                    assets[path] = self._load(path, full_path)
+        self.assets = assets
+        return self
+
+    def _load(self, path, full_path):
+        with open(full_path, 'rb') as f:
+            content = f.read()
+
+        mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        asset = StaticAsset(
+            path,
+            full_path,
+            hashlib.sha256(content).hexdigest()[:20],
+            mimetype,
+            bool(FINGERPRINT_PATTERN.search(path))
+        )
+        asset.compressible = (
+            len(content) >= self.min_compress_size and mimetype.startswith(COMPRESSIBLE_TYPES)
+        )
+
+        for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if os.path.exists(full_path + suffix):
+                asset.variants[encoding] = full_path + suffix
+
+        return asset
+
+    def _compress(self, asset):
+        """Build missing in-memory variants the first time an asset is served"""
+        with self._compress_lock:
+            if asset.compressed:
+                return
+            with open(asset.full_path, 'rb') as f:
+                content = f.read()
+
+            try:
+                # Optional dependency, imported on first use
+                import brotli
+                compressors = [('br', lambda data: brotli.compress(data, quality=9))]
+            except ImportError:
+                compressors = []
+            compressors.append(('gzip', lambda data: gzip.compress(data, compresslevel=9, mtime=0)))
+
+            for encoding, compress in compressors:
+                if encoding in asset.variants:
+                    continue
+                compressed = compress(content)
+                # Not worth a variant unless it saves at least 10%
+                if len(compressed) < len(content) * 0.9:
+                    asset.variants[encoding] = compressed
+            asset.compressed = True
+
+    def lookup(self, path):
+        return self.assets.get(path)
+
+    @property
+    def index(self):
+        return self.assets.get('index.html')
+
+    def serve(self, asset):
+        """Response for an asset, negotiated on Accept-Encoding and ETag"""
+        if asset.compressible and not asset.compressed:
+            self._compress(asset)
+
+        encoding = 'identity'
+        for candidate in ('br', 'gzip'):
+            if candidate in asset.variants and request.accept_encodings[candidate]:
+                encoding = candidate
+                break
+
+        etag = asset.etag(encoding)
+        cache_control = IMMUTABLE_CACHE if asset.fingerprinted else REVALIDATE_CACHE
+
+        if etag in request.if_none_match:
+            response = Response(status=304)
+        elif encoding == 'identity':
+            response = send_file(asset.full_path, mimetype=asset.mimetype, conditional=False, etag=False)
+        else:
+            variant = asset.variants[encoding]
+            if isinstance(variant, bytes):
+                response = Response(variant, mimetype=asset.mimetype)
+            else:
+                response = send_file(variant, mimetype=asset.mimetype, conditional=False, etag=False)
+            response.headers['Content-Encoding'] = encoding
+
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = cache_control
+        if asset.compressible or asset.variants:
+            response.vary.add('Accept-Encoding')
+        return response
+
+    def serve_path(self, path):
+        """Serve a file from the build, or index.html for client-side routes"""
+        asset = self.assets.get(path) or self.index
+        if asset is None:
+            abort(404)
+        return self.serve(asset)
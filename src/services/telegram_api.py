@@ -0,0 +1,34 @@
+import os
+import time
+from src.services.metrics import metrics
+
+TELEGRAM_API_BASE = os.getenv('TELEGRAM_API_BASE', 'https://api.telegram.org').rstrip('/')
+
+class TelegramAPIError(Exception):
+    """Network-level failure talking to the Bot API"""
+
+def telegram_request(bot_token, method, params=None, http_method='post', timeout=10):
+    """Call a Bot API method and record how long it took.
+
+    Returns the `requests` response; network errors are raised as
+    TelegramAPIError carrying the original message.
+    """
+    # Imported on first use to keep worker boot fast
+    import requests
+
+    url = f"{TELEGRAM_API_BASE}/bot{bot_token}/{method}"
+    started_at = time.perf_counter()
+    outcome = 'error'
+    try:
+        if http_method == 'get':
+            response = requests.get(url, params=params, timeout=timeout)
+        else:
+            response = requests.post(url, json=params, timeout=timeout)
+        outcome = str(response.status_code)
+        return response
+    except requests.RequestException as e:
+        raise TelegramAPIError(str(e)) from e
+    finally:
+        elapsed = time.perf_counter() - started_at
+        metrics.observe('telegram_api_duration_seconds', elapsed, method=method)
+        metrics.inc('telegram_api_requests_total', method=method, outcome=outcome)
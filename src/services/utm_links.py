@@ -0,0 +1,69 @@
+import hashlib
+import re
+import threading
+from src.models.invite_link import InviteLink
+from src.services.metrics import metrics
+
+UTM_FIELDS = ('utm_source', 'utm_medium', 'utm_campaign', 'utm_content', 'utm_term')
+
+STATIC_CODE_PATTERN = re.compile(r'^u[0-9a-f]{16}$')
+
+def utm_link_code(campaign_id, chat_id, utm_params):
+    """Deterministic invite link name for a campaign's UTM combination.
+
+    Every worker derives the same code, so concurrent first clicks converge
+    on one InviteLink row. The chat ID is part of the key, so switching the
+    campaign's bot yields fresh links for the new chat.
+    """
+    parts = [str(campaign_id), str(chat_id)] + [utm_params.get(field) or '' for field in UTM_FIELDS]
+    digest = hashlib.blake2b('\x1f'.join(parts).encode('utf-8'), digest_size=8).hexdigest()
+    return f'u{digest}'
+
+def is_static_code(code):
+    """Whether a code names a shared per-UTM link rather than a single click"""
+    return bool(code and STATIC_CODE_PATTERN.match(code))
+
+def static_code_clause(column=InviteLink.code):
+    """SQL form of is_static_code: a case-sensitive regex match (~ on
+    PostgreSQL, SQLAlchemy's REGEXP function on SQLite)"""
+    return column.regexp_match(STATIC_CODE_PATTERN.pattern)
+
+class UtmLinkIndex:
+    """Per-process index of static invite links keyed by code, backed by
+    the invite_links table"""
+
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        self._links = {}
+        self._lock = threading.Lock()
+
+    def get(self, campaign_id, code):
+        """Telegram link URL for a code, or None if it was never created"""
+        key = (str(campaign_id), code)
+        link = self._links.get(key)
+        metrics.record_cache('utm_link_index', link is not None)
+        if link is not None:
+            return link
+
+        record = InviteLink.query.filter_by(campaign_id=campaign_id, code=code).first()
+        if record is None or not record.telegram_invite_link:
+            return None
+        self.put(campaign_id, code, record.telegram_invite_link)
+        return record.telegram_invite_link
+
+    def put(self, campaign_id, code, link):
+        with self._lock:
+            if len(self._links) >= self.max_entries:
+                self._links.clear()
+            self._links[(str(campaign_id), code)] = link
+
+    def invalidate_campaign(self, campaign_id):
+        campaign_id = str(campaign_id)
+        with self._lock:
+            for key in [k for k in self._links if k[0] == campaign_id]:
+                del self._links[key]
+
+    def __len__(self):
+        return len(self._links)
+
+utm_link_index = UtmLinkIndex()
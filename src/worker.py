@@ -0,0 +1,55 @@
+"""Run background job workers.
+
+Usage:
+    python -m src.worker --threads 4
+    python -m src.worker --processes 2 --threads 4 --kinds export
+    python -m src.worker --burst    # exit once the queue is empty
+"""
+import argparse
+import multiprocessing
+import signal
+from src.main import app
+from src.models import db
+from src.services.jobs import JobWorker
+
+def run_worker(threads, kinds, poll_interval, burst):
+    # Connections inherited from the parent process must not be shared
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+    worker = JobWorker(app, threads=threads, kinds=kinds, poll_interval=poll_interval, burst=burst)
+    # Finish the jobs in hand on SIGTERM/SIGINT, then exit
+    signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+    signal.signal(signal.SIGINT, lambda *_: worker.stop())
+    worker.run()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=1, help='worker threads per process')
+    parser.add_argument('--processes', type=int, default=1, help='worker processes')
+    parser.add_argument('--kinds', help='comma-separated job kinds to run (default: all)')
+    parser.add_argument('--poll-interval', type=float, default=1.0, help='seconds to wait when the queue is empty')
+    parser.add_argument('--burst', action='store_true', help='exit when no job is due')
+    args = parser.parse_args()
+
+    kinds = [kind.strip() for kind in args.kinds.split(',')] if args.kinds else None
+    worker_args = (args.threads, kinds, args.poll_interval, args.burst)
+
+    if args.processes <= 1:
+        run_worker(*worker_args)
+        return
+
+    processes = [
+        multiprocessing.get_context('fork').Process(target=run_worker, args=worker_args, name=f'worker-{n}')
+        for n in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    # Children get the same signals from the terminal or process manager
+    signal.signal(signal.SIGTERM, lambda *_: [p.terminate() for p in processes])
+    for process in processes:
+        process.join()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,9 @@
+"""Production WSGI entry point.
+
+Run with `gunicorn -c gunicorn.conf.py src.wsgi:app`. The gunicorn
+config applies the gevent monkey patches before this module is imported,
+so outbound Bot API calls and the PostgreSQL driver yield cooperatively.
+"""
+from src.main import app
+
+__all__ = ['app']
@@ -0,0 +1,50 @@
+import os
+import tempfile
+
+import pytest
+
+# src.main builds an app when imported; point it at a throwaway database
+_import_dir = tempfile.mkdtemp(prefix='utm-tracker-tests-')
+os.environ['DATABASE_URL'] = f'sqlite:///{_import_dir}/import.db'
+os.environ.pop('DATABASE_REPLICA_URL', None)
+os.environ.pop('METRICS_MULTIPROC_DIR', None)
+os.environ['SCHEDULER_ENABLED'] = 'false'
+os.environ['JWT_SECRET_KEY'] = 'test-jwt-secret-long-enough-for-hs256'
+
+@pytest.fixture
+def make_app(monkeypatch, tmp_path):
+    """Build an app from environment overrides, on a fresh SQLite file by default"""
+    from src.services.principal import principal_cache
+
+    def make(**env):
+        env.setdefault('DATABASE_URL', f'sqlite:///{tmp_path}/primary.db')
+        for name, value in env.items():
+            monkeypatch.setenv(name, str(value))
+        from src.main import create_app
+        principal_cache.clear()
+        return create_app()
+
+    yield make
+    principal_cache.clear()
+
+@pytest.fixture
+def add_campaign():
+    """Insert a user, a bot and a campaign; run inside an app context"""
+    from src.models import db
+    from src.models.campaign import Campaign
+    from src.models.telegram_bot import TelegramBot
+    from src.models.user import User
+
+    def add(email='owner@example.com', name='launch'):
+        user = User(email=email, name='Owner', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        bot = TelegramBot(user_id=user.id, bot_token='1:token', chat_id='-100')
+        db.session.add(bot)
+        db.session.flush()
+        campaign = Campaign(user_id=user.id, telegram_bot_id=bot.id, name=name)
+        db.session.add(campaign)
+        db.session.commit()
+        return campaign
+
+    return add
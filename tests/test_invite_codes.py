@@ -0,0 +1,133 @@
+import multiprocessing
+import os
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from src.services import invite_codes as codes_module
+from src.services.invite_codes import (
+    CODE_LENGTH, MAX_SEQ, InviteCodeGenerator, decode_code, invite_codes, is_generated_code
+)
+from src.services.utm_links import utm_link_code
+
+class FakeClock:
+    """Millisecond clock that only moves when the generator sleeps"""
+
+    def __init__(self, ms):
+        self.ms = ms
+
+    def now(self):
+        return self.ms
+
+    def sleep(self, seconds):
+        self.ms += 1
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock(1000)
+    monkeypatch.setattr(codes_module, '_now_ms', clock.now)
+    monkeypatch.setattr(codes_module, 'time', SimpleNamespace(sleep=clock.sleep))
+    return clock
+
+def _generate(path, threads, codes):
+    def run(thread_index):
+        batch = [invite_codes.next_code() for _ in range(codes)]
+        with open(f'{path}-{thread_index}', 'w') as f:
+            f.write('\n'.join(batch))
+
+    workers = [threading.Thread(target=run, args=(n,)) for n in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+def test_codes_are_unique_across_forked_processes(tmp_path):
+    # Forked like gunicorn workers, from a parent whose generator already ran
+    invite_codes.next_code()
+    context = multiprocessing.get_context('fork')
+    processes = [
+        context.Process(target=_generate, args=(str(tmp_path / str(n)), 2, 12500))
+        for n in range(4)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+        assert process.exitcode == 0
+
+    codes = []
+    for name in os.listdir(tmp_path):
+        codes.extend((tmp_path / name).read_text().split('\n'))
+    assert len(codes) == 100000
+    assert len(set(codes)) == len(codes)
+    assert len({decode_code(code)['pid'] for code in codes}) == 4
+
+def test_new_generator_skips_its_starting_millisecond(clock):
+    generator = InviteCodeGenerator(node_id=7)
+    assert decode_code(generator.next_code())['timestamp_ms'] == 1001
+
+def test_clock_stepping_back_keeps_counting(clock):
+    generator = InviteCodeGenerator(node_id=7)
+    clock.ms = 1005
+    codes = [generator.next_code() for _ in range(3)]
+    clock.ms = 900
+    codes += [generator.next_code() for _ in range(3)]
+
+    decoded = [decode_code(code) for code in codes]
+    assert len(set(codes)) == len(codes)
+    assert [d['timestamp_ms'] for d in decoded] == [1005] * 6
+    assert [d['seq'] for d in decoded] == list(range(6))
+
+def test_sequence_overflow_waits_for_the_next_millisecond(clock):
+    generator = InviteCodeGenerator(node_id=7)
+    clock.ms = 1005
+    codes = [generator.next_code() for _ in range(MAX_SEQ + 2)]
+
+    assert len(set(codes)) == len(codes)
+    assert codes == sorted(codes)
+    assert decode_code(codes[MAX_SEQ - 1])['timestamp_ms'] == 1005
+    assert decode_code(codes[MAX_SEQ])['timestamp_ms'] == 1006
+    assert decode_code(codes[MAX_SEQ])['seq'] == 0
+
+def test_sequence_overflow_behind_the_clock_borrows_a_millisecond(clock):
+    generator = InviteCodeGenerator(node_id=7)
+    clock.ms = 1005
+    generator.next_code()
+    clock.ms = 900
+    codes = [generator.next_code() for _ in range(MAX_SEQ)]
+
+    assert len(set(codes)) == len(codes)
+    assert codes == sorted(codes)
+    assert decode_code(codes[-1])['timestamp_ms'] == 1006
+    # Borrowing does not wait for the wall clock to catch up
+    assert clock.ms == 900
+
+def test_decode_code_returns_the_fields(clock):
+    generator = InviteCodeGenerator(node_id=123456)
+    code = generator.next_code()
+    assert len(code) == CODE_LENGTH
+    assert decode_code(code) == {
+        'timestamp_ms': 1001,
+        'node_id': 123456,
+        'pid': os.getpid() % codes_module.MAX_PID,
+        'seq': 0
+    }
+
+def test_base62_round_trip_keeps_order():
+    values = [0, 1, 61, 62, 3843, 3844, 1760000000000, 62 ** 8 - 1]
+    encoded = [codes_module._encode(value, 8) for value in values]
+    assert [codes_module._decode(chars) for chars in encoded] == values
+    # Code strings sort like the numbers they encode
+    assert encoded == sorted(encoded)
+
+@pytest.mark.parametrize('code', [
+    None,
+    '',
+    utm_link_code('campaign', '-100', {}),
+    'a' * (CODE_LENGTH - 1),
+    'a' * (CODE_LENGTH - 1) + '-',
+])
+def test_other_codes_are_not_decoded(code):
+    assert not is_generated_code(code)
+    assert decode_code(code) is None
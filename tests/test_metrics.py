@@ -0,0 +1,55 @@
+import os
+
+import pytest
+
+from src.services import metrics as metrics_module
+from src.services.metrics import MetricsRegistry
+
+def _two_workers(tmp_path, monkeypatch, write_first, write_second):
+    """Flush one registry as this process and one as its (live) parent"""
+    first, second = MetricsRegistry(), MetricsRegistry()
+    for registry in (first, second):
+        registry.define_gauge('saturation', 'max')
+        registry.define_gauge('queue_depth', 'mostrecent')
+        registry.define_gauge('startup_seconds', 'all')
+        registry.enable_multiprocess(str(tmp_path))
+
+    write_first(first)
+    first.flush()
+    monkeypatch.setattr(metrics_module.os, 'getpid', os.getppid)
+    write_second(second)
+    second.flush()
+    monkeypatch.undo()
+    return first.aggregate()
+
+def test_gauges_combine_by_mode(tmp_path, monkeypatch):
+    clock = iter([100.0, 200.0])
+    monkeypatch.setattr(metrics_module.time, 'time', lambda: next(clock, 300.0))
+
+    def first(registry):
+        registry.set_gauge('queue_depth', 7, kind='export')
+        registry.set_gauge('saturation', 0.9)
+        registry.set_gauge('checked_out', 3)
+        registry.set_gauge('startup_seconds', 1.5)
+        registry.inc('requests_total', 2)
+
+    def second(registry):
+        registry.set_gauge('queue_depth', 4, kind='export')
+        registry.set_gauge('saturation', 0.2)
+        registry.set_gauge('checked_out', 5)
+        registry.set_gauge('startup_seconds', 2.5)
+        registry.inc('requests_total', 3)
+
+    snapshot = _two_workers(tmp_path, monkeypatch, first, second)
+    gauges = snapshot['gauges']
+    assert gauges[('saturation', ())] == 0.9
+    assert gauges[('checked_out', ())] == 8
+    # The second worker read the queue last
+    assert gauges[('queue_depth', (('kind', 'export'),))] == 4
+    assert gauges[('startup_seconds', (('pid', str(os.getpid())),))] == 1.5
+    assert gauges[('startup_seconds', (('pid', str(os.getppid())),))] == 2.5
+    assert snapshot['counters'][('requests_total', ())] == 5
+
+def test_unknown_gauge_mode_is_rejected():
+    with pytest.raises(ValueError):
+        MetricsRegistry().define_gauge('saturation', 'average')
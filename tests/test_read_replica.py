@@ -0,0 +1,65 @@
+from flask import g
+from flask_jwt_extended import create_access_token
+
+from src.models import db
+from src.models.campaign import Campaign
+from src.models.routing import replica_lag, route_reads_to_replica
+from src.models.user import User
+from src.services.principal import token_claims
+
+def _build(make_app, add_campaign, tmp_path, **env):
+    app = make_app(
+        DATABASE_REPLICA_URL=f'sqlite:///{tmp_path}/replica.db',
+        REPLICA_ASSUMED_LAG_SECONDS=env.pop('assumed_lag', 0),
+        REPLICA_MAX_LAG_SECONDS=env.pop('max_lag', 10),
+        **env
+    )
+    with app.app_context():
+        # The user exists only on the primary, as right after registration
+        campaign = add_campaign(name='on primary')
+        user = db.session.get(User, campaign.user_id)
+
+        replica = db.engines['replica']
+        with replica.begin() as connection:
+            connection.execute(Campaign.__table__.insert().values(
+                user_id=user.id, telegram_bot_id=campaign.telegram_bot_id, name='on replica'
+            ))
+        token = create_access_token(identity=user.id, additional_claims=token_claims(user))
+    return app, {'Authorization': f'Bearer {token}'}
+
+def _campaign_names(app, headers):
+    response = app.test_client().get('/api/campaigns/campaigns', headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return [campaign['name'] for campaign in response.get_json()['campaigns']]
+
+def test_reads_go_to_replica_and_token_check_to_primary(make_app, add_campaign, tmp_path):
+    app, headers = _build(make_app, add_campaign, tmp_path)
+    # The JWT blocklist lookup finds the user, which the replica does not have
+    assert _campaign_names(app, headers) == ['on replica']
+
+def test_writes_go_to_primary(make_app, add_campaign, tmp_path):
+    app, _ = _build(make_app, add_campaign, tmp_path)
+    with app.test_request_context('/api/dashboard/dashboard/overview'):
+        route_reads_to_replica()
+        assert g.use_read_replica
+        campaign = db.session.execute(db.select(Campaign)).scalar_one()
+        assert campaign.name == 'on replica'
+        db.session.add(Campaign(user_id=campaign.user_id, telegram_bot_id=campaign.telegram_bot_id, name='written'))
+        db.session.commit()
+
+    with app.app_context():
+        names = db.select(Campaign.name).order_by(Campaign.name)
+        primary = db.session.execute(names, bind_arguments={'bind': db.engine}).scalars().all()
+        replica = db.session.execute(names, bind_arguments={'bind': db.engines['replica']}).scalars().all()
+    assert primary == ['on primary', 'written']
+    assert replica == ['on replica']
+
+def test_reads_fall_back_to_primary_when_replica_lags(make_app, add_campaign, tmp_path):
+    app, headers = _build(make_app, add_campaign, tmp_path, assumed_lag=30, max_lag=10)
+    assert _campaign_names(app, headers) == ['on primary']
+
+def test_sqlite_replica_without_assumed_lag_is_ignored(make_app, tmp_path):
+    app = make_app(DATABASE_REPLICA_URL=f'sqlite:///{tmp_path}/replica.db')
+    assert 'replica' not in app.config.get('SQLALCHEMY_BINDS', {})
+    with app.app_context():
+        assert replica_lag() is None
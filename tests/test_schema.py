@@ -0,0 +1,67 @@
+import multiprocessing
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, text
+
+from src.models import db
+from src.models.lead import TelegramLead
+from src.services.schema import SCHEMA_VERSION, ensure_schema
+
+def _migrate(database_url, barrier, results):
+    os.environ['DATABASE_URL'] = database_url
+    os.environ['SCHEMA_CHECK_ON_STARTUP'] = 'false'
+    from src.main import create_app
+
+    app = create_app()
+    with app.app_context():
+        barrier.wait()
+        results.put(ensure_schema()['action'])
+
+def test_concurrent_processes_migrate_once(make_app, tmp_path):
+    database_url = f'sqlite:///{tmp_path}/primary.db'
+    make_app(DATABASE_URL=database_url)
+    engine = create_engine(database_url)
+    with engine.begin() as connection:
+        # Roll the recorded version back one step; the last migration is idempotent
+        connection.execute(text('DELETE FROM schema_version'))
+        connection.execute(text('INSERT INTO schema_version (version) VALUES (:version)'),
+                           {'version': SCHEMA_VERSION - 1})
+
+    context = multiprocessing.get_context('spawn')
+    barrier = context.Barrier(2)
+    results = context.Queue()
+    processes = [context.Process(target=_migrate, args=(database_url, barrier, results)) for _ in range(2)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+        assert process.exitcode == 0
+
+    assert sorted(results.get(timeout=5) for _ in processes) == ['upgraded', 'verified']
+    with engine.connect() as connection:
+        versions = connection.execute(text('SELECT version FROM schema_version ORDER BY version')).scalars().all()
+    assert versions == [SCHEMA_VERSION - 1, SCHEMA_VERSION]
+
+def test_duplicate_leads_are_moved_aside(make_app, add_campaign):
+    app = make_app()
+    with app.app_context():
+        campaign = add_campaign()
+
+        # A database from before the unique index, holding three joins of one user
+        with db.engine.begin() as connection:
+            connection.execute(text('DROP INDEX uq_leads_campaign_telegram'))
+            connection.execute(text('INSERT INTO schema_version (version) VALUES (11)'))
+            connection.execute(text('DELETE FROM schema_version WHERE version > 11'))
+        joined_at = datetime(2026, 1, 1)
+        for minutes in (5, 0, 9):
+            db.session.add(TelegramLead(user_id=campaign.user_id, campaign_id=campaign.id, telegram_id='42',
+                                        created_at=joined_at + timedelta(minutes=minutes)))
+        db.session.commit()
+
+        report = ensure_schema(force=True)
+        assert report['migration_notes'][12] == {'duplicate_leads_moved': {str(campaign.id): 2}}
+        kept = db.session.execute(db.select(TelegramLead.created_at)).scalars().all()
+        assert kept == [joined_at]
+        with db.engine.connect() as connection:
+            assert connection.execute(text('SELECT COUNT(*) FROM leads_duplicates')).scalar() == 2
@@ -0,0 +1,20 @@
+import pytest
+from sqlalchemy import literal, select
+
+from src.models import db
+from src.services.utm_links import is_static_code, static_code_clause, utm_link_code
+
+@pytest.mark.parametrize('code', [
+    utm_link_code('campaign', '-100', {'utm_source': 'ads'}),
+    'u0123456789abcdef',
+    'U0123456789abcdef',
+    'u0123456789ABCDEF',
+    'u0123456789abcde',
+    'u0123456789abcdef0',
+    'k8Zq3xY0aB1c',
+])
+def test_static_code_clause_matches_python_check(make_app, code):
+    app = make_app()
+    with app.app_context():
+        in_sql = db.session.execute(select(static_code_clause(literal(code)))).scalar()
+    assert bool(in_sql) == is_static_code(code)
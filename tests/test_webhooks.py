@@ -0,0 +1,30 @@
+from flask_jwt_extended import create_access_token
+
+from src.models import db
+from src.models.job import Job
+from src.models.user import User
+from src.services.principal import token_claims
+
+def _headers(user):
+    return {'Authorization': f'Bearer {create_access_token(identity=user.id, additional_claims=token_claims(user))}'}
+
+def test_queued_webhook_change_needs_the_campaign_owner(make_app, add_campaign):
+    app = make_app()
+    with app.app_context():
+        campaign = add_campaign()
+        owner = db.session.get(User, campaign.user_id)
+        stranger = db.session.get(User, add_campaign(email='stranger@example.com').user_id)
+        owner_headers, stranger_headers = _headers(owner), _headers(stranger)
+        campaign_id, owner_id = str(campaign.id), owner.id
+
+    client = app.test_client()
+    for action in ('setup', 'remove'):
+        url = f'/api/webhooks/webhooks/telegram-member/{campaign_id}/{action}?async=true'
+        assert client.post(url).status_code == 401
+        assert client.post(url, headers=stranger_headers).status_code == 404
+        response = client.post(url, headers=owner_headers)
+        assert response.status_code == 202, response.get_json()
+
+    with app.app_context():
+        jobs = db.session.execute(db.select(Job.kind, Job.owner_id)).all()
+    assert sorted(jobs) == [('remove_webhook', owner_id), ('setup_webhook', owner_id)]